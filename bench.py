@@ -0,0 +1,414 @@
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+# Headless: pygame must see the dummy drivers before it is first imported
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+ROOT = Path(__file__).resolve().parent
+sys.path.insert(0, str(ROOT))
+
+import emu
+
+def load_nesticle():
+    # The NES emulator lives in a hyphenated script, so import it by path
+    spec = importlib.util.spec_from_file_location('nesticle', ROOT / 'nesticle-modernv0.py')
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+# Synthetic CHIP-8 ROMs; each is an endless loop so any cycle count is valid
+def chip8_alu_rom():
+    return bytes.fromhex(
+        '6005 6103 6207 8014 8125 8203 8312 7001 7102 8106 810E 8217 A300 F11E 1200'.replace(' ', ''))
+
+def chip8_drw_rom():
+    # Walks a 5-row font glyph and a 15-row solid sprite across the screen
+    code = bytes.fromhex(
+        '6000 6100 6205 A000 D015 7007 7103 F229 D01F A220 D01F 7005 1208'.replace(' ', ''))
+    return code + bytes(0x20 - len(code)) + b'\xff' * 15
+
+def chip8_call_rom():
+    # CALL/RET pair per loop iteration with a little work in the subroutine
+    return bytes.fromhex('2206 7001 1200 7101 8014 00EE'.replace(' ', ''))
+
+CHIP8_ROMS = {'alu': chip8_alu_rom, 'drw': chip8_drw_rom, 'call': chip8_call_rom}
+
+def nes_nrom_image(program, reset=0x8000, chr_data=None):
+    # One 16 KB PRG bank (mirrored at $C000) and one 8 KB CHR bank, with the
+    # NMI/RESET/IRQ vectors all pointing at reset
+    header = b'NES\x1a' + bytes([1, 1, 0, 0]) + bytes(8)
+    prg = bytearray(0x4000)
+    offset = (reset - 0x8000) % 0x4000
+    prg[offset:offset + len(program)] = program
+    prg[0x3FFA:0x4000] = bytes([reset & 0xFF, reset >> 8] * 3)
+    if chr_data is None:
+        chr_data = bytes((i * 37) & 0xFF for i in range(0x2000))
+    return header + bytes(prg) + bytes(chr_data)
+
+# LDA #$05 / JMP $8000
+NES_LOOP_PROGRAM = bytes([0xA9, 0x05, 0x4C, 0x00, 0x80])
+
+# A loop over zero page/absolute indexed/indirect loads, shifts, a JSR to a
+# subroutine with stack and compare/branch work, and RAM read-modify-write
+NES_MIXED_PROGRAM = bytes.fromhex(
+    'A200 A000'            # 8000: LDX #0, LDY #0
+    'B510 7D0003 9D0003'   # 8004: LDA $10,X / ADC $0300,X / STA $0300,X
+    '5120 2A 202080'       # 800C: EOR ($20),Y / ROL A / JSR $8020
+    'E8 C8 D0EE'           # 8012: INX / INY / BNE $8004
+    'E630 4C0480'          # 8016: INC $30 / JMP $8004
+    '0000000000'           # 801B: padding
+    '48 4A C940 9002 E911' # 8020: PHA / LSR A / CMP #$40 / BCC +2 / SBC #$11
+    '68 60')               # 8028: PLA / RTS
+
+def write_temp_rom(data, suffix='.nes'):
+    f = tempfile.NamedTemporaryFile(suffix=suffix, delete=False)
+    with f:
+        f.write(data)
+    return f.name
+
+# Benchmarks register a setup function returning (run, work units per run)
+BENCHMARKS = {}
+
+class SkipBenchmark(Exception):
+    pass
+
+def benchmark(name, unit):
+    def register(setup):
+        BENCHMARKS[name] = (setup, unit)
+        return setup
+    return register
+
+def _chip8_core(rom, **kwargs):
+    core = emu.Chip8Core(**kwargs)
+    core.load_rom(rom)
+    return core
+
+def _register_chip8(kind, rom_factory):
+    @benchmark(f'chip8.{kind}.process_opcode', 'instr')
+    def process_opcode():
+        core = _chip8_core(rom_factory())
+        step = core.process_opcode
+        def run():
+            for _ in range(20000):
+                step()
+        return run, 20000
+
+    @benchmark(f'chip8.{kind}.run_dispatch', 'instr')
+    def run_dispatch():
+        core = _chip8_core(rom_factory())
+        return (lambda: core.run_dispatch(50000)), 50000
+
+    @benchmark(f'chip8.{kind}.run_blocks', 'instr')
+    def run_blocks():
+        core = _chip8_core(rom_factory())
+        core.run_blocks(1000)  # translate outside the timed region
+        return (lambda: core.run_blocks(100000)), 100000
+
+    @benchmark(f'chip8.{kind}.run_traced', 'instr')
+    def run_traced():
+        core = _chip8_core(rom_factory())
+        core.enable_trace()
+        return (lambda: core.run_traced(50000)), 50000
+
+for _kind, _factory in CHIP8_ROMS.items():
+    _register_chip8(_kind, _factory)
+
+@benchmark('chip8.drw.packed_display', 'instr')
+def chip8_packed_drw():
+    core = _chip8_core(chip8_drw_rom(), packed_display=True)
+    core.run_blocks(1000)
+    return (lambda: core.run_blocks(50000)), 50000
+
+@benchmark('chip8.batch.alu', 'instr')
+def chip8_batch_alu():
+    if emu.np is None:
+        raise SkipBenchmark('NumPy not installed')
+    batch = emu.Chip8Batch(1024)
+    batch.load_rom(chip8_alu_rom())
+    return (lambda: batch.run_cycles(50)), 50 * 1024
+
+@benchmark('chip8.frames', 'frame')
+def chip8_frames():
+    core = _chip8_core(chip8_drw_rom(), cpu_speed=1000)
+    return (lambda: core.run_frames(120)), 120
+
+class NullCanvas:
+    # Stands in for tk.Canvas so renderer cost is measured without a display
+    def __init__(self):
+        self.items = 0
+
+    def create_rectangle(self, *coords, **options):
+        self.items += 1
+        return self.items
+
+    def itemconfigure(self, item, **options):
+        pass
+
+@benchmark('chip8.update_display', 'frame')
+def chip8_update_display():
+    core = _chip8_core(chip8_drw_rom())
+    frames = []
+    for _ in range(32):
+        core.run_cycles(16)
+        frames.append(core.framebuffer())
+    renderer = emu.CanvasRenderer(NullCanvas(), core.WIDTH, core.HEIGHT, 10)
+    def run():
+        for frame in frames:
+            renderer.present(frame)
+    return run, len(frames)
+
+_nesticle = None
+
+def nesticle():
+    global _nesticle
+    if _nesticle is None:
+        try:
+            _nesticle = load_nesticle()
+        except ImportError as e:
+            raise SkipBenchmark(f'NES emulator unavailable: {e}')
+    return _nesticle
+
+@benchmark('nes.cpu.step', 'instr')
+def nes_cpu_step():
+    nes = nesticle()
+    path = write_temp_rom(nes_nrom_image(NES_LOOP_PROGRAM))
+    try:
+        cpu = nes.CPU(nes.ROM(path))
+    finally:
+        os.unlink(path)
+    step = cpu.step
+    def run():
+        for _ in range(50000):
+            step()
+    return run, 50000
+
+def _nes_cpu_frame(trace):
+    nes = nesticle()
+    path = write_temp_rom(nes_nrom_image(NES_MIXED_PROGRAM))
+    try:
+        cpu = nes.CPU(nes.ROM(path))
+    finally:
+        os.unlink(path)
+    if trace:
+        cpu.enable_trace()
+    owed = [0.0]
+    def run():
+        for _ in range(10):
+            owed[0] += nes.NES.CYCLES_PER_FRAME
+            owed[0] -= cpu.run_until(owed[0])
+    return run, 10
+
+@benchmark('nes.cpu.frame', 'frame')
+def nes_cpu_frame():
+    return _nes_cpu_frame(trace=False)
+
+@benchmark('nes.cpu.frame_traced', 'frame')
+def nes_cpu_frame_traced():
+    return _nes_cpu_frame(trace=True)
+
+def nestest_line(cpu):
+    # The register/cycle columns of a nestest.log line
+    return (f"{cpu.pc:04X} A:{cpu.acc:02X} X:{cpu.x:02X} Y:{cpu.y:02X} "
+            f"P:{cpu.status:02X} SP:{cpu.sp:02X} CYC:{cpu.cycles}")
+
+def read_nestest_log(path):
+    # Reference lines up to the first unofficial opcode (marked '*' in the log)
+    lines = []
+    with open(path) as f:
+        for line in f:
+            if line[15:16] == '*':
+                break
+            regs = line[line.index('A:'):].split()
+            cycles = line[line.index('CYC:'):].strip()
+            lines.append(f"{line[:4]} {' '.join(regs[:5])} {cycles}")
+    return lines
+
+@benchmark('nes.cpu.nestest', 'instr')
+def nes_cpu_nestest():
+    # Runs the CPU while writing a nestest-style log. Point NESTEST_ROM at
+    # nestest.nes to run the real ROM in automation mode (PC=$C000); with
+    # NESTEST_LOG as well, the trace is first checked against the reference.
+    nes = nesticle()
+    rom_path = os.environ.get('NESTEST_ROM')
+    if rom_path:
+        rom = nes.ROM(rom_path)
+    else:
+        path = write_temp_rom(nes_nrom_image(NES_MIXED_PROGRAM))
+        try:
+            rom = nes.ROM(path)
+        finally:
+            os.unlink(path)
+
+    def trace(count):
+        cpu = nes.CPU(rom)
+        if rom_path:
+            cpu.pc = 0xC000
+        step = cpu.step
+        lines = []
+        for _ in range(count):
+            lines.append(nestest_line(cpu))
+            step()
+        return lines
+
+    log_path = os.environ.get('NESTEST_LOG')
+    if rom_path and log_path:
+        expected = read_nestest_log(log_path)
+        for number, (got, want) in enumerate(zip(trace(len(expected)), expected), 1):
+            if got != want:
+                raise AssertionError(f"nestest line {number}: got {got!r}, expected {want!r}")
+    count = 5000
+    return (lambda: trace(count)), count
+
+def _nes_ppu_scene(split_lines=()):
+    # Random nametables, palette and a full OAM, rendered through the normal
+    # catch-up path; each entry in split_lines adds a mid-frame scroll write
+    nes = nesticle()
+    rng = random.Random(0)
+    path = write_temp_rom(nes_nrom_image(NES_LOOP_PROGRAM, chr_data=rng.randbytes(0x2000)))
+    try:
+        rom = nes.ROM(path)
+    finally:
+        os.unlink(path)
+    cpu = nes.CPU(rom)
+    ppu = nes.PPU(cpu)
+    cpu.bus.attach_ppu(ppu)
+    ppu.vram[:] = rng.randbytes(0x800)
+    ppu.palette_ram[:] = bytes(b & 0x3F for b in rng.randbytes(32))
+    ppu.palette_dirty = True
+    ppu.playfield_dirty = True
+    ppu.oam[:] = rng.randbytes(256)
+    ppu.write_register(0x2001, 0x1E)
+    line = nes.NES.CYCLES_PER_LINE
+    def run():
+        start = cpu.cycles
+        ppu.begin_frame(start)
+        for scroll, split in enumerate(split_lines):
+            cpu.cycles = start + int(split * line)
+            ppu.write_register(0x2005, scroll * 8)
+            ppu.write_register(0x2005, 0)
+        ppu.finish_frame()
+        ppu.present()
+        ppu.playfield_dirty = True  # as after a typical vblank VRAM update
+        cpu.cycles = start + int(262 * line)
+    return run, 1
+
+@benchmark('nes.ppu.render_frame', 'frame')
+def nes_ppu_render_frame():
+    return _nes_ppu_scene()
+
+@benchmark('nes.ppu.split_frame', 'frame')
+def nes_ppu_split_frame():
+    return _nes_ppu_scene(split_lines=(30, 60, 90, 120, 150, 180, 210))
+
+def measure(name, repeat, min_time):
+    setup, unit = BENCHMARKS[name]
+    run, units = setup()
+    run()  # warm-up
+    best = None
+    for _ in range(repeat):
+        loops = 0
+        start = time.perf_counter()
+        elapsed = 0.0
+        while loops == 0 or elapsed < min_time:
+            run()
+            loops += 1
+            elapsed = time.perf_counter() - start
+        rate = loops * units / elapsed
+        best = rate if best is None else max(best, rate)
+
+    # Allocations from one traced run, kept apart from the timed runs
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    run()
+    after, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'unit': unit,
+        'per_second': round(best, 2),
+        'alloc_peak_bytes': peak - before,
+        'alloc_net_bytes': after - before,
+    }
+
+def compare(results, baseline, tolerance):
+    # Returns a list of report lines and whether any benchmark regressed
+    lines = []
+    regressed = False
+    for name, result in results.items():
+        base = baseline.get('results', {}).get(name)
+        if base is None or 'per_second' not in result or 'per_second' not in base:
+            continue
+        ratio = result['per_second'] / base['per_second'] if base['per_second'] else float('inf')
+        status = 'ok'
+        if ratio < 1 - tolerance:
+            status = 'REGRESSION'
+            regressed = True
+        elif ratio > 1 + tolerance:
+            status = 'faster'
+        lines.append(f"{name:<32} {ratio:6.2f}x  {status}")
+    return lines, regressed
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless CHIP-8 / NES interpreter benchmarks")
+    parser.add_argument('-k', '--filter', default='', help="only run benchmarks whose name contains this")
+    parser.add_argument('--repeat', type=int, default=3, help="timed repeats per benchmark (best is kept)")
+    parser.add_argument('--min-time', type=float, default=0.2, help="minimum seconds per repeat")
+    parser.add_argument('--json', metavar='PATH', help="write results as JSON ('-' for stdout)")
+    parser.add_argument('--compare', metavar='BASELINE', help="compare against a saved JSON result")
+    parser.add_argument('--tolerance', type=float, default=0.10, help="allowed slowdown before failing")
+    parser.add_argument('--list', action='store_true', help="list benchmark names and exit")
+    args = parser.parse_args(argv)
+
+    names = [name for name in BENCHMARKS if args.filter in name]
+    if args.list:
+        print('\n'.join(names))
+        return 0
+
+    results = {}
+    for name in names:
+        try:
+            result = measure(name, args.repeat, args.min_time)
+        except SkipBenchmark as e:
+            result = {'skipped': str(e)}
+            print(f"{name:<32} skipped: {e}", file=sys.stderr)
+        else:
+            print(f"{name:<32} {result['per_second']:>14,.0f} {result['unit']}/s"
+                  f"  peak {result['alloc_peak_bytes']:>9,} B", file=sys.stderr)
+        results[name] = result
+
+    report = {
+        'meta': {
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        },
+        'results': results,
+    }
+    if args.json == '-':
+        print(json.dumps(report, indent=2))
+    elif args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        lines, regressed = compare(results, baseline, args.tolerance)
+        print('\n'.join(lines), file=sys.stderr)
+        if regressed:
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
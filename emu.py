@@ -1,15 +1,435 @@
-import pickle
-import tkinter as tk
-from tkinter import filedialog, messagebox
+try:
+    import tkinter as tk
+    from tkinter import filedialog, messagebox
+except ImportError:
+    tk = None  # Headless installs can still use Chip8Core
+import os
 import random
+import struct
+import tempfile
 import time
+import wave
+import zlib
+from array import array
+from collections import deque
 from pathlib import Path
 import threading
 import sys
+from perfstats import PerfCounters, TraceRing
+try:
+    import numpy as np
+except ImportError:
+    np = None  # Only Chip8Batch needs NumPy
 try:
     import winsound  # Windows-specific sound
 except ImportError:
     winsound = None  # Fallback for non-Windows systems
+try:
+    import sounddevice
+except ImportError:
+    sounddevice = None  # ToneGenerator falls back to pygame, winsound or the bell
+
+# Opcode handlers: each takes (core, V, pc, a, b) and returns the next PC.
+# The operands a/b are pre-extracted by decode_opcode so handlers never re-mask.
+def _op_cls(c, V, pc, a, b):
+    c.display = bytearray(c.WIDTH * c.HEIGHT)
+    c.draw_flag = True
+    return pc + 2
+
+def _op_ret(c, V, pc, a, b):
+    return (c.stack.pop() if c.stack else 0x200) + 2
+
+def _op_jp(c, V, pc, nnn, b):
+    return nnn
+
+def _op_call(c, V, pc, nnn, b):
+    stack = c.stack
+    if len(stack) == STATE_STACK_DEPTH:
+        del stack[0]  # 16 levels; a deeper call loses the oldest return address
+    stack.append(pc)
+    return nnn
+
+def _op_se_byte(c, V, pc, x, kk):
+    return pc + 4 if V[x] == kk else pc + 2
+
+def _op_sne_byte(c, V, pc, x, kk):
+    return pc + 4 if V[x] != kk else pc + 2
+
+def _op_se_reg(c, V, pc, x, y):
+    return pc + 4 if V[x] == V[y] else pc + 2
+
+def _op_ld_byte(c, V, pc, x, kk):
+    V[x] = kk
+    return pc + 2
+
+def _op_add_byte(c, V, pc, x, kk):
+    V[x] = (V[x] + kk) & 0xFF
+    return pc + 2
+
+def _op_ld_reg(c, V, pc, x, y):
+    V[x] = V[y]
+    return pc + 2
+
+def _op_or(c, V, pc, x, y):
+    V[x] |= V[y]
+    return pc + 2
+
+def _op_and(c, V, pc, x, y):
+    V[x] &= V[y]
+    return pc + 2
+
+def _op_xor(c, V, pc, x, y):
+    V[x] ^= V[y]
+    return pc + 2
+
+def _op_add_reg(c, V, pc, x, y):
+    result = V[x] + V[y]
+    V[0xF] = 1 if result > 0xFF else 0
+    V[x] = result & 0xFF
+    return pc + 2
+
+def _op_sub(c, V, pc, x, y):
+    V[0xF] = 1 if V[x] > V[y] else 0
+    V[x] = (V[x] - V[y]) & 0xFF
+    return pc + 2
+
+def _op_shr(c, V, pc, x, y):
+    V[0xF] = V[x] & 0x1
+    V[x] >>= 1
+    return pc + 2
+
+def _op_subn(c, V, pc, x, y):
+    V[0xF] = 1 if V[y] > V[x] else 0
+    V[x] = (V[y] - V[x]) & 0xFF
+    return pc + 2
+
+def _op_shl(c, V, pc, x, y):
+    V[0xF] = (V[x] >> 7) & 0x1
+    V[x] = (V[x] << 1) & 0xFF
+    return pc + 2
+
+def _op_sne_reg(c, V, pc, x, y):
+    return pc + 4 if V[x] != V[y] else pc + 2
+
+def _op_ld_i(c, V, pc, nnn, b):
+    c.I = nnn
+    return pc + 2
+
+def _op_jp_v0(c, V, pc, nnn, b):
+    return nnn + V[0]
+
+def _op_rnd(c, V, pc, x, kk):
+    V[x] = c.rng.randint(0, 255) & kk
+    return pc + 2
+
+def _op_drw(c, V, pc, x, y_n):
+    y, n = y_n
+    width, height = c.WIDTH, c.HEIGHT
+    x_coord = V[x] % width
+    y_coord = V[y] % height
+    display = c.display
+    memory = c.memory
+    I = c.I
+    V[0xF] = 0
+    for row in range(n):
+        if y_coord + row >= height:
+            break
+        sprite_byte = memory[I + row]
+        base = (y_coord + row) * width
+        for col in range(8):
+            if x_coord + col >= width:
+                break
+            if sprite_byte & (0x80 >> col):
+                idx = base + x_coord + col
+                if display[idx]:
+                    V[0xF] = 1
+                display[idx] ^= 1
+    c.draw_flag = True
+    return pc + 2
+
+def _op_skp(c, V, pc, x, b):
+    return pc + 4 if c.keypad[V[x]] else pc + 2
+
+def _op_sknp(c, V, pc, x, b):
+    return pc + 4 if not c.keypad[V[x]] else pc + 2
+
+def _op_ld_vx_dt(c, V, pc, x, b):
+    V[x] = c.delay_timer
+    return pc + 2
+
+def _op_ld_key(c, V, pc, x, b):
+    for i, key in enumerate(c.keypad):
+        if key:
+            V[x] = i
+            return pc + 2
+    return pc
+
+def _op_ld_dt(c, V, pc, x, b):
+    c.delay_timer = V[x]
+    return pc + 2
+
+def _op_ld_st(c, V, pc, x, b):
+    c.sound_timer = V[x]
+    return pc + 2
+
+def _op_add_i(c, V, pc, x, b):
+    c.I = (c.I + V[x]) & 0xFFF
+    return pc + 2
+
+def _op_ld_font(c, V, pc, x, b):
+    c.I = (V[x] & 0xF) * 5
+    return pc + 2
+
+def _op_bcd(c, V, pc, x, b):
+    value = V[x]
+    memory = c.memory
+    I = c.I
+    memory[I] = value // 100
+    memory[I + 1] = (value // 10) % 10
+    memory[I + 2] = value % 10
+    c.invalidate_code(I, I + 3)
+    return pc + 2
+
+def _op_store(c, V, pc, x, b):
+    memory = c.memory
+    I = c.I
+    for i in range(x + 1):
+        memory[I + i] = V[i]
+    c.invalidate_code(I, I + x + 1)
+    return pc + 2
+
+def _op_load(c, V, pc, x, b):
+    memory = c.memory
+    I = c.I
+    for i in range(x + 1):
+        V[i] = memory[I + i]
+    return pc + 2
+
+def _op_unknown(c, V, pc, opcode, b):
+    # Reported once per core; with tracing on, the first one also dumps the ring
+    if not c.reported_unknown:
+        c.reported_unknown = True
+        print(f"Unknown opcode: 0x{opcode:04X} at 0x{pc:03X}", file=sys.stderr)
+    if c.trace is not None:
+        path = c.trace.fault()
+        if path is not None:
+            print(f"Execution trace written to {path}", file=sys.stderr)
+    return pc + 2
+
+# Sub-opcode tables for the 8xyN, ExKK and FxKK groups
+_ALU_OPS = {
+    0x0: _op_ld_reg, 0x1: _op_or, 0x2: _op_and, 0x3: _op_xor,
+    0x4: _op_add_reg, 0x5: _op_sub, 0x6: _op_shr, 0x7: _op_subn, 0xE: _op_shl,
+}
+_KEY_OPS = {0x9E: _op_skp, 0xA1: _op_sknp}
+_MISC_OPS = {
+    0x07: _op_ld_vx_dt, 0x0A: _op_ld_key, 0x15: _op_ld_dt, 0x18: _op_ld_st,
+    0x1E: _op_add_i, 0x29: _op_ld_font, 0x33: _op_bcd, 0x55: _op_store, 0x65: _op_load,
+}
+
+def _decode_sys(opcode):
+    if opcode == 0x00E0:  # CLS
+        return (_op_cls, 0, 0)
+    if opcode == 0x00EE:  # RET
+        return (_op_ret, 0, 0)
+    return (_op_unknown, opcode, 0)
+
+def _decode_reg_pair(handler):
+    # 5xy0 / 9xy0: the low nibble must be zero
+    def decode(opcode):
+        if opcode & 0xF:
+            return (_op_unknown, opcode, 0)
+        return (handler, (opcode >> 8) & 0xF, (opcode >> 4) & 0xF)
+    return decode
+
+def _decode_addr(handler):
+    return lambda opcode: (handler, opcode & 0xFFF, 0)
+
+def _decode_byte(handler):
+    return lambda opcode: (handler, (opcode >> 8) & 0xF, opcode & 0xFF)
+
+def _decode_sub(table, key_mask, operands):
+    def decode(opcode):
+        handler = table.get(opcode & key_mask)
+        if handler is None:
+            return (_op_unknown, opcode, 0)
+        return (handler,) + operands(opcode)
+    return decode
+
+def _decode_drw(opcode):
+    return (_op_drw, (opcode >> 8) & 0xF, ((opcode >> 4) & 0xF, opcode & 0xF))
+
+# First-level dispatch on the top nibble
+_GROUP_DECODERS = (
+    _decode_sys,                                                            # 0nnn
+    _decode_addr(_op_jp),                                                   # 1nnn
+    _decode_addr(_op_call),                                                 # 2nnn
+    _decode_byte(_op_se_byte),                                              # 3xkk
+    _decode_byte(_op_sne_byte),                                             # 4xkk
+    _decode_reg_pair(_op_se_reg),                                           # 5xy0
+    _decode_byte(_op_ld_byte),                                              # 6xkk
+    _decode_byte(_op_add_byte),                                             # 7xkk
+    _decode_sub(_ALU_OPS, 0xF, lambda op: ((op >> 8) & 0xF, (op >> 4) & 0xF)),  # 8xyN
+    _decode_reg_pair(_op_sne_reg),                                          # 9xy0
+    _decode_addr(_op_ld_i),                                                 # Annn
+    _decode_addr(_op_jp_v0),                                                # Bnnn
+    _decode_byte(_op_rnd),                                                  # Cxkk
+    _decode_drw,                                                            # Dxyn
+    _decode_sub(_KEY_OPS, 0xFF, lambda op: ((op >> 8) & 0xF, 0)),           # ExKK
+    _decode_sub(_MISC_OPS, 0xFF, lambda op: ((op >> 8) & 0xF, 0)),          # FxKK
+)
+
+def decode_opcode(opcode):
+    return _GROUP_DECODERS[opcode >> 12](opcode)
+
+def handler_name(handler):
+    # '_op_ld_byte' -> 'ld_byte', used to label per-opcode counters
+    return handler.__name__[len('_op_'):]
+
+# TraceRing record: sequence, PC, opcode, I, DT, ST, stack depth, V0-VF
+TRACE_FORMAT = '<QHHHBBB16s'
+
+# Pre-decoded (handler, a, b) for every 16-bit opcode
+OPCODE_TABLE = tuple(decode_opcode(opcode) for opcode in range(0x10000))
+
+# Framebuffer as one int per row, bit 63 = column 0. DRW becomes one shift,
+# AND and XOR per sprite row instead of a test per pixel.
+_PIXELS_TO_BITS = bytes.maketrans(b'\x00\x01', b'01')
+_BITS_TO_PIXELS = bytes.maketrans(b'01', b'\x00\x01')
+
+class PackedFramebuffer:
+    def __init__(self, width=64, height=32):
+        self.width, self.height = width, height
+        self.rows = [0] * height
+
+    def clear(self):
+        self.rows = [0] * self.height
+
+    def draw(self, memory, address, count, x, y):
+        # XOR count sprite rows from memory[address:] at (x, y), clipped to the
+        # right and bottom edges; returns 1 if any lit pixel was erased
+        rows = self.rows
+        shift = self.width - 8
+        end = min(y + count, self.height)
+        if address + end - y > len(memory):
+            raise IndexError("sprite data runs past the end of memory")
+        collision = 0
+        for line, sprite in zip(range(y, end), memory[address:address + end - y]):
+            bits = (sprite << shift) >> x
+            row = rows[line]
+            collision |= row & bits
+            rows[line] = row ^ bits
+        return 1 if collision else 0
+
+    def to_bytes(self):
+        # Byte-per-pixel, row-major, same layout as Chip8Core.display
+        digits = '0{}b'.format(self.width)
+        return bytearray(''.join([format(row, digits) for row in self.rows]).encode().translate(_BITS_TO_PIXELS))
+
+    def load_bytes(self, display):
+        width = self.width
+        bits = bytes(display).translate(_PIXELS_TO_BITS)
+        self.rows = [int(bits[start:start + width], 2) for start in range(0, width * self.height, width)]
+
+    def to_numpy(self, unpack=True):
+        # (height,) uint64 rows, or (height, width) uint8 pixels when unpack is set
+        rows = np.array(self.rows, dtype=np.uint64)
+        if not unpack:
+            return rows
+        return np.unpackbits(rows.astype('>u8').view(np.uint8).reshape(self.height, -1), axis=1)[:, :self.width]
+
+def _op_cls_packed(c, V, pc, a, b):
+    c.packed.clear()
+    c.draw_flag = True
+    return pc + 2
+
+def _op_drw_packed(c, V, pc, x, y_n):
+    y, n = y_n
+    x_coord = V[x] % c.WIDTH
+    y_coord = V[y] % c.HEIGHT
+    V[0xF] = c.packed.draw(c.memory, c.I, n, x_coord, y_coord)
+    c.draw_flag = True
+    return pc + 2
+
+_packed_opcode_table = None
+
+def packed_opcode_table():
+    # OPCODE_TABLE with CLS and DRW routed to the PackedFramebuffer handlers
+    global _packed_opcode_table
+    if _packed_opcode_table is None:
+        swap = {_op_cls: _op_cls_packed, _op_drw: _op_drw_packed}
+        _packed_opcode_table = tuple((swap.get(handler, handler), a, b) for handler, a, b in OPCODE_TABLE)
+    return _packed_opcode_table
+
+# Basic-block translation: straight-line runs are compiled into one Python
+# function per start address. Control flow, DRW, key waits and memory writes
+# end a block so self-modifying code is invalidated before it can run.
+BLOCK_PAGE_SHIFT = 8  # 256-byte invalidation pages
+MAX_BLOCK_LENGTH = 64
+
+_INLINE_OPS = {
+    _op_ld_byte: "V[{a}] = {b}",
+    _op_add_byte: "V[{a}] = (V[{a}] + {b}) & 0xFF",
+    _op_ld_reg: "V[{a}] = V[{b}]",
+    _op_or: "V[{a}] |= V[{b}]",
+    _op_and: "V[{a}] &= V[{b}]",
+    _op_xor: "V[{a}] ^= V[{b}]",
+    # VF is written before Vx/Vy are re-read, matching the handlers when x or y is F
+    _op_add_reg: "r = V[{a}] + V[{b}]; V[0xF] = 1 if r > 0xFF else 0; V[{a}] = r & 0xFF",
+    _op_sub: "V[0xF] = 1 if V[{a}] > V[{b}] else 0; V[{a}] = (V[{a}] - V[{b}]) & 0xFF",
+    _op_shr: "V[0xF] = V[{a}] & 0x1; V[{a}] >>= 1",
+    _op_subn: "V[0xF] = 1 if V[{b}] > V[{a}] else 0; V[{a}] = (V[{b}] - V[{a}]) & 0xFF",
+    _op_shl: "V[0xF] = (V[{a}] >> 7) & 0x1; V[{a}] = (V[{a}] << 1) & 0xFF",
+    _op_ld_i: "c.I = {a}",
+    _op_add_i: "c.I = (c.I + V[{a}]) & 0xFFF",
+    _op_ld_font: "c.I = (V[{a}] & 0xF) * 5",
+    _op_ld_vx_dt: "V[{a}] = c.delay_timer",
+    _op_ld_dt: "c.delay_timer = V[{a}]",
+    _op_ld_st: "c.sound_timer = V[{a}]",
+}
+_INLINE_TERMINATORS = {
+    _op_jp: "return {a}",
+    _op_se_byte: "return {skip} if V[{a}] == {b} else {next}",
+    _op_sne_byte: "return {skip} if V[{a}] != {b} else {next}",
+    _op_se_reg: "return {skip} if V[{a}] == V[{b}] else {next}",
+    _op_sne_reg: "return {skip} if V[{a}] != V[{b}] else {next}",
+}
+_BLOCK_TERMINATORS = set(_INLINE_TERMINATORS) | {
+    _op_ret, _op_call, _op_jp_v0, _op_drw, _op_drw_packed, _op_skp, _op_sknp,
+    _op_ld_key, _op_bcd, _op_store, _op_unknown,
+}
+
+def translate_block(memory, start, table=OPCODE_TABLE):
+    # Returns (function, instruction count, end address), or None when start
+    # does not hold a complete instruction
+    lines = []
+    namespace = {}
+    count = 0
+    pc = start
+    limit = min(len(memory) - 1, start + 2 * MAX_BLOCK_LENGTH)
+    terminated = False
+    while pc < limit and not terminated:
+        handler, a, b = table[(memory[pc] << 8) | memory[pc + 1]]
+        terminated = handler in _BLOCK_TERMINATORS
+        template = _INLINE_TERMINATORS.get(handler) or _INLINE_OPS.get(handler)
+        if template is not None:
+            lines.append(template.format(a=a, b=b, next=pc + 2, skip=pc + 4))
+        else:
+            namespace[f"_h{count}"] = handler
+            namespace[f"_a{count}"] = a
+            namespace[f"_b{count}"] = b
+            call = f"_h{count}(c, V, {pc}, _a{count}, _b{count})"
+            lines.append(f"return {call}" if terminated else call)
+        count += 1
+        pc += 2
+    if not count:
+        return None
+    if not terminated:
+        lines.append(f"return {pc}")
+    name = f"_block_{start:03X}"
+    source = f"def {name}(c, V):\n    " + "\n    ".join(lines) + "\n"
+    exec(compile(source, f"<chip8 block 0x{start:03X}>", "exec"), namespace)
+    return namespace[name], count, pc
 
 class NesticleInspiredGUI:
     def __init__(self, root):
@@ -34,8 +454,1136 @@ class NesticleInspiredGUI:
     def create_canvas_frame(self, parent):
         return tk.Frame(parent, **self.style['canvas_frame'])
 
+FONTSET = bytes([
+    0xF0, 0x90, 0x90, 0x90, 0xF0, 0x20, 0x60, 0x20, 0x20, 0x70,
+    0xF0, 0x10, 0xF0, 0x80, 0xF0, 0xF0, 0x10, 0xF0, 0x10, 0xF0,
+    0x90, 0x90, 0xF0, 0x10, 0x10, 0xF0, 0x80, 0xF0, 0x10, 0xF0,
+    0xF0, 0x80, 0xF0, 0x90, 0xF0, 0xF0, 0x10, 0x20, 0x40, 0x40,
+    0xF0, 0x90, 0xF0, 0x90, 0xF0, 0xF0, 0x90, 0xF0, 0x10, 0xF0,
+    0xF0, 0x90, 0xF0, 0x90, 0x90, 0xE0, 0x90, 0xE0, 0x90, 0xE0,
+    0xF0, 0x80, 0x80, 0x80, 0xF0, 0xE0, 0x90, 0x90, 0x90, 0xE0,
+    0xF0, 0x80, 0xF0, 0x80, 0xF0, 0xF0, 0x80, 0xF0, 0x80, 0x80
+])
+
+# Binary save state: a header (magic, version, reserved, CRC-32 of the payload)
+# and a fixed-layout payload, so every snapshot has the same size and offsets
+STATE_MAGIC = b'C8ST'
+STATE_VERSION = 1
+STATE_STACK_DEPTH = 16
+_STATE_HEADER = struct.Struct('<4sHHI')
+_STATE_REGS = struct.Struct('<HHBBB%dH' % STATE_STACK_DEPTH)  # PC, I, DT, ST, SP, stack
+_STATE_REGS_OFFSET = _STATE_HEADER.size
+_STATE_MEMORY_OFFSET = _STATE_REGS_OFFSET + _STATE_REGS.size
+_STATE_V_OFFSET = _STATE_MEMORY_OFFSET + 4096
+_STATE_KEYPAD_OFFSET = _STATE_V_OFFSET + 16
+_STATE_DISPLAY_OFFSET = _STATE_KEYPAD_OFFSET + 16
+STATE_SIZE = _STATE_DISPLAY_OFFSET + 64 * 32
+_EMPTY_STACK = (0,) * STATE_STACK_DEPTH
+
+# Headless CHIP-8 machine: no Tk, no threads, safe to build in any process
+class Chip8Core:
+    WIDTH, HEIGHT = 64, 32
+    PROGRAM_START = 0x200
+    MAX_ROM_SIZE = 4096 - 0x200
+    # idle_state() results: the next instruction would spin without changing state
+    IDLE_KEY_WAIT = 'key_wait'
+    IDLE_SELF_JUMP = 'self_jump'
+
+    def __init__(self, cpu_speed=500, frame_rate=60, packed_display=False, seed=None):
+        self.CPU_SPEED = cpu_speed  # Hz
+        self.FRAME_RATE = frame_rate  # Hz
+        # Cxkk draws from a per-core generator so snapshots can capture it
+        self.rng = random.Random(seed)
+
+        self.memory = bytearray(4096)
+        self.memory[0:len(FONTSET)] = FONTSET
+        self.V = bytearray(16)
+        # Byte-per-pixel display, or a PackedFramebuffer with display unused
+        self.display = bytearray(self.WIDTH * self.HEIGHT)
+        self.packed = PackedFramebuffer(self.WIDTH, self.HEIGHT) if packed_display else None
+        self.table = packed_opcode_table() if packed_display else OPCODE_TABLE
+        self.stack = []
+        self.PC = self.PROGRAM_START
+        self.I = 0
+        self.delay_timer = 0
+        self.sound_timer = 0
+        self.keypad = bytearray(16)
+        self.draw_flag = False
+
+        # Opt-in PerfCounters; set via enable_perf() to swap in run_instrumented
+        self.perf = None
+        # Opt-in TraceRing; set via enable_trace() to swap in run_traced
+        self.trace = None
+        self.reported_unknown = False
+
+        # Translated basic blocks by start address, indexed per memory page
+        self.use_block_cache = True
+        self.blocks = {}
+        self.block_pages = [set() for _ in range(len(self.memory) >> BLOCK_PAGE_SHIFT)]
+
+    @property
+    def cycles_per_frame(self):
+        return self.CPU_SPEED // self.FRAME_RATE
+
+    def load_rom(self, rom):
+        if len(rom) > self.MAX_ROM_SIZE:
+            raise ValueError(f"ROM size exceeds {self.MAX_ROM_SIZE} bytes")
+        start = self.PROGRAM_START
+        self.memory[start:] = bytes(len(self.memory) - start)
+        self.memory[start:start + len(rom)] = rom
+        self.invalidate_code(start, len(self.memory))
+
+    def reset(self):
+        self.PC = self.PROGRAM_START
+        self.I = 0
+        self.stack.clear()
+        self.V[:] = bytes(16)
+        self.display = bytearray(self.WIDTH * self.HEIGHT)
+        if self.packed is not None:
+            self.packed.clear()
+        self.keypad[:] = bytes(16)
+        self.delay_timer = 0
+        self.sound_timer = 0
+        self.draw_flag = True
+
+    def set_key(self, key, pressed):
+        self.keypad[key] = 1 if pressed else 0
+
+    def framebuffer(self):
+        # One byte per pixel, row-major, 0 or 1
+        if self.packed is not None:
+            return bytes(self.packed.to_bytes())
+        return bytes(self.display)
+
+    def snapshot(self):
+        # Fast in-memory state for run-ahead: plain copies with no header or
+        # CRC, plus the RNG. The keypad is live input and is left out.
+        return {
+            'memory': bytes(self.memory),
+            'V': bytes(self.V),
+            'display': self.framebuffer(),
+            'stack': tuple(self.stack),
+            'PC': self.PC,
+            'I': self.I,
+            'delay_timer': self.delay_timer,
+            'sound_timer': self.sound_timer,
+            'rng': self.rng.getstate(),
+        }
+
+    def restore(self, state):
+        memory = state['memory']
+        if self.memory != memory:
+            # Put back only the pages that changed, so translated blocks for
+            # the rest of the program survive a rollback
+            page_size = 1 << BLOCK_PAGE_SHIFT
+            current = memoryview(self.memory)
+            for start in range(0, len(memory), page_size):
+                end = start + page_size
+                if current[start:end] != memory[start:end]:
+                    current[start:end] = memory[start:end]
+                    self.invalidate_code(start, end)
+        self.V[:] = state['V']
+        self.display = bytearray(state['display'])
+        if self.packed is not None:
+            self.packed.load_bytes(state['display'])
+        self.stack = list(state['stack'])
+        self.PC = state['PC']
+        self.I = state['I']
+        self.delay_timer = state['delay_timer']
+        self.sound_timer = state['sound_timer']
+        self.rng.setstate(state['rng'])
+        self.draw_flag = True
+
+    def run_ahead(self, frames):
+        # Emulates frames past the current state with the current input and
+        # returns the last framebuffer, then rolls back; the machine is left
+        # exactly as it was, RNG included
+        state = self.snapshot()
+        draw_flag = self.draw_flag
+        # Speculative frames stay out of the trace and the perf counters
+        trace, self.trace = self.trace, None
+        perf, self.perf = self.perf, None
+        for _ in range(frames):
+            self.run_cycles(self.cycles_per_frame)
+            self.tick_timers()
+        frame = self.framebuffer()
+        self.restore(state)
+        self.draw_flag = draw_flag
+        self.trace = trace
+        self.perf = perf
+        return frame
+
+    def save_state_bytes(self, buffer=None):
+        # Serialize into buffer (a writable STATE_SIZE buffer) or a new bytearray;
+        # _op_call keeps the stack within STATE_STACK_DEPTH, so this never fails
+        stack = self.stack
+        state = bytearray(STATE_SIZE) if buffer is None else buffer
+        view = memoryview(state)
+        _STATE_REGS.pack_into(state, _STATE_REGS_OFFSET, self.PC, self.I, self.delay_timer,
+                              self.sound_timer, len(stack), *stack, *_EMPTY_STACK[len(stack):])
+        view[_STATE_MEMORY_OFFSET:_STATE_V_OFFSET] = self.memory
+        view[_STATE_V_OFFSET:_STATE_KEYPAD_OFFSET] = self.V
+        view[_STATE_KEYPAD_OFFSET:_STATE_DISPLAY_OFFSET] = self.keypad
+        view[_STATE_DISPLAY_OFFSET:] = self.display if self.packed is None else self.packed.to_bytes()
+        _STATE_HEADER.pack_into(state, 0, STATE_MAGIC, STATE_VERSION, 0,
+                                zlib.crc32(view[_STATE_REGS_OFFSET:]))
+        return state
+
+    def load_state_bytes(self, state):
+        # The saved keypad is not restored: keys are live input, and putting
+        # back the ones held when the state was taken would leave them stuck
+        view = memoryview(state)
+        if len(view) != STATE_SIZE:
+            raise ValueError("Not a CHIP-8 save state (wrong size)")
+        magic, version, _, crc = _STATE_HEADER.unpack_from(view)
+        if magic != STATE_MAGIC:
+            raise ValueError("Not a CHIP-8 save state (bad magic)")
+        if version != STATE_VERSION:
+            raise ValueError(f"Unsupported save state version {version}")
+        if zlib.crc32(view[_STATE_REGS_OFFSET:]) != crc:
+            raise ValueError("Save state is corrupt (CRC mismatch)")
+        pc, I, delay_timer, sound_timer, depth, *stack = _STATE_REGS.unpack_from(view, _STATE_REGS_OFFSET)
+        memory = view[_STATE_MEMORY_OFFSET:_STATE_V_OFFSET]
+        if self.memory != memory:
+            self.memory[:] = memory
+            self.flush_blocks()
+        self.V[:] = view[_STATE_V_OFFSET:_STATE_KEYPAD_OFFSET]
+        self.display = bytearray(view[_STATE_DISPLAY_OFFSET:])
+        if self.packed is not None:
+            self.packed.load_bytes(self.display)
+        self.stack = stack[:depth]
+        self.PC = pc
+        self.I = I
+        self.delay_timer = delay_timer
+        self.sound_timer = sound_timer
+        self.draw_flag = True
+
+    def tick_timers(self):
+        # 60 Hz timer tick; the tone sounds while sound_timer > 0
+        if self.delay_timer > 0:
+            self.delay_timer -= 1
+        if self.sound_timer > 0:
+            self.sound_timer -= 1
+
+    def run_frames(self, frames):
+        perf = self.perf
+        for _ in range(frames):
+            start = time.perf_counter()
+            self.run_cycles(self.cycles_per_frame)
+            self.tick_timers()
+            if perf is not None:
+                perf.add_frame(time.perf_counter() - start)
+
+    def process_opcode(self):
+        if self.trace is not None:
+            self.run_traced(1)
+            return
+        opcode = (self.memory[self.PC] << 8) | self.memory[self.PC + 1]
+        handler, a, b = self.table[opcode]
+        self.PC = handler(self, self.V, self.PC, a, b)
+
+    def idle_state(self):
+        # IDLE_KEY_WAIT for Fx0A with no key down, IDLE_SELF_JUMP for a 1nnn
+        # that jumps to itself, else None. Timers still run while idle.
+        pc = self.PC
+        memory = self.memory
+        if pc + 1 >= len(memory):
+            return None
+        handler, a, b = self.table[(memory[pc] << 8) | memory[pc + 1]]
+        if handler is _op_jp and a == pc:
+            return self.IDLE_SELF_JUMP
+        if handler is _op_ld_key and not any(self.keypad):
+            return self.IDLE_KEY_WAIT
+        return None
+
+    def timers_pending(self):
+        return self.delay_timer > 0 or self.sound_timer > 0
+
+    def run_cycles(self, n):
+        # An idle machine would only re-execute the same no-op instruction
+        if self.idle_state() is not None:
+            if self.trace is not None or self.perf is not None:
+                self.run_idle(n)
+            return
+        if self.trace is not None:
+            self.run_traced(n)
+        elif self.perf is not None:
+            self.run_instrumented(n)
+        elif self.use_block_cache:
+            self.run_blocks(n)
+        else:
+            self.run_dispatch(n)
+
+    def enable_perf(self):
+        self.perf = PerfCounters(opcode_name=handler_name)
+        return self.perf
+
+    def disable_perf(self):
+        perf, self.perf = self.perf, None
+        return perf
+
+    def enable_trace(self, capacity=1 << 16, fault_path=None):
+        self.trace = TraceRing('chip8', TRACE_FORMAT, capacity, fault_path)
+        return self.trace
+
+    def disable_trace(self):
+        trace, self.trace = self.trace, None
+        return trace
+
+    def run_traced(self, n):
+        # run_dispatch plus one TraceRing record per instruction, written
+        # before it executes; takes precedence over run_instrumented, so perf
+        # only gets the instruction count while tracing
+        trace = self.trace
+        buffer = trace.buffer
+        pack_into = trace.record.pack_into
+        size = trace.record.size
+        end = len(buffer)
+        offset = trace.offset
+        sequence = trace.sequence
+        memory = self.memory
+        V = self.V
+        stack = self.stack
+        table = self.table
+        pc = self.PC
+        try:
+            for _ in range(n):
+                opcode = (memory[pc] << 8) | memory[pc + 1]
+                sequence += 1
+                pack_into(buffer, offset, sequence, pc, opcode, self.I,
+                          self.delay_timer, self.sound_timer, len(stack), V)
+                offset += size
+                if offset == end:
+                    offset = 0
+                handler, a, b = table[opcode]
+                pc = handler(self, V, pc, a, b)
+        finally:
+            # Also on a crash, so the ring and PC point at the faulting instruction
+            self.PC = pc
+            trace.offset = offset
+            trace.sequence = sequence
+        if self.perf is not None:
+            self.perf.instructions += n
+
+    def run_idle(self, n):
+        # Stands in for the n skipped cycles: one trace record of the parked
+        # instruction, with the sequence advanced past all of them, and the
+        # cycles counted as idle
+        trace = self.trace
+        if trace is not None:
+            pc = self.PC
+            memory = self.memory
+            trace.record.pack_into(trace.buffer, trace.offset, trace.sequence + 1, pc,
+                                   (memory[pc] << 8) | memory[pc + 1], self.I, self.delay_timer,
+                                   self.sound_timer, len(self.stack), self.V)
+            trace.offset += trace.record.size
+            if trace.offset == len(trace.buffer):
+                trace.offset = 0
+            trace.sequence += n
+        if self.perf is not None:
+            self.perf.idle_cycles += n
+
+    def run_instrumented(self, n):
+        # run_dispatch plus per-handler counts; only used while perf is set
+        perf = self.perf
+        counts = perf.opcode_counts
+        memory = self.memory
+        V = self.V
+        table = self.table
+        pc = self.PC
+        for _ in range(n):
+            handler, a, b = table[(memory[pc] << 8) | memory[pc + 1]]
+            counts[handler] += 1
+            pc = handler(self, V, pc, a, b)
+        self.PC = pc
+        perf.instructions += n
+
+    def run_dispatch(self, n):
+        # Batch fast path: PC, V and memory stay in locals for the whole run
+        memory = self.memory
+        V = self.V
+        table = self.table
+        pc = self.PC
+        for _ in range(n):
+            handler, a, b = table[(memory[pc] << 8) | memory[pc + 1]]
+            pc = handler(self, V, pc, a, b)
+        self.PC = pc
+
+    def run_blocks(self, n):
+        # One call per translated block; the tail that does not fit in the
+        # remaining budget is single-stepped so cycle counts stay exact
+        blocks = self.blocks
+        V = self.V
+        pc = self.PC
+        while n > 0:
+            entry = blocks.get(pc)
+            if entry is None:
+                entry = self.translate(pc)
+                if entry is None:
+                    break
+            block, length = entry
+            if length > n:
+                break
+            pc = block(self, V)
+            n -= length
+        self.PC = pc
+        if n > 0:
+            self.run_dispatch(n)
+
+    def translate(self, start):
+        translated = translate_block(self.memory, start, self.table)
+        if translated is None:
+            return None
+        block, length, end = translated
+        self.blocks[start] = (block, length)
+        for page in range(start >> BLOCK_PAGE_SHIFT, ((end - 1) >> BLOCK_PAGE_SHIFT) + 1):
+            self.block_pages[page].add(start)
+        return block, length
+
+    def invalidate_code(self, start, end):
+        # Drop only the blocks whose source bytes overlap [start, end)
+        blocks = self.blocks
+        if not blocks:
+            return
+        block_pages = self.block_pages
+        last_page = min((end - 1) >> BLOCK_PAGE_SHIFT, len(block_pages) - 1)
+        for page in range(start >> BLOCK_PAGE_SHIFT, last_page + 1):
+            for block_start in list(block_pages[page]):
+                entry = blocks.get(block_start)
+                if entry is None:
+                    block_pages[page].discard(block_start)
+                elif block_start < end and start < block_start + 2 * entry[1]:
+                    del blocks[block_start]
+                    block_pages[page].discard(block_start)
+
+    def flush_blocks(self):
+        self.blocks.clear()
+        for page in self.block_pages:
+            page.clear()
+
+# Class id per opcode for Chip8Batch, derived from the scalar decode table so
+# both engines agree on which opcodes exist
+_BATCH_EXECUTORS = {
+    _op_cls: '_exec_cls', _op_ret: '_exec_ret', _op_jp: '_exec_jp', _op_call: '_exec_call',
+    _op_se_byte: '_exec_se_byte', _op_sne_byte: '_exec_sne_byte', _op_se_reg: '_exec_se_reg',
+    _op_ld_byte: '_exec_ld_byte', _op_add_byte: '_exec_add_byte', _op_ld_reg: '_exec_ld_reg',
+    _op_or: '_exec_or', _op_and: '_exec_and', _op_xor: '_exec_xor', _op_add_reg: '_exec_add_reg',
+    _op_sub: '_exec_sub', _op_shr: '_exec_shr', _op_subn: '_exec_subn', _op_shl: '_exec_shl',
+    _op_sne_reg: '_exec_sne_reg', _op_ld_i: '_exec_ld_i', _op_jp_v0: '_exec_jp_v0',
+    _op_rnd: '_exec_rnd', _op_drw: '_exec_drw', _op_skp: '_exec_skp', _op_sknp: '_exec_sknp',
+    _op_ld_vx_dt: '_exec_ld_vx_dt', _op_ld_key: '_exec_ld_key', _op_ld_dt: '_exec_ld_dt',
+    _op_ld_st: '_exec_ld_st', _op_add_i: '_exec_add_i', _op_ld_font: '_exec_ld_font',
+    _op_bcd: '_exec_bcd', _op_store: '_exec_store', _op_load: '_exec_load',
+    _op_unknown: '_exec_unknown',
+}
+_BATCH_HANDLERS = list(_BATCH_EXECUTORS)
+_batch_class_table = None
+
+def _batch_classes():
+    global _batch_class_table
+    if _batch_class_table is None:
+        index = {handler: i for i, handler in enumerate(_BATCH_HANDLERS)}
+        _batch_class_table = np.array([index[entry[0]] for entry in OPCODE_TABLE], dtype=np.intp)
+    return _batch_class_table
+
+# N CHIP-8 machines as structure-of-arrays NumPy state, stepped in lockstep.
+# Each step fetches every opcode, groups instances by opcode class and applies
+# one vectorized executor per group, so divergent PCs cost one pass per class.
+# Differences from Chip8Core: addresses wrap at 4 KB instead of raising,
+# Ex9E/ExA1 use the low nibble of Vx, RND draws from a per-instance xorshift32
+# and unknown opcodes are skipped silently.
+class Chip8Batch:
+    WIDTH, HEIGHT = Chip8Core.WIDTH, Chip8Core.HEIGHT
+    PROGRAM_START = Chip8Core.PROGRAM_START
+    MAX_ROM_SIZE = Chip8Core.MAX_ROM_SIZE
+    STACK_DEPTH = STATE_STACK_DEPTH
+
+    def __init__(self, count, cpu_speed=500, frame_rate=60, seed=None):
+        if np is None:
+            raise RuntimeError("Chip8Batch requires NumPy")
+        self.count = count
+        self.CPU_SPEED = cpu_speed  # Hz
+        self.FRAME_RATE = frame_rate  # Hz
+
+        self.memory = np.zeros((count, 4096), dtype=np.uint8)
+        self.memory[:, :len(FONTSET)] = np.frombuffer(FONTSET, dtype=np.uint8)
+        self.V = np.zeros((count, 16), dtype=np.uint8)
+        self.display = np.zeros((count, self.HEIGHT), dtype=np.uint64)  # bit 63 is column 0
+        self.stack = np.zeros((count, self.STACK_DEPTH), dtype=np.intp)
+        self.sp = np.zeros(count, dtype=np.intp)
+        self.PC = np.full(count, self.PROGRAM_START, dtype=np.intp)
+        self.I = np.zeros(count, dtype=np.intp)
+        self.delay_timer = np.zeros(count, dtype=np.intp)
+        self.sound_timer = np.zeros(count, dtype=np.intp)
+        self.keypad = np.zeros((count, 16), dtype=np.uint8)
+        self.draw_flag = np.zeros(count, dtype=bool)
+        self.rng_state = np.zeros(count, dtype=np.uint32)
+        self.seed(seed)
+
+        self._rows = np.arange(count)
+        self._classes = _batch_classes()
+        self._executors = [getattr(self, _BATCH_EXECUTORS[h]) for h in _BATCH_HANDLERS]
+
+    @property
+    def cycles_per_frame(self):
+        return self.CPU_SPEED // self.FRAME_RATE
+
+    def seed(self, seed=None):
+        # seed may be an int (expanded per instance) or a sequence of N seeds
+        if seed is None or np.isscalar(seed):
+            state = np.random.SeedSequence(seed).generate_state(self.count, dtype=np.uint32)
+        else:
+            state = np.asarray(seed, dtype=np.uint32)
+        self.rng_state[:] = np.where(state == 0, 1, state)  # xorshift32 has a fixed point at 0
+
+    def load_rom(self, rom):
+        if len(rom) > self.MAX_ROM_SIZE:
+            raise ValueError(f"ROM size exceeds {self.MAX_ROM_SIZE} bytes")
+        start = self.PROGRAM_START
+        self.memory[:, start:] = 0
+        self.memory[:, start:start + len(rom)] = np.frombuffer(bytes(rom), dtype=np.uint8)
+
+    def reset(self):
+        self.PC[:] = self.PROGRAM_START
+        self.I[:] = 0
+        self.sp[:] = 0
+        self.V[:] = 0
+        self.display[:] = 0
+        self.keypad[:] = 0
+        self.delay_timer[:] = 0
+        self.sound_timer[:] = 0
+        self.draw_flag[:] = True
+
+    def set_keys(self, keypad):
+        # keypad: (N, 16) array of 0/1, or a 16-entry row applied to all
+        self.keypad[:] = keypad
+
+    def framebuffer(self, index):
+        # Same byte-per-pixel layout as Chip8Core.framebuffer()
+        rows = self.display[index].astype('>u8').view(np.uint8)
+        return np.unpackbits(rows).tobytes()
+
+    def framebuffers(self):
+        rows = self.display.astype('>u8').view(np.uint8).reshape(self.count, self.HEIGHT, 8)
+        return np.unpackbits(rows, axis=2)
+
+    def tick_timers(self):
+        self.delay_timer[self.delay_timer > 0] -= 1
+        self.sound_timer[self.sound_timer > 0] -= 1
+
+    def run_frames(self, frames):
+        cycles = self.cycles_per_frame
+        for _ in range(frames):
+            self.run_cycles(cycles)
+            self.tick_timers()
+
+    def run_cycles(self, n):
+        for _ in range(n):
+            self.step()
+
+    def step(self):
+        rows = self._rows
+        pc = self.PC
+        memory = self.memory
+        op = (memory[rows, pc & 0xFFF].astype(np.intp) << 8) | memory[rows, (pc + 1) & 0xFFF]
+        classes = self._classes[op]
+        first = classes[0]
+        if (classes == first).all():
+            self._executors[first](rows, op)
+            return
+        order = np.argsort(classes, kind='stable')
+        counts = np.bincount(classes, minlength=len(self._executors))
+        end = 0
+        for cls in np.flatnonzero(counts):
+            start, end = end, end + counts[cls]
+            sel = order[start:end]
+            self._executors[cls](sel, op[sel])
+
+    def _exec_cls(self, sel, op):
+        self.display[sel] = 0
+        self.draw_flag[sel] = True
+        self.PC[sel] += 2
+
+    def _exec_ret(self, sel, op):
+        sp = self.sp[sel]
+        has_frame = sp > 0
+        sp = np.where(has_frame, sp - 1, 0)
+        self.sp[sel] = sp
+        self.PC[sel] = np.where(has_frame, self.stack[sel, sp], self.PROGRAM_START) + 2
+
+    def _exec_jp(self, sel, op):
+        self.PC[sel] = op & 0xFFF
+
+    def _exec_call(self, sel, op):
+        # A full stack drops its oldest entry, as in _op_call
+        sp = self.sp[sel]
+        full = sp == self.STACK_DEPTH
+        if full.any():
+            rows = sel[full]
+            self.stack[rows, :-1] = self.stack[rows, 1:]
+            sp = sp - full
+        self.stack[sel, sp] = self.PC[sel]
+        self.sp[sel] = sp + 1
+        self.PC[sel] = op & 0xFFF
+
+    def _skip_if(self, sel, condition):
+        self.PC[sel] += np.where(condition, 4, 2)
+
+    def _exec_se_byte(self, sel, op):
+        self._skip_if(sel, self.V[sel, (op >> 8) & 0xF] == (op & 0xFF))
+
+    def _exec_sne_byte(self, sel, op):
+        self._skip_if(sel, self.V[sel, (op >> 8) & 0xF] != (op & 0xFF))
+
+    def _exec_se_reg(self, sel, op):
+        V = self.V
+        self._skip_if(sel, V[sel, (op >> 8) & 0xF] == V[sel, (op >> 4) & 0xF])
+
+    def _exec_sne_reg(self, sel, op):
+        V = self.V
+        self._skip_if(sel, V[sel, (op >> 8) & 0xF] != V[sel, (op >> 4) & 0xF])
+
+    def _exec_ld_byte(self, sel, op):
+        self.V[sel, (op >> 8) & 0xF] = op & 0xFF
+        self.PC[sel] += 2
+
+    def _exec_add_byte(self, sel, op):
+        x = (op >> 8) & 0xF
+        self.V[sel, x] = (self.V[sel, x].astype(np.intp) + (op & 0xFF)) & 0xFF
+        self.PC[sel] += 2
+
+    def _exec_ld_reg(self, sel, op):
+        V = self.V
+        V[sel, (op >> 8) & 0xF] = V[sel, (op >> 4) & 0xF]
+        self.PC[sel] += 2
+
+    def _exec_or(self, sel, op):
+        V = self.V
+        x = (op >> 8) & 0xF
+        V[sel, x] |= V[sel, (op >> 4) & 0xF]
+        self.PC[sel] += 2
+
+    def _exec_and(self, sel, op):
+        V = self.V
+        x = (op >> 8) & 0xF
+        V[sel, x] &= V[sel, (op >> 4) & 0xF]
+        self.PC[sel] += 2
+
+    def _exec_xor(self, sel, op):
+        V = self.V
+        x = (op >> 8) & 0xF
+        V[sel, x] ^= V[sel, (op >> 4) & 0xF]
+        self.PC[sel] += 2
+
+    # The 8xy4..8xyE executors write VF before re-reading Vx/Vy, in the same
+    # order as the scalar handlers, so x or y == F behaves identically
+    def _exec_add_reg(self, sel, op):
+        V = self.V
+        x = (op >> 8) & 0xF
+        result = V[sel, x].astype(np.intp) + V[sel, (op >> 4) & 0xF]
+        V[sel, 0xF] = result > 0xFF
+        V[sel, x] = result & 0xFF
+        self.PC[sel] += 2
+
+    def _exec_sub(self, sel, op):
+        V = self.V
+        x, y = (op >> 8) & 0xF, (op >> 4) & 0xF
+        V[sel, 0xF] = V[sel, x] > V[sel, y]
+        V[sel, x] = (V[sel, x].astype(np.intp) - V[sel, y]) & 0xFF
+        self.PC[sel] += 2
+
+    def _exec_shr(self, sel, op):
+        V = self.V
+        x = (op >> 8) & 0xF
+        V[sel, 0xF] = V[sel, x] & 0x1
+        V[sel, x] = V[sel, x] >> 1
+        self.PC[sel] += 2
+
+    def _exec_subn(self, sel, op):
+        V = self.V
+        x, y = (op >> 8) & 0xF, (op >> 4) & 0xF
+        V[sel, 0xF] = V[sel, y] > V[sel, x]
+        V[sel, x] = (V[sel, y].astype(np.intp) - V[sel, x]) & 0xFF
+        self.PC[sel] += 2
+
+    def _exec_shl(self, sel, op):
+        V = self.V
+        x = (op >> 8) & 0xF
+        V[sel, 0xF] = (V[sel, x] >> 7) & 0x1
+        V[sel, x] = (V[sel, x].astype(np.intp) << 1) & 0xFF
+        self.PC[sel] += 2
+
+    def _exec_ld_i(self, sel, op):
+        self.I[sel] = op & 0xFFF
+        self.PC[sel] += 2
+
+    def _exec_jp_v0(self, sel, op):
+        self.PC[sel] = (op & 0xFFF) + self.V[sel, 0]
+
+    def _exec_rnd(self, sel, op):
+        state = self.rng_state[sel]
+        state ^= state << np.uint32(13)
+        state ^= state >> np.uint32(17)
+        state ^= state << np.uint32(5)
+        self.rng_state[sel] = state
+        self.V[sel, (op >> 8) & 0xF] = (state >> np.uint32(24)) & (op & 0xFF)
+        self.PC[sel] += 2
+
+    def _exec_drw(self, sel, op):
+        V = self.V
+        n = op & 0xF
+        x_coord = (V[sel, (op >> 8) & 0xF] % self.WIDTH).astype(np.uint64)
+        y_coord = (V[sel, (op >> 4) & 0xF] % self.HEIGHT).astype(np.intp)
+        I = self.I[sel]
+        collision = np.zeros(len(sel), dtype=bool)
+        V[sel, 0xF] = 0
+        for row in range(int(n.max(initial=0))):
+            active = (row < n) & (y_coord + row < self.HEIGHT)
+            rows = sel[active]
+            if not len(rows):
+                continue
+            sprite = self.memory[rows, (I[active] + row) & 0xFFF].astype(np.uint64)
+            bits = (sprite << np.uint64(56)) >> x_coord[active]  # columns past 63 fall off
+            line = y_coord[active] + row
+            current = self.display[rows, line]
+            collision[active] |= (current & bits) != 0
+            self.display[rows, line] = current ^ bits
+        V[sel, 0xF] = collision
+        self.draw_flag[sel] = True
+        self.PC[sel] += 2
+
+    def _exec_skp(self, sel, op):
+        self._skip_if(sel, self.keypad[sel, self.V[sel, (op >> 8) & 0xF] & 0xF] != 0)
+
+    def _exec_sknp(self, sel, op):
+        self._skip_if(sel, self.keypad[sel, self.V[sel, (op >> 8) & 0xF] & 0xF] == 0)
+
+    def _exec_ld_vx_dt(self, sel, op):
+        self.V[sel, (op >> 8) & 0xF] = self.delay_timer[sel]
+        self.PC[sel] += 2
+
+    def _exec_ld_key(self, sel, op):
+        keys = self.keypad[sel]
+        pressed = keys.any(axis=1)
+        waiting = sel[pressed]
+        self.V[waiting, ((op >> 8) & 0xF)[pressed]] = keys[pressed].argmax(axis=1)
+        self.PC[waiting] += 2
+
+    def _exec_ld_dt(self, sel, op):
+        self.delay_timer[sel] = self.V[sel, (op >> 8) & 0xF]
+        self.PC[sel] += 2
+
+    def _exec_ld_st(self, sel, op):
+        self.sound_timer[sel] = self.V[sel, (op >> 8) & 0xF]
+        self.PC[sel] += 2
+
+    def _exec_add_i(self, sel, op):
+        self.I[sel] = (self.I[sel] + self.V[sel, (op >> 8) & 0xF]) & 0xFFF
+        self.PC[sel] += 2
+
+    def _exec_ld_font(self, sel, op):
+        self.I[sel] = (self.V[sel, (op >> 8) & 0xF] & 0xF).astype(np.intp) * 5
+        self.PC[sel] += 2
+
+    def _exec_bcd(self, sel, op):
+        value = self.V[sel, (op >> 8) & 0xF]
+        I = self.I[sel]
+        self.memory[sel, I & 0xFFF] = value // 100
+        self.memory[sel, (I + 1) & 0xFFF] = (value // 10) % 10
+        self.memory[sel, (I + 2) & 0xFFF] = value % 10
+        self.PC[sel] += 2
+
+    def _exec_store(self, sel, op):
+        x = (op >> 8) & 0xF
+        I = self.I[sel]
+        for i in range(int(x.max()) + 1):
+            active = x >= i
+            rows = sel[active]
+            self.memory[rows, (I[active] + i) & 0xFFF] = self.V[rows, i]
+        self.PC[sel] += 2
+
+    def _exec_load(self, sel, op):
+        x = (op >> 8) & 0xF
+        I = self.I[sel]
+        for i in range(int(x.max()) + 1):
+            active = x >= i
+            rows = sel[active]
+            self.V[rows, i] = self.memory[rows, (I[active] + i) & 0xFFF]
+        self.PC[sel] += 2
+
+    def _exec_unknown(self, sel, op):
+        self.PC[sel] += 2
+
+# Single-slot frame handoff: the emulation thread overwrites, the UI thread
+# takes the newest frame on its own schedule, so nothing queues up behind Tk
+class LatestFrame:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.frame = None
+        self.overwritten = 0
+
+    def publish(self, frame):
+        with self.lock:
+            if self.frame is not None:
+                self.overwritten += 1
+            self.frame = frame
+
+    def take(self):
+        with self.lock:
+            frame, self.frame = self.frame, None
+        return frame
+
+# Frame pacing against accumulated perf_counter deadlines. speed is a
+# fast-forward multiplier, turbo runs uncapped. end_frame() sleeps until the
+# next deadline and says whether the frame just emulated should be presented:
+# frames are skipped while the host is behind (at most max_skip in a row) and
+# never presented faster than the host frame rate.
+class FrameScheduler:
+    def __init__(self, frame_rate=60, max_skip=4, resync_frames=8):
+        self.frame_time = 1.0 / frame_rate
+        self.speed = 1.0
+        self.turbo = False
+        self.max_skip = max_skip
+        self.resync_time = resync_frames * self.frame_time
+        self.late_frames = 0
+        self.skipped_frames = 0
+        self.reset()
+
+    def reset(self):
+        # Restart pacing from now, e.g. after a pause or a speed change
+        self.deadline = time.perf_counter()
+        self.last_present = self.deadline - self.frame_time
+        self.skip_run = 0
+
+    def end_frame(self):
+        now = time.perf_counter()
+        if self.turbo:
+            self.deadline = now
+        else:
+            self.deadline += self.frame_time / self.speed
+            if now - self.deadline > self.resync_time:
+                self.deadline = now  # hitch (debugger, swap): don't try to catch up
+        behind = now > self.deadline
+        if behind and not self.turbo:
+            self.late_frames += 1
+        if now - self.last_present < self.frame_time * 0.75:
+            present = False  # fast-forward/turbo: already presented this host frame
+        elif behind and not self.turbo and self.skip_run < self.max_skip:
+            present = False
+        else:
+            present = True
+        if present:
+            self.last_present = now
+            self.skip_run = 0
+        else:
+            self.skip_run += 1
+            self.skipped_frames += 1
+        delay = self.deadline - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        return present
+
+# Per-frame rewind history. Each group starts with a zlib-compressed keyframe;
+# the frames after it are stored as compressed XOR deltas against that
+# keyframe, which are mostly zeros. The oldest groups are dropped to stay
+# within budget bytes.
+class RewindBuffer:
+    def __init__(self, budget=8 * 1024 * 1024, keyframe_interval=120):
+        self.budget = budget
+        self.keyframe_interval = keyframe_interval
+        self.entries = deque()  # (compressed keyframe, compressed delta or None)
+        self.size = 0
+        self.keyframe = None  # raw bytes of the group being appended to
+        self.packed_keyframe = None
+        self.since_keyframe = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def clear(self):
+        self.entries.clear()
+        self.size = 0
+        self.keyframe = None
+
+    def push(self, state):
+        state = bytes(state)
+        if self.keyframe is None or self.since_keyframe >= self.keyframe_interval:
+            self.keyframe = state
+            self.packed_keyframe = zlib.compress(state, 1)
+            self.since_keyframe = 0
+            entry = (self.packed_keyframe, None)
+            stored = len(self.packed_keyframe)
+        else:
+            delta = int.from_bytes(state, 'little') ^ int.from_bytes(self.keyframe, 'little')
+            packed = zlib.compress(delta.to_bytes(len(state), 'little'), 1)
+            entry = (self.packed_keyframe, packed)
+            stored = len(packed)
+        self.entries.append(entry)
+        self.since_keyframe += 1
+        self.size += stored
+        while self.size > self.budget and len(self.entries) > 1:
+            self._drop_oldest_group()
+
+    def pop(self):
+        # Newest state, removed from history; None once history is exhausted
+        if not self.entries:
+            return None
+        packed_keyframe, packed = self.entries.pop()
+        self.size -= len(packed if packed is not None else packed_keyframe)
+        self.keyframe = None  # the next push starts a fresh group
+        keyframe = zlib.decompress(packed_keyframe)
+        if packed is None:
+            return keyframe
+        delta = int.from_bytes(zlib.decompress(packed), 'little')
+        return (delta ^ int.from_bytes(keyframe, 'little')).to_bytes(len(keyframe), 'little')
+
+    def _drop_oldest_group(self):
+        entries = self.entries
+        self.size -= len(entries.popleft()[0])
+        while entries and entries[0][1] is not None:
+            self.size -= len(entries.popleft()[1])
+        if not entries:
+            self.keyframe = None
+
+# Persistent canvas items, one per pixel; each present only toggles the
+# pixels that changed since the last presented frame
+class CanvasRenderer:
+    def __init__(self, canvas, width, height, scale, color='white'):
+        self.canvas = canvas
+        self.width, self.height = width, height
+        self.items = [canvas.create_rectangle(x * scale, y * scale, (x + 1) * scale, (y + 1) * scale,
+                                              fill=color, outline='', state='hidden')
+                      for y in range(height) for x in range(width)]
+        self.presented = bytearray(width * height)
+
+    def present(self, display):
+        # Returns the number of canvas items touched
+        previous = self.presented
+        if previous == display:
+            return 0
+        itemconfigure = self.canvas.itemconfigure
+        items = self.items
+        width = self.width
+        changed = 0
+        for start in range(0, width * self.height, width):
+            end = start + width
+            row = display[start:end]
+            if previous[start:end] == row:
+                continue
+            for i in range(start, end):
+                pixel = display[i]
+                if pixel != previous[i]:
+                    itemconfigure(items[i], state='normal' if pixel else 'hidden')
+                    changed += 1
+            previous[start:end] = row
+        return changed
+
+# Square-wave beeper for the sound timer. The emulation thread assigns
+# `active` each frame; only a change sets the `changed` event, so the setter
+# costs nothing. start() spawns the tone thread, which sleeps until the first
+# beep and only then opens a backend, so a ROM that never beeps never loads an
+# audio library and the emulation thread never waits on one. Tone is rendered
+# from a looping wave table whose phase carries over between blocks, so it
+# lasts exactly as long as the timer runs and never clicks at block
+# boundaries. Backends, best first: a sounddevice callback stream, a pygame
+# mixer channel, a looping winsound file, and finally the terminal bell on each
+# rising edge. The tone thread blocks on `changed` while silent instead of
+# polling.
+class ToneGenerator:
+    def __init__(self, frequency=440, sample_rate=44100, volume=0.2, block=512):
+        self.frequency = frequency
+        self.volume = volume
+        self.block = block
+        self._active = False
+        self.changed = threading.Event()
+        self.backend = None
+        self.running = False
+        self.closed = False
+        self.thread = None
+        self.stream = None
+        self.wav_path = None
+        self.configure(sample_rate, 1)
+
+    def configure(self, sample_rate, channels):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.frame_bytes = 2 * channels
+        # Whole periods only, so the table loops seamlessly
+        self.period = max(2, round(sample_rate / self.frequency))
+        self.phase = 0
+        self.wave = self.make_wave(self.block // self.period + 2)
+
+    @property
+    def active(self):
+        return self._active
+
+    @active.setter
+    def active(self, value):
+        if value != self._active:
+            self._active = value
+            self.changed.set()
+
+    def make_wave(self, periods):
+        amplitude = int(32767 * self.volume)
+        half = self.period // 2
+        cycle = [amplitude] * half + [-amplitude] * (self.period - half)
+        return array('h', [s for s in cycle * periods for _ in range(self.channels)]).tobytes()
+
+    def render(self, count):
+        # count frames of tone or silence as native int16 bytes
+        size = count * self.frame_bytes
+        if not self._active:
+            return bytes(size)
+        start = self.phase * self.frame_bytes
+        if start + size > len(self.wave):
+            self.wave = self.make_wave(count // self.period + 2)
+        self.phase = (self.phase + count) % self.period
+        return self.wave[start:start + size]
+
+    def start(self):
+        if self.thread is None and not self.closed:
+            self.running = True
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+
+    def run(self):
+        # Tone thread: wait for the first beep, open a backend, run its loop
+        while self.running and not self._active:
+            self.changed.clear()
+            if not self._active:
+                self.changed.wait()
+        if not self.running:
+            return
+        for backend in (self.open_sounddevice, self.open_pygame, self.open_winsound):
+            try:
+                loop = backend()
+            except Exception:
+                continue  # No device or driver; try the next backend
+            if loop is not None:
+                break
+        else:
+            self.backend = 'bell'
+            loop = self.watch_bell
+        loop()
+        if self.stream is not None and not self.running:
+            self.stream.close()  # opened while close() was already running
+            self.stream = None
+
+    # Each open_* returns the loop the tone thread runs, or None if unavailable
+    def open_sounddevice(self):
+        if sounddevice is None:
+            return None
+
+        def callback(outdata, frames, time_info, status):
+            outdata[:] = self.render(frames)
+
+        self.stream = sounddevice.RawOutputStream(samplerate=self.sample_rate, channels=1, dtype='int16',
+                                                  blocksize=self.block, callback=callback)
+        self.stream.start()
+        self.backend = 'sounddevice'
+        return self.hold_stream
+
+    def hold_stream(self):
+        # The stream's own callback thread renders; wait here until close()
+        while self.running:
+            self.changed.clear()
+            if self.running:
+                self.changed.wait()
+
+    def open_pygame(self):
+        try:
+            import pygame  # Imported here so the Tk front end never pays for it otherwise
+        except ImportError:
+            return None
+        if not pygame.mixer.get_init():
+            pygame.mixer.init(self.sample_rate, -16, 1, self.block)
+        rate, size, channels = pygame.mixer.get_init()
+        if size != -16:
+            return None
+        self.configure(rate, channels)
+        channel = pygame.mixer.Channel(pygame.mixer.get_num_channels() - 1)
+        self.backend = 'pygame'
+        return lambda: self.feed_pygame(pygame.mixer.Sound, channel)
+
+    def feed_pygame(self, Sound, channel):
+        # Keep one block queued behind the playing one while the tone is on;
+        # when it goes off the queue drains and the thread sleeps until the
+        # next beep
+        nap = self.block / self.sample_rate / 4
+        while self.running:
+            self.changed.clear()
+            if not self._active:
+                self.changed.wait()
+            elif channel.get_queue() is None:
+                sound = Sound(buffer=self.render(self.block))
+                if channel.get_busy():
+                    channel.queue(sound)
+                else:
+                    channel.play(sound)
+            else:
+                time.sleep(nap)
+        channel.stop()
+
+    def open_winsound(self):
+        if winsound is None or sys.platform != "win32":
+            return None
+        # winsound cannot loop from memory asynchronously, so loop a file
+        # holding one second of whole periods
+        periods = self.sample_rate // self.period
+        fd, self.wav_path = tempfile.mkstemp(suffix='.wav')
+        with os.fdopen(fd, 'wb') as f, wave.open(f, 'wb') as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(self.sample_rate)
+            wav.writeframes(self.make_wave(periods))
+        self.backend = 'winsound'
+        return self.watch_winsound
+
+    def watch_winsound(self):
+        playing = False
+        while self.running:
+            # Clear before checking so a change between the check and wait() is kept
+            self.changed.clear()
+            if self._active != playing:
+                playing = not playing
+                if playing:
+                    winsound.PlaySound(self.wav_path, winsound.SND_FILENAME | winsound.SND_ASYNC | winsound.SND_LOOP)
+                else:
+                    winsound.PlaySound(None, winsound.SND_PURGE)
+            self.changed.wait()
+        winsound.PlaySound(None, winsound.SND_PURGE)
+
+    def watch_bell(self):
+        ringing = False
+        while self.running:
+            self.changed.clear()
+            if self._active and not ringing:
+                print("\a", end='', flush=True)
+            ringing = self._active
+            self.changed.wait()
+
+    def close(self):
+        self.closed = True
+        self._active = False
+        self.running = False
+        self.changed.set()
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
+        if self.thread is not None:
+            self.thread.join(0.5)
+            self.thread = None
+        if self.wav_path is not None:
+            os.unlink(self.wav_path)
+            self.wav_path = None
+
 class OptimizedChip8Emulator:
-    def __init__(self, root):
+    POLL_MS = 8  # UI checks the frame slot at twice the display rate
+    STATS_MS = 1000
+    FAST_FORWARD = 4.0  # speed multiplier while Tab is held; BackSpace rewinds
+    MAX_RUN_AHEAD = 3  # frames; each costs one extra emulated frame per presented frame
+
+    def __init__(self, root, core=None):
         self.root = root
         self.gui = NesticleInspiredGUI(root)
         self.root.title("CHIP-8 Emulator - Nesticle Style")
@@ -43,11 +1591,10 @@ class OptimizedChip8Emulator:
         self.root.resizable(False, False)
         self.root.configure(bg='#808080')
 
-        # Constants
-        self.WIDTH, self.HEIGHT = 64, 32
+        # Emulator state lives in the headless core; this class only drives it
+        self.core = core if core is not None else Chip8Core()
+        self.WIDTH, self.HEIGHT = self.core.WIDTH, self.core.HEIGHT
         self.SCALE = 10
-        self.CPU_SPEED = 500  # Hz
-        self.FRAME_RATE = 60  # Hz
 
         # Display setup with a sunken frame like Nesticle
         self.canvas_frame = self.gui.create_canvas_frame(self.root)
@@ -59,19 +1606,8 @@ class OptimizedChip8Emulator:
                               highlightthickness=0)
         self.canvas.pack()
         
-        # Emulator state
-        self.memory = bytearray(4096)
-        self.V = bytearray(16)
-        self.display = bytearray(self.WIDTH * self.HEIGHT)
-        self.stack = []
-        self.PC = 0x200
-        self.I = 0
-        self.delay_timer = 0
-        self.sound_timer = 0
-        self.keypad = bytearray(16)
         self.running = False
         self.paused = False
-        self.draw_flag = False
 
         # Key mapping (CHIP-8 standard)
         self.key_map = {
@@ -86,23 +1622,26 @@ class OptimizedChip8Emulator:
         self.root.bind('<KeyPress>', self.key_press)
         self.root.bind('<KeyRelease>', self.key_release)
 
-        # Fontset
-        fontset = [
-            0xF0, 0x90, 0x90, 0x90, 0xF0, 0x20, 0x60, 0x20, 0x20, 0x70,
-            0xF0, 0x10, 0xF0, 0x80, 0xF0, 0xF0, 0x10, 0xF0, 0x10, 0xF0,
-            0x90, 0x90, 0xF0, 0x10, 0x10, 0xF0, 0x80, 0xF0, 0x10, 0xF0,
-            0xF0, 0x80, 0xF0, 0x90, 0xF0, 0xF0, 0x10, 0x20, 0x40, 0x40,
-            0xF0, 0x90, 0xF0, 0x90, 0xF0, 0xF0, 0x90, 0xF0, 0x10, 0xF0,
-            0xF0, 0x90, 0xF0, 0x90, 0x90, 0xE0, 0x90, 0xE0, 0x90, 0xE0,
-            0xF0, 0x80, 0x80, 0x80, 0xF0, 0xE0, 0x90, 0x90, 0x90, 0xE0,
-            0xF0, 0x80, 0xF0, 0x80, 0xF0, 0xF0, 0x80, 0xF0, 0x80, 0x80
-        ]
-        self.memory[0:80] = fontset
-
         self.setup_ui()
-        self.pixel_coords = [(x * self.SCALE, y * self.SCALE, (x + 1) * self.SCALE, (y + 1) * self.SCALE)
-                           for y in range(self.HEIGHT) for x in range(self.WIDTH)]
+        self.renderer = CanvasRenderer(self.canvas, self.WIDTH, self.HEIGHT, self.SCALE)
+        self.scheduler = FrameScheduler(self.core.FRAME_RATE)
+        self.frames = LatestFrame()
+        self.rewind = RewindBuffer()
+        self.rewinding = False
+        # Run-ahead: present the frame this many frames past the real state
+        self.run_ahead = 0
+        # Set whenever something could end an idle or paused wait
+        self.wake = threading.Event()
         self.emulation_thread = None
+        # Sound runs on its own thread, which opens the backend on the first
+        # beep; the emulation loop only flips tone.active
+        self.tone = ToneGenerator()
+        self.tone.start()
+        # Pending after() ids, cancelled when the window goes away
+        self.poll_id = self.root.after(self.POLL_MS, self.poll_frames)
+        self.stats_id = None
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
+        self.canvas.bind('<Destroy>', lambda event: self.shutdown())
 
     def setup_ui(self):
         control_frame = self.gui.create_frame(self.root)
@@ -116,11 +1655,21 @@ class OptimizedChip8Emulator:
         self.gui.create_button(control_frame, "Step", self.step).pack(side=tk.LEFT, padx=5)
         self.gui.create_button(control_frame, "Save State", self.save_state).pack(side=tk.LEFT, padx=5)
         self.gui.create_button(control_frame, "Load State", self.load_state).pack(side=tk.LEFT, padx=5)
+        self.turbo_btn = self.gui.create_button(control_frame, "Turbo", self.toggle_turbo)
+        self.turbo_btn.pack(side=tk.LEFT, padx=5)
+        self.stats_btn = self.gui.create_button(control_frame, "Stats", self.toggle_stats)
+        self.stats_btn.pack(side=tk.LEFT, padx=5)
+        self.trace_btn = self.gui.create_button(control_frame, "Trace", self.toggle_trace)
+        self.trace_btn.pack(side=tk.LEFT, padx=5)
+        self.run_ahead_btn = self.gui.create_button(control_frame, "Ahead: 0", self.cycle_run_ahead)
+        self.run_ahead_btn.pack(side=tk.LEFT, padx=5)
 
         self.status_frame = self.gui.create_frame(self.root)
         self.status_frame.pack(fill='x', padx=10, pady=5)
         self.status_label = self.gui.create_label(self.status_frame, "Status: Stopped")
         self.status_label.pack(side=tk.LEFT, padx=5)
+        self.stats_label = self.gui.create_label(self.status_frame, "")
+        self.stats_label.pack(side=tk.RIGHT, padx=5)
 
         speed_frame = self.gui.create_frame(control_frame)
         speed_frame.pack(side=tk.RIGHT, padx=5)
@@ -131,11 +1680,11 @@ class OptimizedChip8Emulator:
                                   bg='#808080', fg='#FFFFFF', 
                                   troughcolor='#8B0000', highlightthickness=0,
                                   font=('Fixedsys', 8))
-        self.speed_scale.set(self.CPU_SPEED)
+        self.speed_scale.set(self.core.CPU_SPEED)
         self.speed_scale.pack(side=tk.LEFT)
 
     def update_speed(self, value):
-        self.CPU_SPEED = int(value)
+        self.core.CPU_SPEED = int(value)
 
     def load_rom_dialog(self):
         rom_path = filedialog.askopenfilename(filetypes=[("CHIP-8 ROMs", "*.ch8 *.rom")])
@@ -149,33 +1698,85 @@ class OptimizedChip8Emulator:
 
     def load_rom(self, path):
         with open(path, 'rb') as f:
-            rom = f.read()
-            if len(rom) > 3584:
-                raise ValueError("ROM size exceeds 3584 bytes")
-            self.memory[0x200:0x200 + len(rom)] = rom
+            self.core.load_rom(f.read())
 
     def reset(self):
-        self.PC = 0x200
-        self.I = 0
-        self.stack.clear()
-        self.V = bytearray(16)
-        self.display = bytearray(self.WIDTH * self.HEIGHT)
-        self.keypad = bytearray(16)
-        self.delay_timer = 0
-        self.sound_timer = 0
-        self.draw_flag = True
+        self.core.reset()
+        self.rewind.clear()
         self.paused = False
         self.running = False
+        self.wake.set()
         self.update_display()
         self.status_label.config(text="Status: Stopped")
 
     def key_press(self, event):
         if event.keysym in self.key_map:
-            self.keypad[self.key_map[event.keysym]] = 1
+            self.core.set_key(self.key_map[event.keysym], True)
+        elif event.keysym == 'Tab':
+            self.scheduler.speed = self.FAST_FORWARD
+        elif event.keysym == 'BackSpace':
+            self.rewinding = True
+        self.wake.set()
 
     def key_release(self, event):
         if event.keysym in self.key_map:
-            self.keypad[self.key_map[event.keysym]] = 0
+            self.core.set_key(self.key_map[event.keysym], False)
+        elif event.keysym == 'Tab':
+            self.scheduler.speed = 1.0
+            self.scheduler.reset()
+        elif event.keysym == 'BackSpace':
+            self.rewinding = False
+
+    def toggle_stats(self):
+        core = self.core
+        if core.perf is None:
+            self.scheduler.late_frames = self.scheduler.skipped_frames = 0
+            self.frames.overwritten = 0
+            core.enable_perf()
+            self.stats_btn.config(relief='sunken')
+            if self.stats_id is None:
+                self.stats_id = self.root.after(self.STATS_MS, self.update_stats)
+        else:
+            perf = core.disable_perf()
+            self.stats_btn.config(relief='raised')
+            self.stats_label.config(text="")
+            path = filedialog.asksaveasfilename(defaultextension=".json", title="Save stats as JSON")
+            if path:
+                perf.dump_json(path)
+
+    def toggle_trace(self):
+        # While on, the first unknown opcode also dumps the ring to the temp dir
+        core = self.core
+        if core.trace is None:
+            core.enable_trace(fault_path=os.path.join(tempfile.gettempdir(), 'chip8-fault.trace'))
+            self.trace_btn.config(relief='sunken')
+        else:
+            trace = core.disable_trace()
+            self.trace_btn.config(relief='raised')
+            path = filedialog.asksaveasfilename(defaultextension=".trace", title="Save execution trace")
+            if path:
+                trace.dump(path)
+
+    def update_stats(self):
+        perf = self.core.perf
+        if perf is None:
+            self.stats_id = None
+            return
+        perf.late_frames = self.scheduler.late_frames
+        perf.dropped_frames = self.scheduler.skipped_frames + self.frames.overwritten
+        perf.sample()
+        self.stats_label.config(text=perf.summary())
+        self.stats_id = self.root.after(self.STATS_MS, self.update_stats)
+
+    def toggle_turbo(self):
+        scheduler = self.scheduler
+        scheduler.turbo = not scheduler.turbo
+        scheduler.reset()
+        self.turbo_btn.config(relief='sunken' if scheduler.turbo else 'raised')
+
+    def cycle_run_ahead(self):
+        self.run_ahead = (self.run_ahead + 1) % (self.MAX_RUN_AHEAD + 1)
+        self.run_ahead_btn.config(text=f"Ahead: {self.run_ahead}")
 
     def toggle_run(self):
         if not self.running:
@@ -188,232 +1789,127 @@ class OptimizedChip8Emulator:
                 self.emulation_thread.start()
         else:
             self.running = False
+            self.wake.set()
             self.run_btn.config(text="Run")
             self.status_label.config(text="Status: Stopped")
 
     def toggle_pause(self):
         if self.running:
             self.paused = not self.paused
+            self.wake.set()
             self.status_label.config(text=f"Status: {'Paused' if self.paused else 'Running'}")
 
     def step(self):
         if not self.running or self.paused:
-            self.process_opcode()
+            self.core.process_opcode()
             self.update_display()
 
     def save_state(self):
-        state = {
-            'memory': self.memory.copy(),
-            'V': self.V.copy(),
-            'display': self.display.copy(),
-            'stack': self.stack.copy(),
-            'PC': self.PC,
-            'I': self.I,
-            'delay_timer': self.delay_timer,
-            'sound_timer': self.sound_timer,
-            'keypad': self.keypad.copy()
-        }
+        state = self.core.save_state_bytes()
         path = filedialog.asksaveasfilename(defaultextension=".c8state")
         if path:
             with open(path, 'wb') as f:
-                pickle.dump(state, f)
+                f.write(state)
             messagebox.showinfo("Success", "State saved successfully")
 
     def load_state(self):
         path = filedialog.askopenfilename(filetypes=[("CHIP-8 State", "*.c8state")])
         if path:
-            with open(path, 'rb') as f:
-                state = pickle.load(f)
-                self.memory = state['memory']
-                self.V = state['V']
-                self.display = state['display']
-                self.stack = state['stack']
-                self.PC = state['PC']
-                self.I = state['I']
-                self.delay_timer = state['delay_timer']
-                self.sound_timer = state['sound_timer']
-                self.keypad = state['keypad']
-                self.draw_flag = True
-                self.update_display()
-                self.status_label.config(text="Status: State Loaded")
-
-    def play_sound(self):
-        if winsound and sys.platform == "win32":
-            winsound.Beep(440, 100)  # 440 Hz for 100ms
-        else:
-            print("\a", end='', flush=True)  # Fallback beep
+            try:
+                with open(path, 'rb') as f:
+                    self.core.load_state_bytes(f.read())
+            except ValueError as e:
+                messagebox.showerror("Error", f"Failed to load state: {str(e)}")
+                return
+            self.rewind.clear()
+            self.wake.set()
+            self.update_display()
+            self.status_label.config(text="Status: State Loaded")
 
     def emulation_loop(self):
-        cycles_per_frame = self.CPU_SPEED // self.FRAME_RATE
-        frame_time = 1.0 / self.FRAME_RATE
-        
+        core = self.core
+        scheduler = self.scheduler
+        tone = self.tone
+        scheduler.reset()
+
         while self.running:
-            start_time = time.time()
-            
-            if not self.paused:
-                for _ in range(cycles_per_frame):
-                    self.process_opcode()
-                
-                if self.delay_timer > 0:
-                    self.delay_timer -= 1
-                if self.sound_timer > 0:
-                    self.sound_timer -= 1
-                    if self.sound_timer == 1:
-                        self.play_sound()
-                
-                self.root.after(0, self.update_display)
-            
-            elapsed = time.time() - start_time
-            sleep_time = max(0, frame_time - elapsed)
-            time.sleep(sleep_time)
+            # Clear before checking so a wake between the check and wait() is kept
+            self.wake.clear()
+            if self.paused or (not self.rewinding and core.idle_state() is not None
+                               and not core.timers_pending()):
+                # Nothing can change until input, unpause or stop: block on the
+                # event instead of polling. Idle with timers pending still runs
+                # frames, but run_cycles returns immediately.
+                tone.active = False
+                if core.draw_flag:
+                    # The last active frame may have been skipped by the scheduler
+                    core.draw_flag = False
+                    self.frames.publish(core.framebuffer())
+                self.wake.wait()
+                scheduler.reset()
+                continue
 
-    def process_opcode(self):
-        opcode = (self.memory[self.PC] << 8) | self.memory[self.PC + 1]
-        x = (opcode >> 8) & 0x0F
-        y = (opcode >> 4) & 0x0F
-        nnn = opcode & 0x0FFF
-        kk = opcode & 0x00FF
-        n = opcode & 0x000F
-
-        if opcode == 0x00E0:  # CLS
-            self.display = bytearray(self.WIDTH * self.HEIGHT)
-            self.draw_flag = True
-            self.PC += 2
-        elif opcode == 0x00EE:  # RET
-            self.PC = self.stack.pop() if self.stack else 0x200
-            self.PC += 2
-        elif opcode & 0xF000 == 0x1000:  # JP addr
-            self.PC = nnn
-        elif opcode & 0xF000 == 0x2000:  # CALL addr
-            self.stack.append(self.PC)
-            self.PC = nnn
-        elif opcode & 0xF000 == 0x3000:  # SE Vx, byte
-            self.PC += 4 if self.V[x] == kk else 2
-        elif opcode & 0xF000 == 0x4000:  # SNE Vx, byte
-            self.PC += 4 if self.V[x] != kk else 2
-        elif opcode & 0xF00F == 0x5000:  # SE Vx, Vy
-            self.PC += 4 if self.V[x] == self.V[y] else 2
-        elif opcode & 0xF000 == 0x6000:  # LD Vx, byte
-            self.V[x] = kk
-            self.PC += 2
-        elif opcode & 0xF000 == 0x7000:  # ADD Vx, byte
-            self.V[x] = (self.V[x] + kk) & 0xFF
-            self.PC += 2
-        elif opcode & 0xF00F == 0x8000:  # LD Vx, Vy
-            self.V[x] = self.V[y]
-            self.PC += 2
-        elif opcode & 0xF00F == 0x8001:  # OR Vx, Vy
-            self.V[x] |= self.V[y]
-            self.PC += 2
-        elif opcode & 0xF00F == 0x8002:  # AND Vx, Vy
-            self.V[x] &= self.V[y]
-            self.PC += 2
-        elif opcode & 0xF00F == 0x8003:  # XOR Vx, Vy
-            self.V[x] ^= self.V[y]
-            self.PC += 2
-        elif opcode & 0xF00F == 0x8004:  # ADD Vx, Vy
-            result = self.V[x] + self.V[y]
-            self.V[0xF] = 1 if result > 0xFF else 0
-            self.V[x] = result & 0xFF
-            self.PC += 2
-        elif opcode & 0xF00F == 0x8005:  # SUB Vx, Vy
-            self.V[0xF] = 1 if self.V[x] > self.V[y] else 0
-            self.V[x] = (self.V[x] - self.V[y]) & 0xFF
-            self.PC += 2
-        elif opcode & 0xF00F == 0x8006:  # SHR Vx
-            self.V[0xF] = self.V[x] & 0x1
-            self.V[x] >>= 1
-            self.PC += 2
-        elif opcode & 0xF00F == 0x8007:  # SUBN Vx, Vy
-            self.V[0xF] = 1 if self.V[y] > self.V[x] else 0
-            self.V[x] = (self.V[y] - self.V[x]) & 0xFF
-            self.PC += 2
-        elif opcode & 0xF00F == 0x800E:  # SHL Vx
-            self.V[0xF] = (self.V[x] >> 7) & 0x1
-            self.V[x] = (self.V[x] << 1) & 0xFF
-            self.PC += 2
-        elif opcode & 0xF00F == 0x9000:  # SNE Vx, Vy
-            self.PC += 4 if self.V[x] != self.V[y] else 2
-        elif opcode & 0xF000 == 0xA000:  # LD I, addr
-            self.I = nnn
-            self.PC += 2
-        elif opcode & 0xF000 == 0xB000:  # JP V0, addr
-            self.PC = nnn + self.V[0]
-        elif opcode & 0xF000 == 0xC000:  # RND Vx, byte
-            self.V[x] = random.randint(0, 255) & kk
-            self.PC += 2
-        elif opcode & 0xF000 == 0xD000:  # DRW Vx, Vy, nibble
-            x_coord = self.V[x] % self.WIDTH
-            y_coord = self.V[y] % self.HEIGHT
-            self.V[0xF] = 0
-            for row in range(n):
-                if y_coord + row >= self.HEIGHT:
-                    break
-                sprite_byte = self.memory[self.I + row]
-                for col in range(8):
-                    if x_coord + col >= self.WIDTH:
-                        break
-                    if sprite_byte & (0x80 >> col):
-                        idx = (y_coord + row) * self.WIDTH + (x_coord + col)
-                        if self.display[idx]:
-                            self.V[0xF] = 1
-                        self.display[idx] ^= 1
-            self.draw_flag = True
-            self.PC += 2
-        elif opcode & 0xF0FF == 0xE09E:  # SKP Vx
-            self.PC += 4 if self.keypad[self.V[x]] else 2
-        elif opcode & 0xF0FF == 0xE0A1:  # SKNP Vx
-            self.PC += 4 if not self.keypad[self.V[x]] else 2
-        elif opcode & 0xF0FF == 0xF007:  # LD Vx, DT
-            self.V[x] = self.delay_timer
-            self.PC += 2
-        elif opcode & 0xF0FF == 0xF00A:  # LD Vx, K
-            for i, key in enumerate(self.keypad):
-                if key:
-                    self.V[x] = i
-                    self.PC += 2
-                    break
-        elif opcode & 0xF0FF == 0xF015:  # LD DT, Vx
-            self.delay_timer = self.V[x]
-            self.PC += 2
-        elif opcode & 0xF0FF == 0xF018:  # LD ST, Vx
-            self.sound_timer = self.V[x]
-            self.PC += 2
-        elif opcode & 0xF0FF == 0xF01E:  # ADD I, Vx
-            self.I = (self.I + self.V[x]) & 0xFFF
-            self.PC += 2
-        elif opcode & 0xF0FF == 0xF029:  # LD F, Vx (font)
-            self.I = (self.V[x] & 0xF) * 5
-            self.PC += 2
-        elif opcode & 0xF0FF == 0xF033:  # LD B, Vx (BCD)
-            value = self.V[x]
-            self.memory[self.I] = value // 100
-            self.memory[self.I + 1] = (value // 10) % 10
-            self.memory[self.I + 2] = value % 10
-            self.PC += 2
-        elif opcode & 0xF0FF == 0xF055:  # LD [I], Vx
-            for i in range(x + 1):
-                self.memory[self.I + i] = self.V[i]
-            self.PC += 2
-        elif opcode & 0xF0FF == 0xF065:  # LD Vx, [I]
-            for i in range(x + 1):
-                self.V[i] = self.memory[self.I + i]
-            self.PC += 2
-        else:
-            print(f"Unknown opcode: 0x{opcode:04X}")
-            self.PC += 2
+            if self.rewinding:
+                tone.active = False
+                state = self.rewind.pop()
+                if state is not None:
+                    core.load_state_bytes(state)
+            else:
+                perf = core.perf
+                start = time.perf_counter()
+                # Re-read every frame so the Speed slider applies immediately
+                core.run_cycles(core.cycles_per_frame)
+                core.tick_timers()
+                tone.active = core.sound_timer > 0
+                if perf is not None:
+                    perf.add_frame(time.perf_counter() - start)
+                self.rewind.push(core.save_state_bytes())
+
+            if not scheduler.end_frame():
+                continue
+            run_ahead = self.run_ahead
+            if run_ahead and not self.rewinding:
+                # Present where the current input leads run_ahead frames on;
+                # run_ahead() rolls back, so only real frames advance the machine
+                core.draw_flag = False
+                self.frames.publish(core.run_ahead(run_ahead))
+            elif core.draw_flag:
+                core.draw_flag = False
+                self.frames.publish(core.framebuffer())
+        tone.active = False
+
+    def poll_frames(self):
+        # Runs on the Tk thread; presents at most the newest finished frame
+        frame = self.frames.take()
+        if frame is not None:
+            perf = self.core.perf
+            start = time.perf_counter()
+            self.renderer.present(frame)
+            if perf is not None:
+                perf.add_present(time.perf_counter() - start)
+        self.poll_id = self.root.after(self.POLL_MS, self.poll_frames)
+
+    def shutdown(self):
+        # Stops the emulation thread, UI timers and sound; safe to call twice
+        self.running = False
+        self.wake.set()
+        for after_id in (self.poll_id, self.stats_id):
+            if after_id is not None:
+                self.root.after_cancel(after_id)
+        self.poll_id = self.stats_id = None
+        self.tone.close()
+
+    def close(self):
+        self.shutdown()
+        self.root.destroy()
 
     def update_display(self):
-        if not self.draw_flag:
-            return
-        self.canvas.delete("all")
-        for i, pixel in enumerate(self.display):
-            if pixel:
-                coords = self.pixel_coords[i]
-                self.canvas.create_rectangle(*coords, fill='white', outline='')
-        self.draw_flag = False
+        # Direct repaint from the UI thread (reset, step, state load)
+        core = self.core
+        core.draw_flag = False
+        self.renderer.present(core.framebuffer())
 
 if __name__ == "__main__":
     root = tk.Tk()
     emulator = OptimizedChip8Emulator(root)
-    root.mainloop()
+    root.mainloop()
\ No newline at end of file
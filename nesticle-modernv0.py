@@ -1,38 +1,899 @@
 import tkinter as tk
 from tkinter import filedialog, messagebox
-import pygame
-import numpy as np
 import os
+import time
+import hashlib
+import json
+import mmap
+import multiprocessing
+import multiprocessing.connection
+import queue
+import sqlite3
+import sys
+import threading
+from multiprocessing import shared_memory
+from pathlib import Path
+from perfstats import PerfCounters, TraceRing
+
+# pygame and NumPy are only needed once a game starts. They are imported on
+# first use, so the launcher window does not wait on them; everything that
+# touches either calls load_pygame()/load_numpy() on construction.
+np = None
+pygame = None
+
+def load_numpy():
+    global np
+    if np is None:
+        import numpy as np
+        _build_ppu_tables()
+        _build_apu_tables()
+    return np
+
+def load_pygame():
+    global pygame
+    if pygame is None:
+        import pygame
+        # pygame.init() then opens the mixer AudioOutput asks for by default
+        pygame.mixer.pre_init(44100, -16, 1, 512)
+    return pygame
 
 # iNES Header Parser (with Mapper Support)
+def parse_ines_header(header):
+    if header[:4] != b"NES\x1a":
+        raise ValueError("Invalid iNES file - missing header")
+    return {
+        'prg_banks': header[4],
+        'chr_banks': header[5],
+        'mapper': (header[6] >> 4) | (header[7] & 0xF0),
+        'mirroring': header[6] & 0x01,
+        'battery': bool(header[6] & 0x02),
+        'trainer': bool(header[6] & 0x04),
+    }
+
 class ROM:
-    def __init__(self, path):
+    # Bank sizes mappers switch in; views for each are built once at load
+    PRG_BANK_SIZES = (0x4000, 0x8000)
+    CHR_BANK_SIZES = (0x1000, 0x2000)
+
+    def __init__(self, path, use_mmap=False):
+        # Either way the file lives in one buffer and every section below is a
+        # memoryview into it; with use_mmap the buffer is a read-only mapping
+        # shared through the page cache instead of a private copy
         with open(path, "rb") as f:
-            self.data = bytearray(f.read())
+            if use_mmap:
+                self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                self.buffer = bytearray(f.read())
+        self.data = memoryview(self.buffer)
         
         # Parse iNES header
         self.header = self.data[:16]
-        if self.header[:4] != b"NES\x1a":
-            raise ValueError("Invalid iNES file - missing header")
-        
-        self.prg_banks = self.header[4]
-        self.chr_banks = self.header[5]
-        self.mapper = (self.header[6] >> 4) | (self.header[7] & 0xF0)
-        self.mirroring = self.header[6] & 0x01
-        self.battery = bool(self.header[6] & 0x02)
-        self.trainer = self.data[16:528] if self.header[6] & 0x04 else None
+        info = parse_ines_header(self.header)
+        self.prg_banks = info['prg_banks']
+        self.chr_banks = info['chr_banks']
+        self.mapper = info['mapper']
+        self.mirroring = info['mirroring']
+        self.battery = info['battery']
+        self.trainer = self.data[16:528] if info['trainer'] else None
         
         prg_start = 16 + (512 if self.trainer else 0)
         prg_end = prg_start + 16384 * self.prg_banks
+        # Mappers and the bus page tables assume whole banks, so a short image
+        # is rejected here rather than mapped with pages missing
+        if self.prg_banks == 0:
+            raise ValueError("Invalid iNES file - no PRG ROM")
+        expected = prg_end + 8192 * self.chr_banks
+        if len(self.data) < expected:
+            raise ValueError(f"Invalid iNES file - truncated ({len(self.data)} bytes, header needs {expected})")
         self.prg_rom = self.data[prg_start:prg_end]
-        self.chr_rom = self.data[prg_end:prg_end + 8192 * self.chr_banks] if self.chr_banks > 0 else bytearray(8192)
+        if self.chr_banks > 0:
+            self.chr_rom = self.data[prg_end:prg_end + 8192 * self.chr_banks]
+        else:
+            self.chr_rom = bytearray(8192)  # CHR RAM, private and writable
+
+        self.prg_views = {size: self.bank_views(self.prg_rom, size) for size in self.PRG_BANK_SIZES}
+        self.chr_views = {size: self.bank_views(self.chr_rom, size) for size in self.CHR_BANK_SIZES}
+
+    @staticmethod
+    def bank_views(data, size):
+        view = memoryview(data)
+        return [view[i:i + size] for i in range(0, len(view), size)]
+
+# Persistent ROM index: directories are scanned for .nes/.ch8 files and each
+# file's iNES header is read through mmap. Results live in SQLite and are
+# revalidated by (mtime, size), so rescans only open new or changed files and
+# the launcher can list the whole library with one query.
+class RomLibrary:
+    EXTENSIONS = ('.nes', '.ch8')
+    DEFAULT_INDEX = Path.home() / '.nesticle' / 'romlib.sqlite3'
+
+    def __init__(self, index_path=None):
+        self.index_path = Path(index_path) if index_path is not None else self.DEFAULT_INDEX
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        with self.connect() as db:
+            db.execute("""CREATE TABLE IF NOT EXISTS roms (
+                path TEXT PRIMARY KEY, name TEXT, kind TEXT, size INTEGER, mtime_ns INTEGER,
+                valid INTEGER, mapper INTEGER, prg_banks INTEGER, chr_banks INTEGER,
+                mirroring INTEGER, battery INTEGER, sha1 TEXT)""")
+
+    def connect(self):
+        # One connection per call keeps the library usable from a scan thread
+        return sqlite3.connect(self.index_path)
+
+    def entries(self):
+        with self.connect() as db:
+            db.row_factory = sqlite3.Row
+            return [dict(row) for row in db.execute("SELECT * FROM roms ORDER BY name COLLATE NOCASE, path")]
+
+    def scan(self, directories):
+        # Returns (added or changed, removed) counts
+        with self.connect() as db:
+            known = {}
+            for directory in directories:
+                prefix = os.path.join(os.path.abspath(directory), '')
+                known.update((path, (size, mtime_ns)) for path, size, mtime_ns in db.execute(
+                    "SELECT path, size, mtime_ns FROM roms WHERE substr(path, 1, ?) = ?", (len(prefix), prefix)))
+            seen = set()
+            rows = []
+            for directory in directories:
+                for path, stat in self._walk(os.path.abspath(directory)):
+                    seen.add(path)
+                    if known.get(path) != (stat.st_size, stat.st_mtime_ns):
+                        rows.append(self.index_file(path, stat))
+            removed = [(path,) for path in known if path not in seen]
+            db.executemany("INSERT OR REPLACE INTO roms VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            db.executemany("DELETE FROM roms WHERE path = ?", removed)
+        return len(rows), len(removed)
+
+    def add_file(self, path):
+        path = os.path.abspath(path)
+        row = self.index_file(path, os.stat(path))
+        with self.connect() as db:
+            db.execute("INSERT OR REPLACE INTO roms VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", row)
+        return path
+
+    def _walk(self, directory):
+        stack = [directory]
+        while stack:
+            try:
+                it = os.scandir(stack.pop())
+            except OSError:
+                continue
+            with it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.name.lower().endswith(self.EXTENSIONS):
+                        try:
+                            yield entry.path, entry.stat()
+                        except OSError:
+                            continue
+
+    @staticmethod
+    def index_file(path, stat):
+        kind = 'ch8' if path.lower().endswith('.ch8') else 'nes'
+        info = {}
+        sha1 = None
+        if stat.st_size:
+            with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if kind == 'nes':
+                    try:
+                        info = parse_ines_header(mm[:16])
+                    except ValueError:
+                        info = None
+                sha1 = hashlib.sha1(mm).hexdigest()
+        valid = stat.st_size > 0 and info is not None
+        info = info or {}
+        return (path, os.path.basename(path), kind, stat.st_size, stat.st_mtime_ns, int(valid),
+                info.get('mapper'), info.get('prg_banks'), info.get('chr_banks'),
+                info.get('mirroring'), None if 'battery' not in info else int(info['battery']), sha1)
+
+# CPU Memory Bus (256-byte pages)
+# Every CPU page maps to an indexable object in read_pages/write_pages: plain
+# memory is a memoryview, registers are HandlerPages. An access is one list
+# lookup plus one index, and bank switching rewrites table entries in place.
+class HandlerPage:
+    def __init__(self, base, read, write):
+        self.base = base
+        self.read = read
+        self.write = write
+
+    def __getitem__(self, offset):
+        return self.read(self.base | offset)
+
+    def __setitem__(self, offset, value):
+        self.write(self.base | offset, value)
+
+# Standard controller on $4016/$4017. While strobe (bit 0 of a $4016 write)
+# is high the shift register keeps reloading from the held buttons; each read
+# then returns the next button, A first, and 1s once all eight are out.
+class Controller:
+    BUTTONS = ('a', 'b', 'select', 'start', 'up', 'down', 'left', 'right')
+
+    def __init__(self):
+        self.buttons = 0  # bit n set while BUTTONS[n] is held
+        self.strobe = 0
+        self.shift = 0
+
+    def write(self, value):
+        self.strobe = value & 1
+        if self.strobe:
+            self.shift = self.buttons
+
+    def read(self):
+        if self.strobe:
+            return 0x40 | (self.buttons & 1)
+        bit = self.shift & 1
+        self.shift = (self.shift >> 1) | 0x80
+        return 0x40 | bit
+
+# Player 1 keyboard layout, pygame key name -> Controller button
+CONTROLLER_KEYS = {
+    'x': 'a', 'z': 'b', 'right shift': 'select', 'return': 'start',
+    'up': 'up', 'down': 'down', 'left': 'left', 'right': 'right',
+}
+_key_bits = None
+
+def read_keyboard():
+    # Controller.buttons value for the keys held right now; the caller's event
+    # loop keeps pygame's key state current
+    global _key_bits
+    if _key_bits is None:
+        _key_bits = [(pygame.key.key_code(key), 1 << Controller.BUTTONS.index(button))
+                     for key, button in CONTROLLER_KEYS.items()]
+    pressed = pygame.key.get_pressed()
+    buttons = 0
+    for code, bit in _key_bits:
+        if pressed[code]:
+            buttons |= bit
+    return buttons
+
+class Bus:
+    def __init__(self, rom):
+        self.ram = bytearray(0x0800)  # 2KB internal RAM
+        self.prg_ram = bytearray(0x2000)  # $6000-$7FFF work/battery RAM
+        open_bus = memoryview(bytes(0x100))
+        sink = memoryview(bytearray(0x100))
+        self.read_pages = [open_bus] * 256
+        self.write_pages = [sink] * 256
+        ram = memoryview(self.ram)
+        for page in range(0x00, 0x20):
+            offset = (page & 0x07) << 8  # Mirror RAM
+            self.read_pages[page] = self.write_pages[page] = ram[offset:offset + 0x100]
+        prg_ram = memoryview(self.prg_ram)
+        for page in range(0x60, 0x80):
+            offset = (page - 0x60) << 8
+            self.read_pages[page] = self.write_pages[page] = prg_ram[offset:offset + 0x100]
+        self.ppu = None
+        self.apu = None
+        self.controllers = (Controller(), Controller())
+        self.mapper = create_mapper(rom, self)
+
+    def attach_ppu(self, ppu):
+        # $2000-$3FFF: the eight PPU registers, mirrored through the range
+        self.ppu = ppu
+        for page in range(0x20, 0x40):
+            self.read_pages[page] = self.write_pages[page] = HandlerPage(page << 8, ppu.read_register, ppu.write_register)
+
+    def attach_apu(self, apu):
+        # $4000-$40FF: APU and I/O registers
+        self.apu = apu
+        self.read_pages[0x40] = self.write_pages[0x40] = HandlerPage(0x4000, self.read_io, self.write_io)
+
+    def read_io(self, addr):
+        if addr == 0x4016 or addr == 0x4017:
+            return self.controllers[addr & 1].read()
+        return self.apu.read_register(addr)
+
+    def write_io(self, addr, value):
+        if addr == 0x4014 and self.ppu is not None:
+            self.ppu.oam_dma(value)
+        elif addr == 0x4016:
+            for controller in self.controllers:
+                controller.write(value)
+        else:
+            self.apu.write_register(addr, value)
+
+# Mappers
+MIRROR_HORIZONTAL = 0
+MIRROR_VERTICAL = 1
+MIRROR_SINGLE_LOW = 2
+MIRROR_SINGLE_HIGH = 3
+
+class Mapper:
+    # NROM (mapper 0) and the base for bank-switching boards. PRG is mapped
+    # into the bus page tables in 16KB slots; CHR is two 4KB pattern tables.
+    def __init__(self, rom, bus):
+        self.rom = rom
+        self.bus = bus
+        self.mirroring = rom.mirroring
+        # 64 page views per 16KB bank, so a PRG switch is one slice assignment
+        self.prg_pages = [ROM.bank_views(bank, 0x100) for bank in rom.prg_views[0x4000]]
+        self.chr_views = rom.chr_views[0x1000]
+        self.chr_bank = [0, 1 % len(self.chr_views)]
+        self.chr = [self.chr_views[bank] for bank in self.chr_bank]
+        for page in range(0x80, 0x100):
+            bus.write_pages[page] = HandlerPage(page << 8, None, self.write)
+        self.map_prg16(0, 0)
+        self.map_prg16(1, 1)  # a single 16KB bank is mirrored
+
+    def map_prg16(self, slot, bank):
+        start = 0x80 + (slot << 6)
+        self.bus.read_pages[start:start + 0x40] = self.prg_pages[bank % len(self.prg_pages)]
+
+    def map_chr4(self, slot, bank):
+        bank %= len(self.chr_views)
+        if bank != self.chr_bank[slot]:
+            self.mapping_changed()
+            self.chr_bank[slot] = bank
+            self.chr[slot] = self.chr_views[bank]
+
+    def set_mirroring(self, mirroring):
+        if mirroring != self.mirroring:
+            self.mapping_changed()
+            self.mirroring = mirroring
+
+    def mapping_changed(self):
+        # Scanlines drawn so far used the old mapping
+        if self.bus.ppu is not None:
+            self.bus.ppu.mapping_changed()
+
+    def map_chr8(self, bank):
+        self.map_chr4(0, bank << 1)
+        self.map_chr4(1, (bank << 1) | 1)
+
+    def write(self, addr, value):
+        pass
+
+class UxROM(Mapper):
+    # Mapper 2: switchable 16KB at $8000, last bank fixed at $C000
+    def __init__(self, rom, bus):
+        super().__init__(rom, bus)
+        self.map_prg16(1, -1)
+
+    def write(self, addr, value):
+        self.map_prg16(0, value)
+
+class CNROM(Mapper):
+    # Mapper 3: fixed PRG, switchable 8KB CHR
+    def write(self, addr, value):
+        self.map_chr8(value)
+
+_MMC1_MIRRORING = (MIRROR_SINGLE_LOW, MIRROR_SINGLE_HIGH, MIRROR_VERTICAL, MIRROR_HORIZONTAL)
+
+class MMC1(Mapper):
+    # Mapper 1: registers are loaded one bit per write through a 5-bit shift register
+    def __init__(self, rom, bus):
+        super().__init__(rom, bus)
+        self.shift = 0
+        self.count = 0
+        self.control = 0x0C
+        self.chr_bank0 = 0
+        self.chr_bank1 = 0
+        self.prg_bank = 0
+        self.update()
+
+    def write(self, addr, value):
+        if value & 0x80:
+            self.shift = self.count = 0
+            self.control |= 0x0C
+            self.update()
+            return
+        self.shift |= (value & 1) << self.count
+        self.count += 1
+        if self.count < 5:
+            return
+        register = (addr >> 13) & 3
+        if register == 0:
+            self.control = self.shift
+        elif register == 1:
+            self.chr_bank0 = self.shift
+        elif register == 2:
+            self.chr_bank1 = self.shift
+        else:
+            self.prg_bank = self.shift & 0x0F
+        self.shift = self.count = 0
+        self.update()
+
+    def update(self):
+        self.set_mirroring(_MMC1_MIRRORING[self.control & 3])
+        prg_mode = (self.control >> 2) & 3
+        if prg_mode < 2:  # 32KB
+            bank = self.prg_bank & 0x0E
+            self.map_prg16(0, bank)
+            self.map_prg16(1, bank | 1)
+        elif prg_mode == 2:  # first bank fixed at $8000
+            self.map_prg16(0, 0)
+            self.map_prg16(1, self.prg_bank)
+        else:  # last bank fixed at $C000
+            self.map_prg16(0, self.prg_bank)
+            self.map_prg16(1, -1)
+        if self.control & 0x10:  # two 4KB banks
+            self.map_chr4(0, self.chr_bank0)
+            self.map_chr4(1, self.chr_bank1)
+        else:
+            self.map_chr8(self.chr_bank0 >> 1)
+
+MAPPERS = {0: Mapper, 1: MMC1, 2: UxROM, 3: CNROM}
+
+def create_mapper(rom, bus):
+    if rom.mapper not in MAPPERS:
+        raise ValueError(f"Unsupported mapper {rom.mapper}")
+    return MAPPERS[rom.mapper](rom, bus)
+
+# 6502 CPU Emulation
+# Status flag bits, packed into CPU.status
+FLAG_C = 0x01
+FLAG_Z = 0x02
+FLAG_I = 0x04
+FLAG_D = 0x08
+FLAG_B = 0x10
+FLAG_U = 0x20
+FLAG_V = 0x40
+FLAG_N = 0x80
+
+# N and Z for every byte value, OR-ed into status after clearing those bits
+_NZ = bytes((value & FLAG_N) | (FLAG_Z if value == 0 else 0) for value in range(256))
+
+# Addressing modes: each consumes its operand bytes, advances pc and returns
+# the effective address (None for implied/accumulator). The indexed read
+# modes charge the page-cross cycle themselves; the *_w variants are for
+# stores and read-modify-write opcodes whose base cycles already include it.
+def _am_imp(c):
+    return None
+
+def _am_imm(c):
+    pc = c.pc
+    c.pc = (pc + 1) & 0xFFFF
+    return pc
+
+def _am_zp(c):
+    pc = c.pc
+    c.pc = (pc + 1) & 0xFFFF
+    return c.read(pc)
+
+def _am_zpx(c):
+    pc = c.pc
+    c.pc = (pc + 1) & 0xFFFF
+    return (c.read(pc) + c.x) & 0xFF
+
+def _am_zpy(c):
+    pc = c.pc
+    c.pc = (pc + 1) & 0xFFFF
+    return (c.read(pc) + c.y) & 0xFF
+
+def _am_abs(c):
+    pc = c.pc
+    read = c.read
+    c.pc = (pc + 2) & 0xFFFF
+    return read(pc) | (read((pc + 1) & 0xFFFF) << 8)
+
+def _am_abx(c):
+    pc = c.pc
+    read = c.read
+    c.pc = (pc + 2) & 0xFFFF
+    base = read(pc) | (read((pc + 1) & 0xFFFF) << 8)
+    addr = (base + c.x) & 0xFFFF
+    if (base ^ addr) & 0xFF00:
+        c.cycles += 1
+    return addr
+
+def _am_abx_w(c):
+    pc = c.pc
+    read = c.read
+    c.pc = (pc + 2) & 0xFFFF
+    return ((read(pc) | (read((pc + 1) & 0xFFFF) << 8)) + c.x) & 0xFFFF
+
+def _am_aby(c):
+    pc = c.pc
+    read = c.read
+    c.pc = (pc + 2) & 0xFFFF
+    base = read(pc) | (read((pc + 1) & 0xFFFF) << 8)
+    addr = (base + c.y) & 0xFFFF
+    if (base ^ addr) & 0xFF00:
+        c.cycles += 1
+    return addr
+
+def _am_aby_w(c):
+    pc = c.pc
+    read = c.read
+    c.pc = (pc + 2) & 0xFFFF
+    return ((read(pc) | (read((pc + 1) & 0xFFFF) << 8)) + c.y) & 0xFFFF
+
+def _am_izx(c):
+    pc = c.pc
+    read = c.read
+    c.pc = (pc + 1) & 0xFFFF
+    ptr = (read(pc) + c.x) & 0xFF
+    return read(ptr) | (read((ptr + 1) & 0xFF) << 8)
+
+def _am_izy(c):
+    pc = c.pc
+    read = c.read
+    c.pc = (pc + 1) & 0xFFFF
+    ptr = read(pc)
+    base = read(ptr) | (read((ptr + 1) & 0xFF) << 8)
+    addr = (base + c.y) & 0xFFFF
+    if (base ^ addr) & 0xFF00:
+        c.cycles += 1
+    return addr
+
+def _am_izy_w(c):
+    pc = c.pc
+    read = c.read
+    c.pc = (pc + 1) & 0xFFFF
+    ptr = read(pc)
+    return ((read(ptr) | (read((ptr + 1) & 0xFF) << 8)) + c.y) & 0xFFFF
+
+def _am_ind(c):
+    # JMP ($xxFF) fetches the high byte from $xx00, as the real chip does
+    ptr = _am_abs(c)
+    read = c.read
+    return read(ptr) | (read((ptr & 0xFF00) | ((ptr + 1) & 0xFF)) << 8)
+
+def _am_rel(c):
+    pc = c.pc
+    offset = c.read(pc)
+    pc = (pc + 1) & 0xFFFF
+    c.pc = pc
+    return (pc + offset - ((offset & 0x80) << 1)) & 0xFFFF
+
+# Stack helpers; the stack always lives in page 1 of internal RAM
+def _push(c, value):
+    c.ram[0x100 | c.sp] = value
+    c.sp = (c.sp - 1) & 0xFF
+
+def _pull(c):
+    c.sp = (c.sp + 1) & 0xFF
+    return c.ram[0x100 | c.sp]
+
+def _poll_irq(c):
+    # IRQ is level-triggered: a line held while I was set is taken as soon
+    # as I clears (CLI, PLP, RTI)
+    line = c.irq_line
+    if line is not None and not c.status & FLAG_I and line(c.cycles):
+        c.irq()
+
+# Instruction handlers take (cpu, effective address)
+def _op_lda(c, addr):
+    c.acc = value = c.read(addr)
+    c.status = (c.status & 0x7D) | _NZ[value]
+
+def _op_ldx(c, addr):
+    c.x = value = c.read(addr)
+    c.status = (c.status & 0x7D) | _NZ[value]
+
+def _op_ldy(c, addr):
+    c.y = value = c.read(addr)
+    c.status = (c.status & 0x7D) | _NZ[value]
+
+def _op_sta(c, addr):
+    c.write(addr, c.acc)
+
+def _op_stx(c, addr):
+    c.write(addr, c.x)
+
+def _op_sty(c, addr):
+    c.write(addr, c.y)
+
+def _op_tax(c, addr):
+    c.x = value = c.acc
+    c.status = (c.status & 0x7D) | _NZ[value]
+
+def _op_tay(c, addr):
+    c.y = value = c.acc
+    c.status = (c.status & 0x7D) | _NZ[value]
+
+def _op_txa(c, addr):
+    c.acc = value = c.x
+    c.status = (c.status & 0x7D) | _NZ[value]
+
+def _op_tya(c, addr):
+    c.acc = value = c.y
+    c.status = (c.status & 0x7D) | _NZ[value]
+
+def _op_tsx(c, addr):
+    c.x = value = c.sp
+    c.status = (c.status & 0x7D) | _NZ[value]
+
+def _op_txs(c, addr):
+    c.sp = c.x
+
+def _op_pha(c, addr):
+    _push(c, c.acc)
+
+def _op_php(c, addr):
+    _push(c, c.status | FLAG_B | FLAG_U)
+
+def _op_pla(c, addr):
+    c.acc = value = _pull(c)
+    c.status = (c.status & 0x7D) | _NZ[value]
+
+def _op_plp(c, addr):
+    c.status = (_pull(c) & ~FLAG_B) | FLAG_U
+    _poll_irq(c)
+
+def _op_and(c, addr):
+    c.acc = value = c.acc & c.read(addr)
+    c.status = (c.status & 0x7D) | _NZ[value]
+
+def _op_ora(c, addr):
+    c.acc = value = c.acc | c.read(addr)
+    c.status = (c.status & 0x7D) | _NZ[value]
+
+def _op_eor(c, addr):
+    c.acc = value = c.acc ^ c.read(addr)
+    c.status = (c.status & 0x7D) | _NZ[value]
+
+def _op_bit(c, addr):
+    value = c.read(addr)
+    c.status = (c.status & 0x3D) | (value & 0xC0) | (0 if c.acc & value else FLAG_Z)
+
+def _add(c, value):
+    # The 2A03 has no decimal mode, so D is ignored
+    acc = c.acc
+    total = acc + value + (c.status & FLAG_C)
+    result = total & 0xFF
+    c.status = ((c.status & 0x3C) | _NZ[result] | (total >> 8)
+                | (((acc ^ result) & (value ^ result) & 0x80) >> 1))
+    c.acc = result
+
+def _op_adc(c, addr):
+    _add(c, c.read(addr))
+
+def _op_sbc(c, addr):
+    _add(c, c.read(addr) ^ 0xFF)
+
+def _compare(c, register, value):
+    result = register - value
+    c.status = (c.status & 0x7C) | _NZ[result & 0xFF] | (result >= 0)
+
+def _op_cmp(c, addr):
+    _compare(c, c.acc, c.read(addr))
+
+def _op_cpx(c, addr):
+    _compare(c, c.x, c.read(addr))
+
+def _op_cpy(c, addr):
+    _compare(c, c.y, c.read(addr))
+
+def _op_inc(c, addr):
+    value = (c.read(addr) + 1) & 0xFF
+    c.write(addr, value)
+    c.status = (c.status & 0x7D) | _NZ[value]
+
+def _op_dec(c, addr):
+    value = (c.read(addr) - 1) & 0xFF
+    c.write(addr, value)
+    c.status = (c.status & 0x7D) | _NZ[value]
+
+def _op_inx(c, addr):
+    c.x = value = (c.x + 1) & 0xFF
+    c.status = (c.status & 0x7D) | _NZ[value]
+
+def _op_iny(c, addr):
+    c.y = value = (c.y + 1) & 0xFF
+    c.status = (c.status & 0x7D) | _NZ[value]
+
+def _op_dex(c, addr):
+    c.x = value = (c.x - 1) & 0xFF
+    c.status = (c.status & 0x7D) | _NZ[value]
+
+def _op_dey(c, addr):
+    c.y = value = (c.y - 1) & 0xFF
+    c.status = (c.status & 0x7D) | _NZ[value]
+
+def _op_asl_a(c, addr):
+    result = c.acc << 1
+    c.acc = value = result & 0xFF
+    c.status = (c.status & 0x7C) | _NZ[value] | (result >> 8)
+
+def _op_asl(c, addr):
+    result = c.read(addr) << 1
+    value = result & 0xFF
+    c.write(addr, value)
+    c.status = (c.status & 0x7C) | _NZ[value] | (result >> 8)
+
+def _op_lsr_a(c, addr):
+    acc = c.acc
+    c.acc = value = acc >> 1
+    c.status = (c.status & 0x7C) | _NZ[value] | (acc & 1)
+
+def _op_lsr(c, addr):
+    old = c.read(addr)
+    value = old >> 1
+    c.write(addr, value)
+    c.status = (c.status & 0x7C) | _NZ[value] | (old & 1)
+
+def _op_rol_a(c, addr):
+    result = (c.acc << 1) | (c.status & FLAG_C)
+    c.acc = value = result & 0xFF
+    c.status = (c.status & 0x7C) | _NZ[value] | (result >> 8)
+
+def _op_rol(c, addr):
+    result = (c.read(addr) << 1) | (c.status & FLAG_C)
+    value = result & 0xFF
+    c.write(addr, value)
+    c.status = (c.status & 0x7C) | _NZ[value] | (result >> 8)
+
+def _op_ror_a(c, addr):
+    acc = c.acc
+    c.acc = value = (acc >> 1) | ((c.status & FLAG_C) << 7)
+    c.status = (c.status & 0x7C) | _NZ[value] | (acc & 1)
+
+def _op_ror(c, addr):
+    old = c.read(addr)
+    value = (old >> 1) | ((c.status & FLAG_C) << 7)
+    c.write(addr, value)
+    c.status = (c.status & 0x7C) | _NZ[value] | (old & 1)
+
+def _op_jmp(c, addr):
+    c.pc = addr
+
+def _op_jsr(c, addr):
+    ret = (c.pc - 1) & 0xFFFF
+    _push(c, ret >> 8)
+    _push(c, ret & 0xFF)
+    c.pc = addr
+
+def _op_rts(c, addr):
+    low = _pull(c)
+    c.pc = (((_pull(c) << 8) | low) + 1) & 0xFFFF
+
+def _op_rti(c, addr):
+    c.status = (_pull(c) & ~FLAG_B) | FLAG_U
+    low = _pull(c)
+    c.pc = (_pull(c) << 8) | low
+    _poll_irq(c)
+
+def _op_brk(c, addr):
+    pc = (c.pc + 1) & 0xFFFF  # BRK skips a padding byte
+    _push(c, pc >> 8)
+    _push(c, pc & 0xFF)
+    _push(c, c.status | FLAG_B | FLAG_U)
+    c.status |= FLAG_I
+    c.pc = c.read_word(0xFFFE)
+
+def _branch(c, target):
+    # Taken branches cost one cycle, two when they land on another page
+    c.cycles += 2 if (c.pc ^ target) & 0xFF00 else 1
+    c.pc = target
+
+def _op_bpl(c, addr):
+    if not c.status & FLAG_N:
+        _branch(c, addr)
+
+def _op_bmi(c, addr):
+    if c.status & FLAG_N:
+        _branch(c, addr)
+
+def _op_bvc(c, addr):
+    if not c.status & FLAG_V:
+        _branch(c, addr)
+
+def _op_bvs(c, addr):
+    if c.status & FLAG_V:
+        _branch(c, addr)
+
+def _op_bcc(c, addr):
+    if not c.status & FLAG_C:
+        _branch(c, addr)
+
+def _op_bcs(c, addr):
+    if c.status & FLAG_C:
+        _branch(c, addr)
+
+def _op_bne(c, addr):
+    if not c.status & FLAG_Z:
+        _branch(c, addr)
+
+def _op_beq(c, addr):
+    if c.status & FLAG_Z:
+        _branch(c, addr)
+
+def _op_clc(c, addr):
+    c.status &= ~FLAG_C
+
+def _op_sec(c, addr):
+    c.status |= FLAG_C
+
+def _op_cli(c, addr):
+    c.status &= ~FLAG_I
+    _poll_irq(c)
+
+def _op_sei(c, addr):
+    c.status |= FLAG_I
+
+def _op_clv(c, addr):
+    c.status &= ~FLAG_V
+
+def _op_cld(c, addr):
+    c.status &= ~FLAG_D
+
+def _op_sed(c, addr):
+    c.status |= FLAG_D
+
+def _op_nop(c, addr):
+    pass
+
+def _op_unknown(c, addr):
+    # Unofficial opcodes run as one-byte NOPs
+    if c.trace is not None:
+        path = c.trace.fault()
+        if path is not None:
+            print(f"Unknown opcode ${c.read((c.pc - 1) & 0xFFFF):02X}; execution trace written to {path}",
+                  file=sys.stderr)
+
+# Opcode -> (handler, addressing mode, base cycles)
+_OPCODES = {}
+
+# ORA/AND/EOR/ADC/LDA/CMP/SBC share one addressing-mode layout
+for _base, _handler in ((0x00, _op_ora), (0x20, _op_and), (0x40, _op_eor), (0x60, _op_adc),
+                        (0xA0, _op_lda), (0xC0, _op_cmp), (0xE0, _op_sbc)):
+    for _offset, _mode, _cycles in ((0x09, _am_imm, 2), (0x05, _am_zp, 3), (0x15, _am_zpx, 4),
+                                    (0x0D, _am_abs, 4), (0x1D, _am_abx, 4), (0x19, _am_aby, 4),
+                                    (0x01, _am_izx, 6), (0x11, _am_izy, 5)):
+        _OPCODES[_base + _offset] = (_handler, _mode, _cycles)
+
+# Read-modify-write group, plus the accumulator forms of the shifts
+for _base, _handler, _acc_handler in ((0x00, _op_asl, _op_asl_a), (0x20, _op_rol, _op_rol_a),
+                                      (0x40, _op_lsr, _op_lsr_a), (0x60, _op_ror, _op_ror_a),
+                                      (0xC0, _op_dec, None), (0xE0, _op_inc, None)):
+    for _offset, _mode, _cycles in ((0x06, _am_zp, 5), (0x16, _am_zpx, 6),
+                                    (0x0E, _am_abs, 6), (0x1E, _am_abx_w, 7)):
+        _OPCODES[_base + _offset] = (_handler, _mode, _cycles)
+    if _acc_handler is not None:
+        _OPCODES[_base + 0x0A] = (_acc_handler, _am_imp, 2)
+
+_OPCODES.update({
+    0x85: (_op_sta, _am_zp, 3), 0x95: (_op_sta, _am_zpx, 4), 0x8D: (_op_sta, _am_abs, 4),
+    0x9D: (_op_sta, _am_abx_w, 5), 0x99: (_op_sta, _am_aby_w, 5), 0x81: (_op_sta, _am_izx, 6),
+    0x91: (_op_sta, _am_izy_w, 6),
+    0x86: (_op_stx, _am_zp, 3), 0x96: (_op_stx, _am_zpy, 4), 0x8E: (_op_stx, _am_abs, 4),
+    0x84: (_op_sty, _am_zp, 3), 0x94: (_op_sty, _am_zpx, 4), 0x8C: (_op_sty, _am_abs, 4),
+    0xA2: (_op_ldx, _am_imm, 2), 0xA6: (_op_ldx, _am_zp, 3), 0xB6: (_op_ldx, _am_zpy, 4),
+    0xAE: (_op_ldx, _am_abs, 4), 0xBE: (_op_ldx, _am_aby, 4),
+    0xA0: (_op_ldy, _am_imm, 2), 0xA4: (_op_ldy, _am_zp, 3), 0xB4: (_op_ldy, _am_zpx, 4),
+    0xAC: (_op_ldy, _am_abs, 4), 0xBC: (_op_ldy, _am_abx, 4),
+    0xE0: (_op_cpx, _am_imm, 2), 0xE4: (_op_cpx, _am_zp, 3), 0xEC: (_op_cpx, _am_abs, 4),
+    0xC0: (_op_cpy, _am_imm, 2), 0xC4: (_op_cpy, _am_zp, 3), 0xCC: (_op_cpy, _am_abs, 4),
+    0x24: (_op_bit, _am_zp, 3), 0x2C: (_op_bit, _am_abs, 4),
+    0xAA: (_op_tax, _am_imp, 2), 0xA8: (_op_tay, _am_imp, 2), 0x8A: (_op_txa, _am_imp, 2),
+    0x98: (_op_tya, _am_imp, 2), 0xBA: (_op_tsx, _am_imp, 2), 0x9A: (_op_txs, _am_imp, 2),
+    0x48: (_op_pha, _am_imp, 3), 0x08: (_op_php, _am_imp, 3),
+    0x68: (_op_pla, _am_imp, 4), 0x28: (_op_plp, _am_imp, 4),
+    0xE8: (_op_inx, _am_imp, 2), 0xC8: (_op_iny, _am_imp, 2),
+    0xCA: (_op_dex, _am_imp, 2), 0x88: (_op_dey, _am_imp, 2),
+    0x4C: (_op_jmp, _am_abs, 3), 0x6C: (_op_jmp, _am_ind, 5), 0x20: (_op_jsr, _am_abs, 6),
+    0x60: (_op_rts, _am_imp, 6), 0x40: (_op_rti, _am_imp, 6), 0x00: (_op_brk, _am_imp, 7),
+    0x10: (_op_bpl, _am_rel, 2), 0x30: (_op_bmi, _am_rel, 2), 0x50: (_op_bvc, _am_rel, 2),
+    0x70: (_op_bvs, _am_rel, 2), 0x90: (_op_bcc, _am_rel, 2), 0xB0: (_op_bcs, _am_rel, 2),
+    0xD0: (_op_bne, _am_rel, 2), 0xF0: (_op_beq, _am_rel, 2),
+    0x18: (_op_clc, _am_imp, 2), 0x38: (_op_sec, _am_imp, 2), 0x58: (_op_cli, _am_imp, 2),
+    0x78: (_op_sei, _am_imp, 2), 0xB8: (_op_clv, _am_imp, 2), 0xD8: (_op_cld, _am_imp, 2),
+    0xF8: (_op_sed, _am_imp, 2), 0xEA: (_op_nop, _am_imp, 2),
+})
+
+OPCODE_TABLE = tuple(_OPCODES.get(opcode, (_op_unknown, _am_imp, 2)) for opcode in range(256))
+
+# TraceRing record: cycles, PC, opcode, the two bytes after it, A, X, Y, P, SP.
+# The cycle count (never 0 after reset) doubles as the ring's sequence field.
+TRACE_FORMAT = '<QHBBBBBBBB'
 
-# 6502 CPU Emulation (Minimal with Basic Memory)
 class CPU:
     def __init__(self, rom):
         self.rom = rom
         self.chr_ram = rom.chr_rom if self.rom.chr_banks == 0 else None  # Reference CHR RAM
-        self.ram = bytearray(0x0800)  # 2KB internal RAM
+        self.bus = Bus(rom)
+        self.ram = self.bus.ram
+        self.read_pages = self.bus.read_pages
+        self.write_pages = self.bus.write_pages
+        self.cycles = 0
+        # Opt-in TraceRing; enable_trace() shadows step/run_until with traced versions
+        self.trace = None
+        # Level of the shared IRQ line at a given cycle, set by the NES to the
+        # APU's; polled whenever the I flag is cleared
+        self.irq_line = None
         self.reset()
 
     def reset(self):
@@ -42,106 +903,1377 @@ class CPU:
         self.x = 0x00
         self.y = 0x00
         self.status = 0x24
+        self.cycles = 7  # the reset sequence itself
 
     def step(self):
-        opcode = self.read(self.pc)
-        self.pc += 1
-        if opcode == 0xA9:  # LDA Immediate
-            self.acc = self.read(self.pc)
-            self.pc += 1
-        elif opcode == 0x4C:  # JMP Absolute
-            self.pc = self.read_word(self.pc)
-        return opcode
+        # Executes one instruction and returns the cycles it took
+        start = self.cycles
+        pc = self.pc
+        handler, mode, cycles = OPCODE_TABLE[self.read(pc)]
+        self.pc = (pc + 1) & 0xFFFF
+        handler(self, mode(self))
+        self.cycles += cycles
+        return self.cycles - start
+
+    def run_until(self, cycle_budget):
+        # Runs whole instructions until at least cycle_budget cycles have
+        # passed and returns the cycles actually run (callers carry the overshoot)
+        table = OPCODE_TABLE
+        read = self.read
+        start = self.cycles
+        target = start + cycle_budget
+        while self.cycles < target:
+            pc = self.pc
+            handler, mode, cycles = table[read(pc)]
+            self.pc = (pc + 1) & 0xFFFF
+            handler(self, mode(self))
+            self.cycles += cycles
+        return self.cycles - start
+
+    def enable_trace(self, capacity=1 << 16, fault_path=None):
+        self.trace = TraceRing('6502', TRACE_FORMAT, capacity, fault_path)
+        self.step = self.step_traced
+        self.run_until = self.run_until_traced
+        return self.trace
+
+    def disable_trace(self):
+        trace, self.trace = self.trace, None
+        if trace is not None:
+            del self.step, self.run_until
+        return trace
+
+    def step_traced(self):
+        # Every instruction takes at least two cycles, so this runs exactly one
+        return self.run_until_traced(1)
+
+    def run_until_traced(self, cycle_budget):
+        # run_until plus one TraceRing record per instruction, written before
+        # it executes. Both bytes after the opcode are recorded even for shorter
+        # instructions, straight from the page unless that would cross it;
+        # code never runs from I/O registers, so the extra reads are harmless.
+        trace = self.trace
+        buffer = trace.buffer
+        pack_into = trace.record.pack_into
+        size = trace.record.size
+        end = len(buffer)
+        offset = trace.offset
+        table = OPCODE_TABLE
+        pages = self.read_pages
+        read = self.read
+        start = self.cycles
+        target = start + cycle_budget
+        try:
+            while self.cycles < target:
+                pc = self.pc
+                low = pc & 0xFF
+                if low < 0xFE:
+                    page = pages[pc >> 8]
+                    opcode, operand1, operand2 = page[low], page[low + 1], page[low + 2]
+                else:
+                    opcode, operand1, operand2 = read(pc), read((pc + 1) & 0xFFFF), read((pc + 2) & 0xFFFF)
+                pack_into(buffer, offset, self.cycles, pc, opcode, operand1, operand2,
+                          self.acc, self.x, self.y, self.status, self.sp)
+                offset += size
+                if offset == end:
+                    offset = 0
+                handler, mode, cycles = table[opcode]
+                self.pc = (pc + 1) & 0xFFFF
+                handler(self, mode(self))
+                self.cycles += cycles
+        finally:
+            trace.offset = offset
+        return self.cycles - start
+
+    def interrupt(self, vector):
+        pc = self.pc
+        _push(self, pc >> 8)
+        _push(self, pc & 0xFF)
+        _push(self, (self.status & ~FLAG_B) | FLAG_U)
+        self.status |= FLAG_I
+        self.pc = self.read_word(vector)
+        self.cycles += 7
+
+    def nmi(self):
+        self.interrupt(0xFFFA)
+
+    def irq(self):
+        if not self.status & FLAG_I:
+            self.interrupt(0xFFFE)
 
     def read(self, addr):
-        if 0x0000 <= addr < 0x2000:
-            return self.ram[addr % 0x0800]  # Mirror RAM
-        elif 0x8000 <= addr < 0x10000:
-            offset = addr - 0x8000
-            if len(self.rom.prg_rom) == 0x4000:  # 16KB, mirror
-                return self.rom.prg_rom[offset % 0x4000]
-            return self.rom.prg_rom[offset % 0x8000]  # 32KB
-        return 0x00
+        return self.read_pages[addr >> 8][addr & 0xFF]
+
+    def write(self, addr, value):
+        self.write_pages[addr >> 8][addr & 0xFF] = value
 
     def read_word(self, addr):
-        return self.read(addr) | (self.read(addr + 1) << 8)
+        return self.read(addr) | (self.read((addr + 1) & 0xFFFF) << 8)
+
+# CHR Tile Cache
+# Each 16-byte CHR tile is decoded once into an 8x8 array of 2-bit colour
+# indices, all held in one (tiles, 8, 8) array. Writes to CHR RAM go through
+# write(), which marks just that tile for re-decoding on the next refresh().
+def decode_tiles(planes):
+    # planes: (n, 2, 8) uint8 bitplanes -> (n, 8, 8) colour indices
+    low = np.unpackbits(planes[:, 0, :, np.newaxis], axis=2)
+    high = np.unpackbits(planes[:, 1, :, np.newaxis], axis=2)
+    return low | (high << 1)
+
+class TileCache:
+    def __init__(self, chr_data):
+        load_numpy()
+        self.chr = chr_data
+        self.count = len(chr_data) // 16
+        self.planes = np.frombuffer(chr_data, dtype=np.uint8, count=self.count * 16).reshape(self.count, 2, 8)
+        self.tiles = decode_tiles(self.planes)
+        self.dirty = set()
+
+    def write(self, addr, value):
+        self.chr[addr] = value
+        self.dirty.add(addr >> 4)
+
+    def refresh(self):
+        if self.dirty:
+            indices = np.fromiter(self.dirty, dtype=np.intp, count=len(self.dirty))
+            indices = indices[indices < self.count]
+            self.tiles[indices] = decode_tiles(self.planes[indices])
+            self.dirty.clear()
+        return self.tiles
+
+# NES master palette (2C02), RGB for each of the 64 colour indices
+NES_PALETTE = [
+    (84, 84, 84), (0, 30, 116), (8, 16, 144), (48, 0, 136), (68, 0, 100), (92, 0, 48), (84, 4, 0), (60, 24, 0),
+    (32, 42, 0), (8, 58, 0), (0, 64, 0), (0, 60, 0), (0, 50, 60), (0, 0, 0), (0, 0, 0), (0, 0, 0),
+    (152, 150, 152), (8, 76, 196), (48, 50, 236), (92, 30, 228), (136, 20, 176), (160, 20, 100), (152, 34, 32), (120, 60, 0),
+    (84, 90, 0), (40, 114, 0), (8, 124, 0), (0, 118, 40), (0, 102, 120), (0, 0, 0), (0, 0, 0), (0, 0, 0),
+    (236, 238, 236), (76, 154, 236), (120, 124, 236), (176, 98, 236), (228, 84, 236), (236, 88, 180), (236, 106, 100), (212, 136, 32),
+    (160, 170, 0), (116, 196, 0), (76, 208, 32), (56, 204, 108), (56, 180, 204), (60, 60, 60), (0, 0, 0), (0, 0, 0),
+    (236, 238, 236), (168, 204, 236), (188, 188, 236), (212, 178, 236), (236, 174, 236), (236, 174, 212), (236, 180, 176), (228, 196, 144),
+    (204, 210, 120), (180, 222, 120), (168, 226, 144), (152, 226, 180), (160, 214, 228), (160, 162, 160), (0, 0, 0), (0, 0, 0),
+]
+
+# Logical nametable ($2000/$2400/$2800/$2C00) -> physical 1KB page of VRAM
+_NAMETABLE_LAYOUT = {
+    MIRROR_HORIZONTAL: (0, 0, 1, 1),
+    MIRROR_VERTICAL: (0, 1, 0, 1),
+    MIRROR_SINGLE_LOW: (0, 0, 0, 0),
+    MIRROR_SINGLE_HIGH: (1, 1, 1, 1),
+}
+
+# For each of the 960 tiles in a nametable: its attribute byte and bit shift
+def _build_ppu_tables():
+    global _ATTR_INDEX, _ATTR_SHIFT
+    rows, cols = np.divmod(np.arange(960), 32)
+    _ATTR_INDEX = (rows >> 2) * 8 + (cols >> 2)
+    _ATTR_SHIFT = ((rows & 2) << 1) | (cols & 2)
 
-# PPU Emulation (Tile-Based Rendering)
+# PPU Emulation (Scanline Renderer)
+# The CPU runs in large chunks, and the PPU catches up lazily: before any
+# register write that changes what is drawn (and on PPUSTATUS reads, for
+# sprite 0), every scanline up to the current one is rendered with the old
+# state in a single NumPy batch. A frame with no mid-frame writes is drawn in
+# one batch; split-screen scrolling costs one batch per split.
 class PPU:
-    def __init__(self, cpu):
-        pygame.init()
-        pygame.display.set_caption("NES Emulator")
-        self.screen = pygame.display.set_mode((256, 240))
-        self.clock = pygame.time.Clock()
-        self.framebuffer = pygame.Surface((256, 240))
+    DOTS_PER_LINE = 341
+    VISIBLE_LINES = 240
+
+    def __init__(self, cpu, display=True):
+        load_numpy()
+        if display:
+            load_pygame().init()
+            pygame.display.set_caption("NES Emulator")
+            self.screen = pygame.display.set_mode((256, 240))
+            self.clock = pygame.time.Clock()
+            # 8-bit surface carrying the master palette; frames are blitted as
+            # arrays of colour indices
+            self.framebuffer = pygame.Surface((256, 240), 0, 8)
+            self.framebuffer.set_palette(NES_PALETTE)
+        self.frame = np.zeros((240, 256), dtype=np.uint8)
         self.cpu = cpu  # Reference CPU for CHR RAM access
+        self.mapper = cpu.bus.mapper
+        self.tile_cache = TileCache(cpu.rom.chr_rom)
+
+        self.vram = bytearray(0x800)  # 2KB nametable RAM
+        self.palette_ram = bytearray(32)
+        self.oam = bytearray(b'\xff' * 256)
+        self.ctrl = 0
+        self.mask = 0
+        self.status = 0
+        self.oam_addr = 0
+        self.read_buffer = 0
+        # Loopy scroll registers: v (current address), t (temporary), fine x, write toggle
+        self.v = 0
+        self.t = 0
+        self.fine_x = 0
+        self.w = 0
+
+        self.frame_start = 0
+        self.rendered = 0  # scanlines of this frame already drawn
+        self.line_y = 0  # playfield row of the next scanline
+        self.playfield = np.zeros((480, 512), dtype=np.uint8)
+        self.playfield_dirty = True
+        self.layout = None
+        self.palette_lut = np.zeros(32, dtype=np.uint8)
+        self.palette_dirty = True
+
+    # Frame timing, driven by NES.run_frame
+    def begin_frame(self, cycle):
+        self.frame_start = cycle
+        self.rendered = 0
+        if self.mask & 0x18:
+            self.v = self.t
+        self.line_y = self.scroll_y(self.t)
 
-    def render_frame(self, chr_data, palette):
-        self.framebuffer.fill((0, 0, 0))
-        # Use CHR RAM if available, otherwise CHR ROM
-        chr_source = self.cpu.chr_ram if self.cpu.chr_ram is not None else chr_data
-        for tile_y in range(30):
-            for tile_x in range(32):
-                tile_index = tile_y * 32 + tile_x
-                if tile_index < len(chr_source) // 16:
-                    self.draw_tile(chr_source, tile_x * 8, tile_y * 8, tile_index, palette)
+    def finish_frame(self):
+        self.render_to(self.VISIBLE_LINES)
+
+    def enter_vblank(self):
+        self.status |= 0x80
+        if self.ctrl & 0x80:
+            self.cpu.nmi()
+
+    def leave_vblank(self):
+        self.status &= 0x1F  # vblank, sprite 0 hit and overflow clear on the pre-render line
+
+    def present(self):
+        pygame.surfarray.blit_array(self.framebuffer, self.frame.T)
         self.screen.blit(self.framebuffer, (0, 0))
         pygame.display.flip()
 
-    def draw_tile(self, chr_data, x, y, index, palette):
-        tile_data = chr_data[index * 16:(index + 1) * 16]
-        for row in range(8):
-            lsb = tile_data[row]
-            msb = tile_data[row + 8]
-            for bit in range(8):
-                color_bit = ((lsb >> (7 - bit)) & 1) | (((msb >> (7 - bit)) & 1) << 1)
-                self.framebuffer.set_at((x + bit, y + row), palette[color_bit])
+    def current_line(self):
+        return int((self.cpu.cycles - self.frame_start) * 3) // self.DOTS_PER_LINE
 
-# APU Emulation (Basic Square Wave)
-class APU:
+    def catch_up(self):
+        # Draw through the scanline the CPU is on; a write mid-line shows from the next one
+        self.render_to(min(self.current_line() + 1, self.VISIBLE_LINES))
+
+    def render_to(self, line):
+        if line > self.rendered:
+            self.render_lines(self.rendered, line)
+            self.rendered = line
+
+    def mapping_changed(self):
+        self.catch_up()
+        self.playfield_dirty = True
+
+    # CPU-visible registers ($2000-$2007, mirrored)
+    def read_register(self, addr):
+        reg = addr & 0x07
+        if reg == 2:
+            self.catch_up()
+            value = self.status
+            self.status &= 0x7F
+            self.w = 0
+            return value
+        if reg == 4:
+            return self.oam[self.oam_addr]
+        if reg == 7:
+            vaddr = self.v & 0x3FFF
+            if vaddr >= 0x3F00:
+                value = self.palette_ram[self.palette_index(vaddr)]
+                self.read_buffer = self.read_vram(vaddr - 0x1000)
+            else:
+                value = self.read_buffer
+                self.read_buffer = self.read_vram(vaddr)
+            self.v = (self.v + (32 if self.ctrl & 0x04 else 1)) & 0x7FFF
+            return value
+        return 0x00
+
+    def write_register(self, addr, value):
+        reg = addr & 0x07
+        if reg == 0:  # PPUCTRL
+            self.catch_up()
+            if (value ^ self.ctrl) & 0x10:
+                self.playfield_dirty = True
+            nmi_edge = value & 0x80 and not self.ctrl & 0x80
+            self.ctrl = value
+            self.t = (self.t & 0x73FF) | ((value & 0x03) << 10)
+            if nmi_edge and self.status & 0x80:
+                self.cpu.nmi()
+        elif reg == 1:  # PPUMASK
+            self.catch_up()
+            self.mask = value
+        elif reg == 3:  # OAMADDR
+            self.oam_addr = value
+        elif reg == 4:  # OAMDATA
+            self.catch_up()
+            self.oam[self.oam_addr] = value
+            self.oam_addr = (self.oam_addr + 1) & 0xFF
+        elif reg == 5:  # PPUSCROLL
+            self.catch_up()
+            if self.w == 0:
+                self.t = (self.t & 0x7FE0) | (value >> 3)
+                self.fine_x = value & 0x07
+            else:
+                self.t = (self.t & 0x0C1F) | ((value & 0xF8) << 2) | ((value & 0x07) << 12)
+            self.w ^= 1
+        elif reg == 6:  # PPUADDR
+            self.catch_up()
+            if self.w == 0:
+                self.t = (self.t & 0x00FF) | ((value & 0x3F) << 8)
+            else:
+                self.t = (self.t & 0x7F00) | value
+                self.v = self.t
+                # Mid-frame PPUADDR writes reposition the scanlines still to come
+                self.line_y = self.scroll_y(self.v)
+            self.w ^= 1
+        elif reg == 7:  # PPUDATA
+            self.write_vram(self.v & 0x3FFF, value)
+            self.v = (self.v + (32 if self.ctrl & 0x04 else 1)) & 0x7FFF
+
+    def oam_dma(self, page):
+        self.catch_up()
+        source = self.cpu.read_pages[page]
+        start = self.oam_addr
+        if isinstance(source, HandlerPage):
+            data = bytes(source[i] for i in range(256))
+        else:
+            # Anything short of a whole page reads as open bus, so OAM stays 256 bytes
+            data = bytes(source[:256]).ljust(256, b'\0')
+        self.oam[start:] = data[:256 - start]
+        self.oam[:start] = data[256 - start:]
+        self.cpu.cycles += 513 + (self.cpu.cycles & 1)
+
+    # PPU address space
+    @staticmethod
+    def palette_index(vaddr):
+        index = vaddr & 0x1F
+        if index & 0x13 == 0x10:  # $3F10/$3F14/$3F18/$3F1C mirror the backdrop entries
+            index &= 0x0F
+        return index
+
+    def nametable_offset(self, vaddr):
+        table = (vaddr >> 10) & 0x03
+        return (_NAMETABLE_LAYOUT[self.mapper.mirroring][table] << 10) | (vaddr & 0x03FF)
+
+    def read_vram(self, vaddr):
+        if vaddr < 0x2000:
+            return self.mapper.chr[vaddr >> 12][vaddr & 0x0FFF]
+        return self.vram[self.nametable_offset(vaddr)]
+
+    def write_vram(self, vaddr, value):
+        if vaddr < 0x2000:
+            if self.cpu.chr_ram is not None:
+                self.catch_up()
+                self.tile_cache.write((self.mapper.chr_bank[vaddr >> 12] << 12) | (vaddr & 0x0FFF), value)
+                self.playfield_dirty = True
+        elif vaddr < 0x3F00:
+            self.catch_up()
+            self.vram[self.nametable_offset(vaddr)] = value
+            self.playfield_dirty = True
+        else:
+            self.catch_up()
+            self.palette_ram[self.palette_index(vaddr)] = value & 0x3F
+            self.palette_dirty = True
+
+    # Rendering
+    @staticmethod
+    def scroll_y(addr):
+        # Playfield row (0-479) addressed by the vertical bits of v/t
+        return (((addr >> 11) & 1) * 240 + ((addr >> 5) & 31) * 8 + ((addr >> 12) & 7)) % 480
+
+    def scroll_x(self):
+        return ((self.t >> 10) & 1) * 256 + (self.t & 31) * 8 + self.fine_x
+
+    def update_playfield(self):
+        # Background colour values (palette * 4 + pixel) for the whole 512x480
+        # nametable space, rebuilt only after VRAM, CHR or mapping changes
+        tiles = self.tile_cache.refresh()
+        tile_base = self.mapper.chr_bank[(self.ctrl >> 4) & 1] << 8
+        layout = _NAMETABLE_LAYOUT[self.mapper.mirroring]
+        pages = {}
+        for page in set(layout):
+            base = page << 10
+            names = np.frombuffer(self.vram, dtype=np.uint8, count=960, offset=base)
+            attrs = np.frombuffer(self.vram, dtype=np.uint8, count=64, offset=base + 0x3C0)
+            palettes = ((attrs[_ATTR_INDEX] >> _ATTR_SHIFT) & 3) << 2
+            pixels = tiles[tile_base + names.astype(np.intp)] | palettes[:, np.newaxis, np.newaxis]
+            pages[page] = pixels.reshape(30, 32, 8, 8).transpose(0, 2, 1, 3).reshape(240, 256)
+        for table, page in enumerate(layout):
+            row, col = (table >> 1) * 240, (table & 1) * 256
+            self.playfield[row:row + 240, col:col + 256] = pages[page]
+        self.playfield_dirty = False
+
+    def update_palette(self):
+        lut = np.frombuffer(self.palette_ram, dtype=np.uint8).copy()
+        lut[0::4] = self.palette_ram[0]  # colour 0 of every palette shows the backdrop
+        self.palette_lut = lut
+        self.palette_dirty = False
+
+    def render_lines(self, start, end):
+        if self.palette_dirty:
+            self.update_palette()
+        out = self.frame[start:end]
+        mask = self.mask
+        if not mask & 0x18:
+            out[:] = self.palette_lut[0]
+            return
+        count = end - start
+        if mask & 0x08:
+            if self.playfield_dirty:
+                self.update_playfield()
+            rows = (self.line_y + np.arange(count)) % 480
+            cols = (self.scroll_x() + np.arange(256)) % 512
+            pixels = self.playfield[rows[:, np.newaxis], cols]
+            if not mask & 0x02:
+                pixels[:, :8] = 0
+        else:
+            pixels = np.zeros((count, 256), dtype=np.uint8)
+        self.line_y = (self.line_y + count) % 480
+        pixels = self.render_sprites(start, end, pixels)
+        out[:] = self.palette_lut[pixels]
+
+    def render_sprites(self, start, end, background):
+        oam = np.frombuffer(self.oam, dtype=np.uint8).reshape(64, 4)
+        height = 16 if self.ctrl & 0x20 else 8
+        top = oam[:, 0].astype(np.intp) + 1  # sprites are drawn one line below their Y
+        lines = np.arange(start, end)
+        on_line = (lines >= top[:, np.newaxis]) & (lines < top[:, np.newaxis] + height)
+        # Only the first eight sprites in OAM order are drawn on each line
+        rank = np.cumsum(on_line, axis=0)
+        if rank[-1].max() > 8:
+            self.status |= 0x20
+        if not self.mask & 0x10:
+            return background  # sprites are still evaluated, so overflow is set
+        drawn = on_line & (rank <= 8)
+        active = np.flatnonzero(drawn.any(axis=1))
+        if not len(active):
+            return background
+
+        count = end - start
+        # Eight spare columns take sprites hanging off the right edge
+        layer = np.zeros((count, 264), dtype=np.uint8)
+        behind = np.zeros((count, 264), dtype=bool)
+        sprite0 = None
+        tiles = self.tile_cache.refresh()
+        banks = self.mapper.chr_bank
+        for index in active[::-1]:  # lower OAM index drawn last, so it wins
+            tile, attr, x = self.oam[index * 4 + 1:index * 4 + 4]
+            if height == 16:
+                table = tile & 1
+                tile &= 0xFE
+                image = np.concatenate((tiles[(banks[table] << 8) + tile], tiles[(banks[table] << 8) + tile + 1]))
+            else:
+                image = tiles[(banks[(self.ctrl >> 3) & 1] << 8) + tile]
+            if attr & 0x80:
+                image = image[::-1]
+            if attr & 0x40:
+                image = image[:, ::-1]
+            rows = np.flatnonzero(drawn[index])
+            image = image[lines[rows] - top[index]]
+            opaque = image != 0
+            region = layer[rows, x:x + 8]
+            layer[rows, x:x + 8] = np.where(opaque, image | (0x10 | ((attr & 3) << 2)), region)
+            behind[rows, x:x + 8] = np.where(opaque, bool(attr & 0x20), behind[rows, x:x + 8])
+            if index == 0:
+                sprite0 = (rows, x, opaque)
+
+        layer = layer[:, :256]
+        behind = behind[:, :256]
+        if not self.mask & 0x04:
+            layer[:, :8] = 0
+        bg_opaque = (background & 3) != 0
+
+        if sprite0 is not None and not self.status & 0x40 and self.mask & 0x18 == 0x18:
+            rows, x, opaque = sprite0
+            hits = np.zeros((count, 264), dtype=bool)
+            hits[rows, x:x + 8] = opaque
+            hits = hits[:, :255] & bg_opaque[:, :255]
+            if not self.mask & 0x02 or not self.mask & 0x04:
+                hits[:, :8] = False
+            if hits.any():
+                self.status |= 0x40
+
+        show = (layer != 0) & (~behind | ~bg_opaque)
+        return np.where(show, layer, background)
+
+# APU Emulation
+CPU_CLOCK = 1789773  # NTSC
+
+LENGTH_TABLE = (10, 254, 20, 2, 40, 4, 80, 6, 160, 8, 60, 10, 14, 12, 26, 14,
+                12, 16, 24, 18, 48, 20, 96, 22, 192, 24, 72, 26, 16, 28, 32, 30)
+NOISE_PERIODS = (4, 8, 16, 32, 64, 96, 128, 160, 202, 254, 380, 508, 762, 1016, 2034, 4068)
+DMC_RATES = (428, 380, 340, 320, 286, 254, 226, 214, 190, 160, 142, 128, 106, 84, 72, 54)
+
+def _noise_sequence(tap):
+    # One period of the 15-bit LFSR from power-on; 1 where the channel sounds
+    shift = 1
+    gate = []
+    while True:
+        gate.append(1 - (shift & 1))
+        feedback = (shift ^ (shift >> tap)) & 1
+        shift = (shift >> 1) | (feedback << 14)
+        if shift == 1:
+            return np.array(gate, dtype=np.intp)
+
+def _build_apu_tables():
+    global _DUTY_TABLE, _TRIANGLE_TABLE, _NOISE_LONG, _NOISE_SHORT, _PULSE_MIX, _TND_MIX
+    _DUTY_TABLE = np.array([
+        [0, 1, 0, 0, 0, 0, 0, 0],
+        [0, 1, 1, 0, 0, 0, 0, 0],
+        [0, 1, 1, 1, 1, 0, 0, 0],
+        [1, 0, 0, 1, 1, 1, 1, 1],
+    ], dtype=np.intp)
+    _TRIANGLE_TABLE = np.array(list(range(15, -1, -1)) + list(range(16)), dtype=np.intp)
+    _NOISE_LONG = _noise_sequence(1)
+    _NOISE_SHORT = _noise_sequence(6)
+    # Non-linear mixer lookup tables (pulse1 + pulse2, and 3*triangle + 2*noise + dmc)
+    _PULSE_MIX = np.array([0.0] + [95.52 / (8128.0 / n + 100) for n in range(1, 31)])
+    _TND_MIX = np.array([0.0] + [163.67 / (24329.0 / n + 100) for n in range(1, 203)])
+
+# Frame sequencer: (CPU cycle, clocks length/sweep too) for the 4- and 5-step modes
+_FRAME_STEPS = {
+    False: ((7457, False), (14913, True), (22371, False), (29829, True)),
+    True: ((7457, False), (14913, True), (22371, False), (37281, True)),
+}
+_FRAME_PERIOD = {False: 29830, True: 37282}
+
+class EnvelopeChannel:
+    # Length counter and volume envelope shared by the pulse and noise channels
+    def __init__(self):
+        self.enabled = False
+        self.length = 0
+        self.halt = False
+        self.constant = False
+        self.volume = 0
+        self.envelope_start = False
+        self.envelope_divider = 0
+        self.decay = 0
+
+    def write_control(self, value):
+        self.halt = bool(value & 0x20)
+        self.constant = bool(value & 0x10)
+        self.volume = value & 0x0F
+
+    def load_length(self, value):
+        if self.enabled:
+            self.length = LENGTH_TABLE[value >> 3]
+        self.envelope_start = True
+
+    def envelope_level(self):
+        if not self.length:
+            return 0
+        return self.volume if self.constant else self.decay
+
+    def quarter(self):
+        if self.envelope_start:
+            self.envelope_start = False
+            self.decay = 15
+            self.envelope_divider = self.volume
+        elif self.envelope_divider:
+            self.envelope_divider -= 1
+        else:
+            self.envelope_divider = self.volume
+            if self.decay:
+                self.decay -= 1
+            elif self.halt:  # the halt bit doubles as envelope loop
+                self.decay = 15
+
+    def half(self):
+        if self.length and not self.halt:
+            self.length -= 1
+
+class PulseChannel(EnvelopeChannel):
+    def __init__(self, negate_offset):
+        super().__init__()
+        self.negate_offset = negate_offset  # pulse 1 negates in ones' complement
+        self.duty = 0
+        self.timer = 0
+        self.sweep_enabled = False
+        self.sweep_period = 0
+        self.sweep_negate = False
+        self.sweep_shift = 0
+        self.sweep_divider = 0
+        self.sweep_reload = False
+        self.phase = 0.0
+
+    def write(self, reg, value):
+        if reg == 0:
+            self.duty = value >> 6
+            self.write_control(value)
+        elif reg == 1:
+            self.sweep_enabled = bool(value & 0x80)
+            self.sweep_period = (value >> 4) & 0x07
+            self.sweep_negate = bool(value & 0x08)
+            self.sweep_shift = value & 0x07
+            self.sweep_reload = True
+        elif reg == 2:
+            self.timer = (self.timer & 0x700) | value
+        else:
+            self.timer = (self.timer & 0xFF) | ((value & 0x07) << 8)
+            self.load_length(value)
+            self.phase = 0.0
+
+    def target_period(self):
+        change = self.timer >> self.sweep_shift
+        if self.sweep_negate:
+            return self.timer - change - self.negate_offset
+        return self.timer + change
+
+    def half(self):
+        super().half()
+        target = self.target_period()
+        if (not self.sweep_divider and self.sweep_enabled and self.sweep_shift
+                and self.timer >= 8 and target <= 0x7FF):
+            self.timer = max(target, 0)
+        if not self.sweep_divider or self.sweep_reload:
+            self.sweep_divider = self.sweep_period
+            self.sweep_reload = False
+        else:
+            self.sweep_divider -= 1
+
+    def render(self, count, cycles_per_sample):
+        rate = cycles_per_sample / (2 * (self.timer + 1))
+        steps = self.phase + rate * np.arange(count)
+        self.phase = (self.phase + rate * count) % 8
+        level = self.envelope_level()
+        if not level or self.timer < 8 or self.target_period() > 0x7FF:
+            return 0
+        return _DUTY_TABLE[self.duty][steps.astype(np.intp) & 7] * level
+
+class TriangleChannel:
     def __init__(self):
-        pygame.mixer.init(frequency=44100, size=-16, channels=1, buffer=512)
-        self.channel = pygame.mixer.Channel(0)  # Use a single channel
-        self.sound = self.generate_square(440, 1/60)  # Pre-generate for one frame
+        self.enabled = False
+        self.length = 0
+        self.control = False
+        self.linear_reload_value = 0
+        self.linear = 0
+        self.linear_reload = False
+        self.timer = 0
+        self.phase = 0.0
+
+    def write(self, reg, value):
+        if reg == 0:
+            self.control = bool(value & 0x80)
+            self.linear_reload_value = value & 0x7F
+        elif reg == 2:
+            self.timer = (self.timer & 0x700) | value
+        elif reg == 3:
+            self.timer = (self.timer & 0xFF) | ((value & 0x07) << 8)
+            if self.enabled:
+                self.length = LENGTH_TABLE[value >> 3]
+            self.linear_reload = True
+
+    def quarter(self):
+        if self.linear_reload:
+            self.linear = self.linear_reload_value
+        elif self.linear:
+            self.linear -= 1
+        if not self.control:
+            self.linear_reload = False
+
+    def half(self):
+        if self.length and not self.control:
+            self.length -= 1
+
+    def render(self, count, cycles_per_sample):
+        if self.length and self.linear and self.timer >= 2:
+            rate = cycles_per_sample / (self.timer + 1)
+            steps = self.phase + rate * np.arange(count)
+            self.phase = (self.phase + rate * count) % 32
+            return _TRIANGLE_TABLE[steps.astype(np.intp) & 31]
+        return _TRIANGLE_TABLE[int(self.phase) & 31]  # a halted triangle holds its output
+
+class NoiseChannel(EnvelopeChannel):
+    def __init__(self):
+        super().__init__()
+        self.short_mode = False
+        self.period = NOISE_PERIODS[0]
+        self.position = 0.0
+
+    def write(self, reg, value):
+        if reg == 0:
+            self.write_control(value)
+        elif reg == 2:
+            self.short_mode = bool(value & 0x80)
+            self.period = NOISE_PERIODS[value & 0x0F]
+        elif reg == 3:
+            self.load_length(value)
+
+    def render(self, count, cycles_per_sample):
+        sequence = _NOISE_SHORT if self.short_mode else _NOISE_LONG
+        rate = cycles_per_sample / self.period
+        steps = self.position + rate * np.arange(count)
+        self.position = (self.position + rate * count) % len(sequence)
+        level = self.envelope_level()
+        if not level:
+            return 0
+        return sequence[steps.astype(np.intp) % len(sequence)] * level
+
+class DMCChannel:
+    def __init__(self, cpu):
+        self.cpu = cpu
+        self.irq_enabled = False
+        self.loop = False
+        self.rate = DMC_RATES[0]
+        self.level = 0
+        self.sample_address = 0xC000
+        self.sample_length = 1
+        self.address = 0
+        self.remaining = 0
+        self.shift = 0
+        self.bits = 0
+        self.silent = True
+        self.timer = 0.0
+        self.irq_flag = False
+
+    def write(self, reg, value):
+        if reg == 0:
+            self.irq_enabled = bool(value & 0x80)
+            self.loop = bool(value & 0x40)
+            self.rate = DMC_RATES[value & 0x0F]
+            if not self.irq_enabled:
+                self.irq_flag = False
+        elif reg == 1:
+            self.level = value & 0x7F
+        elif reg == 2:
+            self.sample_address = 0xC000 | (value << 6)
+        else:
+            self.sample_length = (value << 4) | 1
+
+    def start(self):
+        self.address = self.sample_address
+        self.remaining = self.sample_length
+
+    def irq_cycle(self, cycle):
+        # CPU cycle of the fetch that ends the sample and raises IRQ, given
+        # that synthesis has reached cycle; None if this sample never will
+        if not self.irq_enabled or self.loop or not self.remaining or self.irq_flag:
+            return None
+        clocks = (self.bits - 1 if self.bits else 0) + 8 * (self.remaining - 1)
+        return cycle + self.timer + clocks * self.rate
 
-    def generate_square(self, frequency, duration):
-        samples = int(44100 * duration)
-        t = np.linspace(0, duration, samples, endpoint=False)
-        wave = np.where(np.sin(2 * np.pi * frequency * t) > 0, 16383, -16384)
-        return pygame.sndarray.make_sound(wave.astype(np.int16))
+    def fetch(self):
+        self.shift = self.cpu.read(self.address)
+        self.address = ((self.address + 1) & 0x7FFF) | 0x8000
+        self.remaining -= 1
+        if not self.remaining:
+            if self.loop:
+                self.start()
+            elif self.irq_enabled:
+                self.irq_flag = True
 
-    def play(self):
-        if not self.channel.get_busy():  # Play only if not already playing
-            self.channel.play(self.sound)
+    def clock_bit(self):
+        if not self.silent:
+            if self.shift & 1:
+                if self.level <= 125:
+                    self.level += 2
+            elif self.level >= 2:
+                self.level -= 2
+            self.shift >>= 1
+        if self.bits:
+            self.bits -= 1
+        if not self.bits:
+            self.bits = 8
+            self.silent = not self.remaining
+            if self.remaining:
+                self.fetch()
+
+    def render(self, count, cycles_per_sample):
+        if not self.remaining and self.silent:
+            return self.level
+        # Delta bits are clocked every `rate` CPU cycles; each sample holds
+        # the output level of the last bit clocked before it
+        span = count * cycles_per_sample
+        times = []
+        levels = [self.level]
+        t = self.timer
+        while t < span:
+            self.clock_bit()
+            times.append(t)
+            levels.append(self.level)
+            t += self.rate
+        self.timer = t - span
+        index = np.searchsorted(np.array(times), np.arange(count) * cycles_per_sample, side='right')
+        return np.array(levels, dtype=np.intp)[index]
+
+def _ring_field(index):
+    return property(lambda self: int(self.state[index]),
+                    lambda self, value: self.state.__setitem__(index, value))
+
+class SampleRing:
+    # Single-producer, single-consumer ring of int16 samples. Each side only
+    # advances its own position after touching the data, so neither needs a lock.
+    # Positions and counters sit in a small header ahead of the samples, so
+    # the ring can live in a shared memory block and be used across processes.
+    HEADER_BYTES = 32
+
+    def __init__(self, capacity, buffer=None, offset=0):
+        load_numpy()
+        if buffer is None:
+            buffer = bytearray(self.size(capacity))
+        self.state = np.ndarray(4, dtype=np.int64, buffer=buffer, offset=offset)
+        self.buffer = np.ndarray(capacity, dtype=np.int16, buffer=buffer, offset=offset + self.HEADER_BYTES)
+        self.capacity = capacity
+
+    @classmethod
+    def size(cls, capacity):
+        return cls.HEADER_BYTES + 2 * capacity
+
+    write_pos = _ring_field(0)
+    read_pos = _ring_field(1)
+    overruns = _ring_field(2)
+    underruns = _ring_field(3)
+
+    def available(self):
+        return self.write_pos - self.read_pos
+
+    def write(self, samples):
+        space = self.capacity - self.available()
+        if len(samples) > space:
+            self.overruns += 1
+            samples = samples[:space]
+        start = self.write_pos % self.capacity
+        first = min(len(samples), self.capacity - start)
+        self.buffer[start:start + first] = samples[:first]
+        self.buffer[:len(samples) - first] = samples[first:]
+        self.write_pos += len(samples)
+
+    def read(self, count):
+        count = min(count, self.available())
+        start = self.read_pos % self.capacity
+        first = min(count, self.capacity - start)
+        samples = np.concatenate((self.buffer[start:start + first], self.buffer[:count - first]))
+        self.read_pos += count
+        return samples
+
+# Mixer side of the audio path: drains a SampleRing into a pygame channel in
+# fixed chunks. Used by the APU directly, or by the presenter process when the
+# APU runs in a worker and writes into a shared ring.
+class AudioOutput:
+    # Requested sample rate -> mixer settings the device actually gave us
+    opened = {}
+
+    def __init__(self, sample_rate=44100, buffer_frames=2):
+        load_numpy()
+        load_pygame()
+        self.channel = None
+        self.channels = 1
+        try:
+            # Reopening the device costs a noticeable pause and can click, so an
+            # open mixer is kept when it is already the one this request gets
+            current = pygame.mixer.get_init()
+            if current is None or current not in ((sample_rate, -16, 1), self.opened.get(sample_rate)):
+                pygame.mixer.quit()
+                pygame.mixer.init(frequency=sample_rate, size=-16, channels=1, buffer=512)
+                current = self.opened[sample_rate] = pygame.mixer.get_init()
+            sample_rate, _, self.channels = current
+            self.channel = pygame.mixer.Channel(0)  # Use a single channel
+        except pygame.error:
+            pass  # no audio device: keep synthesizing so timing stays the same
+        self.sample_rate = sample_rate
+        # Audio reaches the mixer in chunks of buffer_frames frames; with one
+        # chunk playing and one queued, that sets the latency/underrun trade-off
+        self.chunk_size = max(1, round(sample_rate / 60 * buffer_frames))
+
+    def pump(self, ring):
+        # Keep one chunk queued behind the one playing
+        if self.channel is None:
+            ring.read(ring.available())
+            return
+        while self.channel.get_queue() is None and ring.available():
+            chunk = ring.read(self.chunk_size)
+            if len(chunk) < self.chunk_size:
+                ring.underruns += 1
+                chunk = np.concatenate((chunk, np.full(self.chunk_size - len(chunk), chunk[-1], dtype=np.int16)))
+            if self.channels > 1:
+                chunk = np.repeat(chunk[:, np.newaxis], self.channels, axis=1)
+            self.channel.queue(pygame.sndarray.make_sound(chunk))
+
+    def wait(self, ring):
+        # Audio-driven sync: hold emulation until the mixer has taken all but
+        # one chunk, so the sound card clock sets the frame rate
+        if self.channel is None:
+            return False
+        while True:
+            self.pump(ring)
+            if ring.available() <= self.chunk_size:
+                return True
+            time.sleep(0.001)
+
+class APU:
+    def __init__(self, cpu, sample_rate=44100, buffer_frames=2, output=True, ring=None):
+        load_numpy()
+        self.cpu = cpu
+        # Without output (worker process) samples go to a ring someone else drains
+        self.output = AudioOutput(sample_rate, buffer_frames) if output else None
+        if self.output is not None:
+            sample_rate = self.output.sample_rate
+            self.chunk_size = self.output.chunk_size
+        else:
+            self.chunk_size = max(1, round(sample_rate / 60 * buffer_frames))
+        self.sample_rate = sample_rate
+        self.cycles_per_sample = CPU_CLOCK / sample_rate
+        self.ring = ring if ring is not None else SampleRing(self.chunk_size * 4)
+
+        self.pulse1 = PulseChannel(1)
+        self.pulse2 = PulseChannel(0)
+        self.triangle = TriangleChannel()
+        self.noise = NoiseChannel()
+        self.dmc = DMCChannel(cpu)
+        self.five_step = False
+        self.irq_inhibit = False
+        self.frame_irq = False
+        self.step_index = 0
+        self.sequence_start = cpu.cycles
+        self.cycle = cpu.cycles
+        self.sample_clock = 0.0
+        self.pending = []
+        self.dc = 0.0
+
+    # CPU-visible registers ($4000-$4017)
+    def read_register(self, addr):
+        if addr == 0x4015:
+            self.run_to(self.cpu.cycles)
+            status = ((self.pulse1.length > 0) | ((self.pulse2.length > 0) << 1)
+                      | ((self.triangle.length > 0) << 2) | ((self.noise.length > 0) << 3)
+                      | ((self.dmc.remaining > 0) << 4) | (self.frame_irq << 6)
+                      | (self.dmc.irq_flag << 7))
+            self.frame_irq = False  # reading acknowledges the frame IRQ
+            return status
+        return 0x00
+
+    def write_register(self, addr, value):
+        if addr > 0x4017 or addr in (0x4014, 0x4016):
+            return
+        self.run_to(self.cpu.cycles)
+        if addr < 0x4004:
+            self.pulse1.write(addr & 3, value)
+        elif addr < 0x4008:
+            self.pulse2.write(addr & 3, value)
+        elif addr < 0x400C:
+            self.triangle.write(addr & 3, value)
+        elif addr < 0x4010:
+            self.noise.write(addr & 3, value)
+        elif addr < 0x4014:
+            self.dmc.write(addr & 3, value)
+        elif addr == 0x4015:
+            for bit, channel in enumerate((self.pulse1, self.pulse2, self.triangle, self.noise)):
+                channel.enabled = bool(value & (1 << bit))
+                if not channel.enabled:
+                    channel.length = 0
+            if value & 0x10:
+                if not self.dmc.remaining:
+                    self.dmc.start()
+            else:
+                self.dmc.remaining = 0
+            self.dmc.irq_flag = False
+        else:  # $4017 frame counter
+            self.five_step = bool(value & 0x80)
+            self.irq_inhibit = bool(value & 0x40)
+            if self.irq_inhibit:
+                self.frame_irq = False
+            self.step_index = 0
+            self.sequence_start = self.cycle
+            if self.five_step:
+                self.clock_quarter()
+                self.clock_half()
+
+    def clock_quarter(self):
+        self.pulse1.quarter()
+        self.pulse2.quarter()
+        self.triangle.quarter()
+        self.noise.quarter()
+
+    def clock_half(self):
+        self.pulse1.half()
+        self.pulse2.half()
+        self.triangle.half()
+        self.noise.half()
+
+    # Synthesis
+    def run_to(self, cycle):
+        # Synthesize up to the given CPU cycle, stopping at each frame
+        # sequencer clock so envelopes and counters change between segments
+        while self.cycle < cycle:
+            step_cycle, half = _FRAME_STEPS[self.five_step][self.step_index]
+            event = self.sequence_start + step_cycle
+            end = min(cycle, event)
+            self.synthesize(end)
+            if end == event:
+                self.clock_quarter()
+                if half:
+                    self.clock_half()
+                self.step_index += 1
+                if self.step_index == len(_FRAME_STEPS[self.five_step]):
+                    if not self.five_step and not self.irq_inhibit:
+                        self.frame_irq = True
+                    self.step_index = 0
+                    self.sequence_start += _FRAME_PERIOD[self.five_step]
+
+    # IRQ line (frame counter and DMC), sampled by NES.run_cpu and the CPU
+    def irq_pending(self, cycle):
+        self.run_to(cycle)
+        return self.frame_irq or self.dmc.irq_flag
+
+    def next_irq_cycle(self):
+        # Earliest cycle at which the line can next rise, or None
+        rises = [self.dmc.irq_cycle(self.cycle)]
+        if not self.five_step and not self.irq_inhibit and not self.frame_irq:
+            rises.append(self.sequence_start + _FRAME_STEPS[False][-1][0])
+        rises = [rise for rise in rises if rise is not None]
+        return min(rises) if rises else None
+
+    def synthesize(self, end):
+        clock = self.sample_clock + (end - self.cycle) / self.cycles_per_sample
+        count = int(clock) - int(self.sample_clock)
+        self.sample_clock = clock
+        self.cycle = end
+        if count <= 0:
+            return
+        step = self.cycles_per_sample
+        pulse = self.pulse1.render(count, step) + self.pulse2.render(count, step)
+        tnd = 3 * self.triangle.render(count, step) + 2 * self.noise.render(count, step) + self.dmc.render(count, step)
+        self.pending.append(np.broadcast_to(_PULSE_MIX[pulse] + _TND_MIX[tnd], (count,)))
+
+    def end_frame(self):
+        # Everything synthesized this frame goes to the ring as one block
+        self.run_to(self.cpu.cycles)
+        if self.sample_clock > 1e9:
+            self.sample_clock -= int(self.sample_clock)
+        if not self.pending:
+            return
+        block = np.concatenate(self.pending)
+        self.pending = []
+        self.dc += (block.mean() - self.dc) * 0.05
+        self.ring.write(np.clip((block - self.dc) * 40000, -32768, 32767).astype(np.int16))
+
+    # Output
+    def pump(self):
+        if self.output is None:
+            self.ring.read(self.ring.available())
+            return
+        self.output.pump(self.ring)
+
+    def wait(self):
+        return self.output is not None and self.output.wait(self.ring)
 
 # NES Emulator Kernel
 class NES:
-    def __init__(self, rom_path):
-        self.rom = ROM(rom_path)
+    CYCLES_PER_FRAME = 29780.5  # NTSC CPU cycles per frame
+    CYCLES_PER_LINE = PPU.DOTS_PER_LINE / 3
+
+    def __init__(self, rom_path, perf=False, use_mmap=True, audio_sync=False, audio_buffer_frames=2,
+                 headless=False, sample_rate=44100, ring=None):
+        # headless: no window or mixer; frames stay in ppu.frame and samples in
+        # the APU ring (which may be shared) for another process to present
+        self.rom = ROM(rom_path, use_mmap=use_mmap)
         self.cpu = CPU(self.rom)
-        self.ppu = PPU(self.cpu)
-        self.apu = APU()
-        self.palette = [(0, 0, 0), (255, 0, 0), (0, 255, 0), (255, 255, 255)]
+        self.ppu = PPU(self.cpu, display=not headless)
+        self.apu = APU(self.cpu, sample_rate, audio_buffer_frames, output=not headless, ring=ring)
+        self.audio_sync = audio_sync
+        self.cpu.bus.attach_ppu(self.ppu)
+        self.cpu.bus.attach_apu(self.apu)
+        self.cpu.irq_line = self.apu.irq_pending
+        self.frame_start = float(self.cpu.cycles)
+        # Opt-in counters; the instrumented CPU loop is swapped in only when set
+        self.perf = PerfCounters(opcode_name=lambda opcode: f"${opcode:02X}") if perf else None
+        self.run_segment = self.run_cpu_counted if perf else self.run_cpu_plain
+
+    def run_cpu(self, target):
+        # Runs the CPU to target in segments that end where the APU IRQ line
+        # can rise, so frame counter and DMC IRQs are taken on time
+        cpu = self.cpu
+        apu = self.apu
+        while cpu.cycles < target:
+            rise = apu.next_irq_cycle()
+            if rise is None or rise >= target:
+                self.run_segment(target)
+                return
+            self.run_segment(max(rise, cpu.cycles + 1))
+            if apu.irq_pending(cpu.cycles):
+                cpu.irq()
+
+    def run_cpu_plain(self, target):
+        cpu = self.cpu
+        if target > cpu.cycles:
+            cpu.run_until(target - cpu.cycles)
+
+    def run_cpu_counted(self, target):
+        cpu = self.cpu
+        step = cpu.step
+        read = cpu.read
+        counts = self.perf.opcode_counts
+        instructions = 0
+        while cpu.cycles < target:
+            counts[read(cpu.pc)] += 1
+            step()
+            instructions += 1
+        self.perf.instructions += instructions
+
+    def run_frame(self):
+        # One NTSC frame: visible lines, post-render line, vblank (NMI), pre-render line
+        start = self.frame_start
+        line = self.CYCLES_PER_LINE
+        ppu = self.ppu
+        ppu.begin_frame(start)
+        self.run_cpu(start + 240 * line)
+        ppu.finish_frame()
+        self.run_cpu(start + 241 * line)
+        ppu.enter_vblank()
+        self.run_cpu(start + 261 * line)
+        ppu.leave_vblank()
+        self.run_cpu(start + self.CYCLES_PER_FRAME)
+        self.apu.end_frame()
+        self.frame_start = start + self.CYCLES_PER_FRAME
 
     def run(self):
+        perf = self.perf
+        frame_budget = 1.0 / 60
+        last_title = time.perf_counter()
         running = True
         while running:
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
                     running = False
-            for _ in range(29780):  # ~60 FPS
-                self.cpu.step()
-            self.ppu.render_frame(self.rom.chr_rom, self.palette)
-            self.apu.play()
-            self.ppu.clock.tick(60)  # Control frame rate here
-        pygame.quit()  # Clean up Pygame on exit
+            self.cpu.bus.controllers[0].buttons = read_keyboard()
+            start = time.perf_counter()
+            self.run_frame()
+            if perf is not None:
+                emulated = time.perf_counter()
+                perf.add_frame(emulated - start)
+            self.ppu.present()
+            self.apu.pump()
+            if perf is not None:
+                now = time.perf_counter()
+                perf.add_present(now - emulated)
+                if now - start > frame_budget:
+                    perf.late_frames += 1
+                if now - last_title >= 1.0:
+                    last_title = now
+                    perf.sample()
+                    pygame.display.set_caption(f"NES Emulator - {perf.summary()}")
+            if not (self.audio_sync and self.apu.wait()):
+                self.ppu.clock.tick(60)  # Control frame rate here
+        if self.apu.output is not None and self.apu.output.channel is not None:
+            self.apu.output.channel.stop()
+        pygame.display.quit()  # closes the window; pygame and the mixer stay up for the next game
+
+    def run_shared(self, shared):
+        # Worker-process loop: render each frame straight into the back buffer
+        # of the shared block, then flip. Paced by the wall clock, or with audio
+        # sync by the presenter draining the shared ring.
+        perf = self.perf
+        control = shared.control
+        controller = self.cpu.bus.controllers[0]
+        ring = self.apu.ring
+        frame_time = 1.0 / 60
+        deadline = time.perf_counter()
+        back = 1
+        while control[SharedFrames.RUNNING]:
+            self.ppu.frame = shared.frames[back]
+            controller.buttons = int(control[SharedFrames.BUTTONS])
+            start = time.perf_counter()
+            self.run_frame()
+            if perf is not None:
+                perf.add_frame(time.perf_counter() - start)
+            control[SharedFrames.FRONT] = back
+            control[SharedFrames.SEQUENCE] += 1
+            back ^= 1
+            if self.audio_sync:
+                while ring.available() > self.apu.chunk_size and control[SharedFrames.RUNNING]:
+                    time.sleep(0.001)
+                continue
+            deadline += frame_time
+            now = time.perf_counter()
+            if now < deadline:
+                time.sleep(deadline - now)
+                continue
+            if perf is not None:
+                perf.late_frames += 1
+            if now - deadline > 4 * frame_time:
+                deadline = now  # too far behind to catch up; resync
+
+# Multi-process runtime. The launcher starts a presenter process, which opens
+# the window and mixer and then starts the emulation worker. The two share one
+# memory block: a control header, two frame buffers the PPU renders into in
+# turn, and the audio SampleRing. The worker flips FRONT and bumps SEQUENCE
+# after each frame; the presenter copies the front buffer and re-checks
+# SEQUENCE (a seqlock), retrying if a flip raced the copy. Neither side waits
+# on the other. The presenter also stores player 1's held buttons in BUTTONS,
+# which the worker latches at the start of each frame.
+class SharedFrames:
+    RUNNING, FRONT, SEQUENCE, BUTTONS = range(4)
+    HEADER_BYTES = 64
+    FRAME_SHAPE = (240, 256)
+
+    def __init__(self, ring_capacity, name=None):
+        load_numpy()
+        frames_bytes = 2 * self.FRAME_SHAPE[0] * self.FRAME_SHAPE[1]
+        size = self.HEADER_BYTES + frames_bytes + SampleRing.size(ring_capacity)
+        self.owner = name is None
+        self.memory = shared_memory.SharedMemory(name=name, create=self.owner, size=size)
+        self.name = self.memory.name
+        self.ring_capacity = ring_capacity
+        buffer = self.memory.buf
+        self.control = np.ndarray(self.HEADER_BYTES // 8, dtype=np.int64, buffer=buffer)
+        self.frames = np.ndarray((2,) + self.FRAME_SHAPE, dtype=np.uint8, buffer=buffer, offset=self.HEADER_BYTES)
+        self.ring = SampleRing(ring_capacity, buffer, self.HEADER_BYTES + frames_bytes)
+
+    def latest(self, out, last_sequence):
+        # Copies the newest frame into out if it is newer than last_sequence;
+        # returns the sequence of what is in out
+        control = self.control
+        while True:
+            sequence = int(control[self.SEQUENCE])
+            if sequence == last_sequence:
+                return sequence
+            out[...] = self.frames[control[self.FRONT]]
+            if control[self.SEQUENCE] == sequence:
+                return sequence
+
+    def close(self):
+        # The arrays export the buffer and must go before the mapping can close
+        self.control = self.frames = self.ring = None
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
+
+def watch_parent(shared):
+    # Stop the worker if the presenter dies without clearing RUNNING
+    multiprocessing.connection.wait([multiprocessing.parent_process().sentinel])
+    if shared.control is not None:
+        shared.control[SharedFrames.RUNNING] = 0
+
+def run_worker(rom_path, shared_name, ring_capacity, sample_rate, options, results):
+    shared = SharedFrames(ring_capacity, shared_name)
+    threading.Thread(target=watch_parent, args=(shared,), daemon=True).start()
+    try:
+        nes = NES(rom_path, perf=options['perf'], audio_sync=options['audio_sync'],
+                  audio_buffer_frames=options['audio_buffer_frames'],
+                  headless=True, sample_rate=sample_rate, ring=shared.ring)
+        nes.run_shared(shared)
+        if nes.perf is not None:
+            results.put(nes.perf.to_dict())
+    except Exception as e:
+        results.put(e)
+    finally:
+        shared.control[SharedFrames.RUNNING] = 0
+        nes = None  # drop the PPU/APU views into the block before closing it
+        shared.close()
+
+def serve_worker(connection, results):
+    # Spare worker process: import and build tables up front, then run the
+    # one game it is sent (or exit on None)
+    load_numpy()
+    job = connection.recv()
+    if job is not None:
+        run_worker(*job, results)
+
+# Window and mixer side of the multi-process runtime. pygame and the mixer
+# are set up once per Presenter, and a spare worker is spawned ahead of each
+# game, so in a long-lived host process Play only pays for opening a window.
+class Presenter:
+    def __init__(self, results, buffer_frames=2):
+        load_numpy()
+        # Let SIGTERM end the process (the launcher terminates it on exit)
+        # instead of SDL turning it into a QUIT event nobody reads between games
+        os.environ.setdefault('SDL_NO_SIGNAL_HANDLERS', '1')
+        load_pygame().init()
+        self.results = results
+        self.output = AudioOutput(buffer_frames=buffer_frames)
+        self.context = multiprocessing.get_context('spawn')
+        self.spare = None
+
+    def spawn_worker(self):
+        connection, child = self.context.Pipe()
+        worker = self.context.Process(target=serve_worker, args=(child, self.results), daemon=True)
+        worker.start()
+        self.spare = (worker, connection)
+
+    def play(self, rom_path, options):
+        if self.spare is None:
+            self.spawn_worker()
+        (worker, connection), self.spare = self.spare, None
+        pygame.display.init()
+        pygame.display.set_caption(f"NES Emulator - {Path(rom_path).name}")
+        screen = pygame.display.set_mode((256, 240))
+        framebuffer = pygame.Surface((256, 240), 0, 8)
+        framebuffer.set_palette(NES_PALETTE)
+        output = self.output
+        shared = SharedFrames(output.chunk_size * 4)
+        shared.control[SharedFrames.RUNNING] = 1
+        clock = pygame.time.Clock()
+        frame = np.zeros(SharedFrames.FRAME_SHAPE, dtype=np.uint8)
+        sequence = 0
+        mark = (time.perf_counter(), 0)
+        try:
+            connection.send((rom_path, shared.name, shared.ring_capacity, output.sample_rate, options))
+            while shared.control[SharedFrames.RUNNING] and worker.is_alive():
+                for event in pygame.event.get():
+                    if event.type == pygame.QUIT:
+                        shared.control[SharedFrames.RUNNING] = 0
+                shared.control[SharedFrames.BUTTONS] = read_keyboard()
+                newest = shared.latest(frame, sequence)
+                if newest != sequence:
+                    sequence = newest
+                    pygame.surfarray.blit_array(framebuffer, frame.T)
+                    screen.blit(framebuffer, (0, 0))
+                    pygame.display.flip()
+                output.pump(shared.ring)
+                if options['perf']:
+                    now = time.perf_counter()
+                    if now - mark[0] >= 1.0:
+                        fps = (sequence - mark[1]) / (now - mark[0])
+                        mark = (now, sequence)
+                        pygame.display.set_caption(f"NES Emulator - {fps:.0f} fps (worker process)")
+                clock.tick(240)  # poll well above the frame rate; each pass is cheap
+        finally:
+            shared.control[SharedFrames.RUNNING] = 0
+            worker.join()
+            connection.close()
+            shared.close()
+            if output.channel is not None:
+                output.channel.stop()
+            pygame.display.quit()  # closes the window; pygame and the mixer stay up
+
+    def close(self):
+        if self.spare is not None:
+            worker, connection = self.spare
+            connection.send(None)
+            worker.join()
+            self.spare = None
+        pygame.quit()
+
+GAME_OVER = 'game over'  # posted to the results queue after every game
+
+def run_presenter(rom_path, options, results):
+    # One-shot process entry point: play one game and exit
+    try:
+        presenter = Presenter(results, options['audio_buffer_frames'])
+        try:
+            presenter.play(rom_path, options)
+        finally:
+            presenter.close()
+    except Exception as e:
+        results.put(e)
+    results.put(GAME_OVER)
+
+def run_host(commands, results, buffer_frames=2):
+    # Pre-warmed process entry point: plays each (rom_path, options) from
+    # commands until it receives None, keeping a spare worker spawned
+    presenter = Presenter(results, buffer_frames)
+    presenter.spawn_worker()
+    try:
+        while True:
+            job = commands.get()
+            if job is None:
+                break
+            try:
+                presenter.play(*job)
+            except Exception as e:
+                results.put(e)
+            results.put(GAME_OVER)
+            presenter.spawn_worker()
+    finally:
+        presenter.close()
 
 # GUI Integration
 class NESticleGUI:
     def __init__(self, root):
         self.root = root
         self.root.title("NESticle - NES Emulator")
-        self.root.geometry("600x400")
+        self.root.geometry("600x495")
         self.root.resizable(False, False)
         self.root.configure(bg="#000080")
 
@@ -167,26 +2299,226 @@ class NESticleGUI:
         self.play_button = tk.Button(self.button_frame, text="Play", width=12, bg="#C0C0C0", fg="black", command=self.play_game)
         self.play_button.grid(row=0, column=1, padx=5)
 
-        self.exit_button = tk.Button(self.button_frame, text="Exit", width=12, bg="#C0C0C0", fg="black", command=root.quit)
-        self.exit_button.grid(row=0, column=2, padx=5)
+        self.scan_button = tk.Button(self.button_frame, text="Scan Folder", width=12, bg="#C0C0C0", fg="black", command=self.scan_folder)
+        self.scan_button.grid(row=0, column=2, padx=5)
+
+        self.exit_button = tk.Button(self.button_frame, text="Exit", width=12, bg="#C0C0C0", fg="black", command=self.quit)
+        self.exit_button.grid(row=0, column=3, padx=5)
+
+        self.stats_var = tk.BooleanVar(value=False)
+        self.stats_check = tk.Checkbutton(root, text="Show performance stats", variable=self.stats_var,
+                                          fg="white", bg="#000080", selectcolor="#000080", activebackground="#000080")
+        self.stats_check.pack()
+
+        self.audio_sync_var = tk.BooleanVar(value=False)
+        self.audio_sync_check = tk.Checkbutton(root, text="Sync to audio", variable=self.audio_sync_var,
+                                               fg="white", bg="#000080", selectcolor="#000080", activebackground="#000080")
+        self.audio_sync_check.pack()
+
+        self.process_var = tk.BooleanVar(value=False)
+        self.process_check = tk.Checkbutton(root, text="Run in separate process", variable=self.process_var,
+                                            fg="white", bg="#000080", selectcolor="#000080", activebackground="#000080")
+        self.process_check.pack()
+
+        self.warm_var = tk.BooleanVar(value=False)
+        self.warm_check = tk.Checkbutton(root, text="Keep emulator process warm", variable=self.warm_var,
+                                         command=self.toggle_warm,
+                                         fg="white", bg="#000080", selectcolor="#000080", activebackground="#000080")
+        self.warm_check.pack()
+
+        self.status_var = tk.StringVar(value="")
+        self.status_label = tk.Label(root, textvariable=self.status_var, fg="white", bg="#000080")
+        self.status_label.pack()
+
+        self.library = RomLibrary()
+        self.rom_paths = []
+        self.scan_thread = None
+        self.scan_result = None
+        self.game_process = None
+        self.game_results = None
+        self.host = None
+        self.host_commands = None
+        self.host_results = None
+        self.retired_hosts = []
+        self.refresh_library()
+        root.protocol("WM_DELETE_WINDOW", self.quit)
+
+    def quit(self):
+        # Game processes are not daemonic, so stop them before Tk exits
+        if self.game_process is not None and self.game_process.is_alive():
+            self.game_process.terminate()
+        if self.host is not None and self.host.is_alive() and self.game_process is not self.host:
+            self.stop_host()
+        self.root.quit()
+
+    def refresh_library(self, select=None):
+        entries = self.library.entries()
+        self.rom_paths = [entry['path'] for entry in entries]
+        labels = [self.entry_label(entry) for entry in entries]
+        self.rom_listbox.delete(0, tk.END)
+        if labels:
+            self.rom_listbox.insert(tk.END, *labels)
+        if select in self.rom_paths:
+            index = self.rom_paths.index(select)
+            self.rom_listbox.selection_set(index)
+            self.rom_listbox.see(index)
+        self.status_var.set(f"{len(entries)} ROMs in library")
+
+    @staticmethod
+    def entry_label(entry):
+        if entry['kind'] == 'ch8':
+            return f"{entry['name']}  [CHIP-8]"
+        if not entry['valid']:
+            return f"{entry['name']}  [invalid]"
+        return f"{entry['name']}  [mapper {entry['mapper']}, {entry['prg_banks']}x16K PRG]"
 
     def load_rom(self):
-        file_path = filedialog.askopenfilename(title="Select NES ROM", filetypes=[("NES Files", "*.nes")])
+        file_path = filedialog.askopenfilename(title="Select ROM", filetypes=[("NES Files", "*.nes"), ("CHIP-8 Files", "*.ch8")])
         if file_path:
-            self.rom_listbox.delete(0, tk.END)
-            self.rom_listbox.insert(tk.END, file_path)
+            self.refresh_library(select=self.library.add_file(file_path))
+
+    def scan_folder(self):
+        if self.scan_thread is not None:
+            return
+        directory = filedialog.askdirectory(title="Select ROM folder")
+        if not directory:
+            return
+        self.status_var.set(f"Scanning {directory}...")
+        self.scan_button.config(state="disabled")
+        # The worker never touches Tk; poll_scan picks up its result
+        self.scan_thread = threading.Thread(target=self.run_scan, args=(directory,), daemon=True)
+        self.scan_thread.start()
+        self.root.after(100, self.poll_scan)
+
+    def run_scan(self, directory):
+        try:
+            self.scan_result = self.library.scan([directory])
+        except Exception as e:
+            self.scan_result = e
+
+    def poll_scan(self):
+        if self.scan_thread.is_alive():
+            self.root.after(100, self.poll_scan)
+            return
+        self.scan_thread = None
+        self.scan_button.config(state="normal")
+        result, self.scan_result = self.scan_result, None
+        if isinstance(result, Exception):
+            messagebox.showerror("Scan Failed", str(result))
+            return
+        self.refresh_library()
+        changed, removed = result
+        self.status_var.set(f"{self.status_var.get()} ({changed} updated, {removed} removed)")
+
+    def play_chip8(self, rom_path):
+        import emu
+        window = tk.Toplevel(self.root)
+        emulator = emu.OptimizedChip8Emulator(window)
+        emulator.load_rom(rom_path)
+        emulator.reset()
+        emulator.status_label.config(text=f"Loaded: {Path(rom_path).name}")
+
+    def toggle_warm(self):
+        # The warm host imports pygame and NumPy, opens the mixer and spawns a
+        # spare worker now, so later games skip all of that on Play
+        if self.warm_var.get():
+            if self.host is None:
+                context = multiprocessing.get_context('spawn')
+                self.host_commands = context.Queue()
+                self.host_results = context.Queue()
+                # Not daemonic: daemonic processes may not start the workers
+                self.host = context.Process(target=run_host, args=(self.host_commands, self.host_results))
+                self.host.start()
+        elif self.host is not None and self.game_process is not self.host:
+            self.stop_host()
+
+    def stop_host(self):
+        self.host_commands.put(None)
+        # The queues stay referenced until the host exits, as a worker it is
+        # still starting has yet to attach to them
+        self.retired_hosts = [entry for entry in self.retired_hosts if entry[0].is_alive()]
+        self.retired_hosts.append((self.host, self.host_commands, self.host_results))
+        self.host = self.host_commands = self.host_results = None
+
+    def play_in_process(self, rom_path):
+        # The launcher stays live while the game runs; poll_game collects the
+        # outcome when the game ends
+        if self.game_process is not None:
+            return
+        options = {'perf': self.stats_var.get(), 'audio_sync': self.audio_sync_var.get(), 'audio_buffer_frames': 2}
+        if self.host is not None and not self.host.is_alive():
+            self.host = None
+            self.warm_var.set(False)
+        if self.host is not None:
+            self.game_process, self.game_results = self.host, self.host_results
+            self.host_commands.put((rom_path, options))
+        else:
+            context = multiprocessing.get_context('spawn')
+            self.game_results = context.Queue()
+            self.game_process = context.Process(target=run_presenter, args=(rom_path, options, self.game_results))
+            self.game_process.start()
+        self.play_button.config(state="disabled")
+        self.status_var.set(f"Running {Path(rom_path).name} in a separate process")
+        self.root.after(200, self.poll_game)
+
+    def poll_game(self):
+        finished = False
+        while not finished:
+            try:
+                result = self.game_results.get_nowait()
+            except queue.Empty:
+                break
+            if result == GAME_OVER:
+                finished = True
+            else:
+                self.report_result(result)
+        if not finished and self.game_process.is_alive():
+            self.root.after(200, self.poll_game)
+            return
+        if self.game_process is self.host:
+            if not self.host.is_alive():
+                self.host = None
+                self.warm_var.set(False)
+            elif not self.warm_var.get():
+                self.stop_host()
+        else:
+            self.game_process.join()
+        self.game_process = self.game_results = None
+        self.play_button.config(state="normal")
+        self.status_var.set(f"{len(self.rom_paths)} ROMs in library")
+
+    def report_result(self, result):
+        if isinstance(result, ValueError):
+            messagebox.showerror("Invalid ROM", str(result))
+        elif isinstance(result, Exception):
+            messagebox.showerror("Emulation Error", str(result))
+        else:
+            path = filedialog.asksaveasfilename(defaultextension=".json", title="Save stats as JSON")
+            if path:
+                with open(path, 'w') as f:
+                    json.dump(result, f, indent=2)
 
     def play_game(self):
         selected = self.rom_listbox.curselection()
         if selected:
-            rom_path = self.rom_listbox.get(selected)
+            rom_path = self.rom_paths[selected[0]]
             if not os.path.isfile(rom_path):
                 messagebox.showerror("File Not Found", f"The ROM file was not found:\n{rom_path}")
                 return
+            if rom_path.lower().endswith('.ch8'):
+                self.play_chip8(rom_path)
+                return
+            if self.process_var.get() or self.host is not None:
+                self.play_in_process(rom_path)
+                return
             self.root.withdraw()
             try:
-                nes = NES(rom_path)
+                nes = NES(rom_path, perf=self.stats_var.get(), audio_sync=self.audio_sync_var.get())
                 nes.run()
+                if nes.perf is not None:
+                    path = filedialog.asksaveasfilename(defaultextension=".json", title="Save stats as JSON")
+                    if path:
+                        nes.perf.dump_json(path)
             except ValueError as e:
                 messagebox.showerror("Invalid ROM", str(e))
             except Exception as e:
@@ -0,0 +1,160 @@
+import json
+import struct
+import time
+from collections import Counter
+
+# Fixed-bucket timing histogram; bounds are bucket upper edges in milliseconds
+# and the last bucket catches everything slower
+class Histogram:
+    def __init__(self, bounds_ms=(1, 2, 4, 8, 12, 16, 20, 33, 50, 100)):
+        self.bounds = [bound / 1000.0 for bound in bounds_ms]
+        self.bounds_ms = list(bounds_ms)
+        self.counts = [0] * (len(bounds_ms) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        bucket = 0
+        for bound in self.bounds:
+            if seconds <= bound:
+                break
+            bucket += 1
+        self.counts[bucket] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def to_dict(self):
+        return {
+            'bounds_ms': self.bounds_ms,
+            'counts': self.counts,
+            'count': self.count,
+            'mean_ms': round(self.mean() * 1000, 4),
+            'max_ms': round(self.max * 1000, 4),
+        }
+
+# Opt-in runtime counters shared by the CHIP-8 and NES front ends. Emulators
+# only touch this object from an instrumented code path that is swapped in
+# while counters are enabled, so the normal hot loops never check for it.
+class PerfCounters:
+    def __init__(self, opcode_name=str):
+        self.opcode_name = opcode_name
+        self.opcode_counts = Counter()
+        self.instructions = 0
+        self.idle_cycles = 0  # cycles skipped while the CPU was parked, not in instructions
+        self.frames = 0
+        self.dropped_frames = 0
+        self.late_frames = 0
+        self.frame_times = Histogram()
+        self.present_times = Histogram()
+        self.started = time.perf_counter()
+        self.mark = (self.started, 0, 0)
+        self.ips = 0.0
+        self.fps = 0.0
+
+    def add_frame(self, seconds):
+        self.frames += 1
+        self.frame_times.add(seconds)
+
+    def add_present(self, seconds):
+        self.present_times.add(seconds)
+
+    def sample(self):
+        # Update instructions/frames per second over the interval since the
+        # previous sample; returns (ips, fps)
+        now = time.perf_counter()
+        then, instructions, frames = self.mark
+        elapsed = now - then
+        if elapsed > 0:
+            self.ips = (self.instructions - instructions) / elapsed
+            self.fps = (self.frames - frames) / elapsed
+        self.mark = (now, self.instructions, self.frames)
+        return self.ips, self.fps
+
+    def summary(self):
+        return (f"{self.fps:.0f} fps | {self.ips / 1e6:.2f} MIPS | "
+                f"late {self.late_frames} | dropped {self.dropped_frames}")
+
+    def to_dict(self):
+        elapsed = time.perf_counter() - self.started
+        name = self.opcode_name
+        return {
+            'elapsed_s': round(elapsed, 3),
+            'instructions': self.instructions,
+            'idle_cycles': self.idle_cycles,
+            'frames': self.frames,
+            'instructions_per_second': round(self.instructions / elapsed if elapsed else 0.0, 1),
+            'recent_instructions_per_second': round(self.ips, 1),
+            'recent_frames_per_second': round(self.fps, 2),
+            'dropped_frames': self.dropped_frames,
+            'late_frames': self.late_frames,
+            'frame_times': self.frame_times.to_dict(),
+            'present_times': self.present_times.to_dict(),
+            'opcode_counts': {name(opcode): count for opcode, count in self.opcode_counts.most_common()},
+        }
+
+    def dump_json(self, path=None):
+        # Returns the JSON text, also writing it to path when given
+        text = json.dumps(self.to_dict(), indent=2)
+        if path is not None:
+            with open(path, 'w') as f:
+                f.write(text)
+        return text
+
+# Fixed-size binary execution trace shared by both CPUs. Records are packed
+# into one preallocated bytearray; the traced CPU loops keep the write offset
+# in a local and store it back when they return. Every record starts with a
+# position that grows with execution (a sequence number or cycle count; 0 means
+# the slot was never written), so a dump is just a header plus the raw buffer
+# and is valid even when taken mid-loop.
+class TraceRing:
+    MAGIC = b'EMUTRACE'
+    HEADER = struct.Struct('<8s8s32sII')  # magic, cpu, record format, record size, capacity
+
+    def __init__(self, cpu, record_format, capacity=1 << 16, fault_path=None):
+        self.cpu = cpu
+        self.record = struct.Struct(record_format)
+        self.capacity = capacity
+        self.buffer = bytearray(self.record.size * capacity)
+        self.offset = 0
+        self.sequence = 0
+        self.fault_path = fault_path
+
+    def clear(self):
+        self.buffer[:] = bytes(len(self.buffer))
+        self.offset = 0
+        self.sequence = 0
+
+    def dump(self, path):
+        record = self.record
+        with open(path, 'wb') as f:
+            f.write(self.HEADER.pack(self.MAGIC, self.cpu.encode(), record.format.encode(),
+                                     record.size, self.capacity))
+            f.write(self.buffer)
+
+    def fault(self):
+        # Unknown opcode: write the ring to fault_path, once, and return the path
+        path, self.fault_path = self.fault_path, None
+        if path is not None:
+            self.dump(path)
+        return path
+
+def read_trace(path):
+    # Returns (cpu, record Struct, records oldest first) for a TraceRing dump
+    with open(path, 'rb') as f:
+        data = f.read()
+    header = TraceRing.HEADER
+    magic, cpu, record_format, size, capacity = header.unpack_from(data)
+    if magic != TraceRing.MAGIC:
+        raise ValueError(f"{path} is not an execution trace")
+    record = struct.Struct(record_format.rstrip(b'\0').decode())
+    if record.size != size or len(data) != header.size + size * capacity:
+        raise ValueError(f"{path} is truncated or corrupt")
+    records = [entry for entry in record.iter_unpack(memoryview(data)[header.size:]) if entry[0]]
+    records.sort()
+    return cpu.rstrip(b'\0').decode(), record, records
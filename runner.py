@@ -0,0 +1,227 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+# Headless: pygame must see the dummy drivers before it is first imported
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+ROOT = Path(__file__).resolve().parent
+sys.path.insert(0, str(ROOT))
+
+import emu
+from bench import nesticle
+
+EXTENSIONS = ('.nes', '.ch8')
+
+def sha1(data):
+    return hashlib.sha1(data).hexdigest()
+
+def read_input_script(path):
+    # Lines of "<frame> <buttons>": from that frame on exactly these are held.
+    # Buttons are joined with '+' and '-' means none; CHIP-8 keys are hex
+    # digits, NES buttons are Controller.BUTTONS names. '#' starts a comment.
+    script = {}
+    with open(path) as f:
+        for number, line in enumerate(f, 1):
+            fields = line.split('#', 1)[0].split()
+            if not fields:
+                continue
+            if len(fields) != 2 or not fields[0].isdigit():
+                raise ValueError(f"{path}:{number}: expected '<frame> <buttons>'")
+            script[int(fields[0])] = [] if fields[1] == '-' else fields[1].lower().split('+')
+    return script
+
+# Per-system drivers with one interface: set_input, run_frame, framebuffer, state,
+# enable_trace
+class Chip8Runner:
+    def __init__(self, path, perf, seed=None):
+        self.core = emu.Chip8Core(seed=seed)
+        self.core.load_rom(Path(path).read_bytes())
+        self.core.reset()
+        if perf:
+            self.core.enable_perf()
+        self.perf = self.core.perf
+
+    def set_input(self, keys):
+        held = set()
+        for key in keys:
+            try:
+                held.add(int(key, 16))
+            except ValueError:
+                raise ValueError(f"unknown CHIP-8 key {key!r}") from None
+        for key in range(16):
+            self.core.set_key(key, key in held)
+
+    def run_frame(self):
+        core = self.core
+        core.run_cycles(core.cycles_per_frame)
+        core.tick_timers()
+
+    def framebuffer(self):
+        return self.core.framebuffer()
+
+    def enable_trace(self, fault_path):
+        return self.core.enable_trace(fault_path=fault_path)
+
+    def state(self):
+        core = self.core
+        return {
+            'pc': core.PC,
+            'i': core.I,
+            'v': list(core.V),
+            'stack': list(core.stack),
+            'delay_timer': core.delay_timer,
+            'sound_timer': core.sound_timer,
+            'state_sha1': sha1(core.save_state_bytes()),
+        }
+
+class NESRunner:
+    def __init__(self, path, perf):
+        self.nes = nesticle().NES(path, perf=perf, headless=True)
+        self.perf = self.nes.perf
+        self.audio = hashlib.sha1()
+
+    def set_input(self, keys):
+        buttons = nesticle().Controller.BUTTONS
+        mask = 0
+        for key in keys:
+            if key not in buttons:
+                raise ValueError(f"unknown NES button {key!r}")
+            mask |= 1 << buttons.index(key)
+        self.nes.cpu.bus.controllers[0].buttons = mask
+
+    def run_frame(self):
+        self.nes.run_frame()
+        ring = self.nes.apu.ring
+        self.audio.update(ring.read(ring.available()).tobytes())
+
+    def framebuffer(self):
+        return self.nes.ppu.frame.tobytes()
+
+    def enable_trace(self, fault_path):
+        return self.nes.cpu.enable_trace(fault_path=fault_path)
+
+    def state(self):
+        cpu = self.nes.cpu
+        return {
+            'pc': cpu.pc,
+            'a': cpu.acc,
+            'x': cpu.x,
+            'y': cpu.y,
+            'sp': cpu.sp,
+            'status': cpu.status,
+            'cycles': cpu.cycles,
+            'ram_sha1': sha1(cpu.ram),
+            'audio_sha1': self.audio.hexdigest(),
+        }
+
+def run_rom(path, frames, script, hash_every, perf, seed, trace_dir=None):
+    # Pool task: runs one ROM and returns a JSON-ready dict; never raises.
+    # With trace_dir the execution trace is dumped there when the run ends,
+    # including when it ends in an error.
+    system = 'chip8' if path.lower().endswith('.ch8') else 'nes'
+    result = {'rom': path, 'system': system}
+    trace = None
+    try:
+        start = time.perf_counter()
+        runner = Chip8Runner(path, perf, seed) if system == 'chip8' else NESRunner(path, perf)
+        if trace_dir:
+            trace_path = os.path.join(trace_dir, Path(path).name)
+            trace = runner.enable_trace(trace_path + '.fault.trace')
+        setup = time.perf_counter()
+        hashes = {}
+        for frame in range(1, frames + 1):
+            keys = script.get(frame - 1)
+            if keys is not None:
+                runner.set_input(keys)
+            frame_start = time.perf_counter()
+            runner.run_frame()
+            if runner.perf is not None:
+                runner.perf.add_frame(time.perf_counter() - frame_start)
+            if frame == frames or (hash_every and frame % hash_every == 0):
+                hashes[frame] = sha1(runner.framebuffer())
+        end = time.perf_counter()
+        # Still inside the try: a failing state() or perf dump is reported
+        # like any other error instead of escaping into the pool
+        summary = {
+            'frames': frames,
+            'setup_s': round(setup - start, 6),
+            'run_s': round(end - setup, 6),
+            'frames_per_second': round(frames / (end - setup), 2) if end > setup else None,
+            'frame_sha1': hashes,
+            'state': runner.state(),
+        }
+        if runner.perf is not None:
+            summary['perf'] = runner.perf.to_dict()
+        result.update(summary)
+    except Exception as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+    if trace is not None:
+        try:
+            trace.dump(trace_path + '.trace')
+            result['trace'] = trace_path + '.trace'
+        except OSError as e:
+            result.setdefault('error', f"{type(e).__name__}: {e}")
+    return result
+
+def find_roms(paths):
+    roms = []
+    for path in paths:
+        if os.path.isdir(path):
+            for directory, _, names in os.walk(path):
+                roms.extend(os.path.join(directory, name) for name in sorted(names)
+                            if name.lower().endswith(EXTENSIONS))
+        else:
+            roms.append(path)
+    return roms
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run CHIP-8 / NES ROMs headless and report JSON lines")
+    parser.add_argument('roms', nargs='+', help="ROM files, or directories searched for .nes/.ch8 files")
+    parser.add_argument('-n', '--frames', type=int, default=600, help="frames to run per ROM")
+    parser.add_argument('--input', metavar='SCRIPT', help="scripted input: lines of '<frame> <key+key|->'")
+    parser.add_argument('--hash-every', type=int, default=60, metavar='N',
+                        help="hash the framebuffer every N frames (0: last frame only)")
+    parser.add_argument('--perf', action='store_true', help="include perf counters in each result")
+    parser.add_argument('--seed', type=int, default=0, help="random seed for CHIP-8 RND")
+    parser.add_argument('--trace', metavar='DIR',
+                        help="record execution traces and dump one per ROM into DIR (read with tracedump.py)")
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1, help="worker processes")
+    parser.add_argument('-o', '--output', metavar='PATH', help="write JSON lines here instead of stdout")
+    args = parser.parse_args(argv)
+
+    script = read_input_script(args.input) if args.input else {}
+    roms = find_roms(args.roms)
+    if args.trace:
+        os.makedirs(args.trace, exist_ok=True)
+    out = open(args.output, 'w') if args.output else sys.stdout
+    failed = 0
+    try:
+        # Results are written as each ROM finishes, not in argument order
+        with ProcessPoolExecutor(max_workers=max(1, min(args.jobs, len(roms)))) as pool:
+            futures = {pool.submit(run_rom, rom, args.frames, script, args.hash_every, args.perf, args.seed,
+                                   args.trace): rom
+                       for rom in roms}
+            for future in as_completed(futures):
+                try:
+                    result = future.result()
+                except Exception as e:  # the worker process itself died
+                    result = {'rom': futures[future], 'error': f"{type(e).__name__}: {e}"}
+                failed += 'error' in result
+                out.write(json.dumps(result) + '\n')
+                out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f"{len(roms)} ROMs, {failed} failed", file=sys.stderr)
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
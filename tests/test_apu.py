@@ -0,0 +1,90 @@
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bench import load_nesticle, nes_nrom_image
+
+try:
+    import numpy as np
+except ImportError:
+    np = None  # The APU synthesizes with NumPy
+try:
+    import pygame
+except ImportError:
+    pygame = None
+
+nes = load_nesticle()
+
+# Writes FRAME_MODE_OFFSET's byte to $4017, starts a 257-byte DMC sample with
+# IRQ at the fastest rate and idles with I clear. The IRQ handler reads $4015,
+# counting frame IRQs in $10 and DMC IRQs in $11, and restarts the sample
+# after each DMC IRQ.
+IRQ_PROGRAM = bytes.fromhex(
+    '78 A2FF 9A'              # 8000: SEI / LDX #$FF / TXS
+    'A900 8D1740'             # 8004: LDA #$00 / STA $4017
+    'A98F 8D1040'             # 8009: LDA #$8F / STA $4010
+    'A900 8D1240'             # 800E: LDA #$00 / STA $4012
+    'A910 8D1340 8D1540'      # 8013: LDA #$10 / STA $4013 / STA $4015
+    '58 4C1C80'               # 801B: CLI / JMP $801C
+    '00'                      # 801F: padding
+    '48 AD1540 0A'            # 8020: PHA / LDA $4015 / ASL A
+    '1002 E610'               # 8025: BPL +2 / INC $10
+    '9007 E611 A910 8D1540'   # 8029: BCC +7 / INC $11 / LDA #$10 / STA $4015
+    '68 40')                  # 8032: PLA / RTI
+FRAME_MODE_OFFSET = 5
+IRQ_HANDLER = 0x8020
+
+def run_irq_program(frame_mode, frames):
+    # Returns (frame IRQs, DMC IRQs) taken in the given number of frames
+    program = bytearray(IRQ_PROGRAM)
+    program[FRAME_MODE_OFFSET] = frame_mode
+    image = bytearray(nes_nrom_image(program))
+    image[16 + 0x3FFE:16 + 0x4000] = IRQ_HANDLER.to_bytes(2, 'little')
+    fd, path = tempfile.mkstemp(suffix='.nes')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(image)
+    try:
+        machine = nes.NES(path, use_mmap=False, headless=True)
+        for _ in range(frames):
+            machine.run_frame()
+    finally:
+        os.unlink(path)
+    return machine.cpu.ram[0x10], machine.cpu.ram[0x11]
+
+@unittest.skipIf(np is None, "NumPy not installed")
+class IrqTest(unittest.TestCase):
+    def test_frame_counter_and_dmc_irqs(self):
+        frame_irqs, dmc_irqs = run_irq_program(0x00, 60)
+        # One frame IRQ per 29830-cycle sequence; one DMC IRQ per
+        # 257 bytes * 8 bits * 54 cycles
+        self.assertAlmostEqual(frame_irqs, 60 * nes.NES.CYCLES_PER_FRAME / 29830, delta=1)
+        self.assertAlmostEqual(dmc_irqs, 60 * nes.NES.CYCLES_PER_FRAME / (257 * 8 * 54), delta=1)
+
+    def test_inhibited_and_five_step_modes_raise_no_frame_irq(self):
+        for frame_mode in (0x40, 0x80):
+            with self.subTest(frame_mode=f"${frame_mode:02X}"):
+                frame_irqs, dmc_irqs = run_irq_program(frame_mode, 60)
+                self.assertEqual(frame_irqs, 0)
+                self.assertGreater(dmc_irqs, 0)
+
+@unittest.skipIf(np is None or pygame is None, "NumPy or pygame not installed")
+class AudioOutputTest(unittest.TestCase):
+    def test_open_mixer_is_reused(self):
+        nes.load_pygame().init()
+        self.addCleanup(pygame.quit)
+        with mock.patch.object(pygame.mixer, 'quit', wraps=pygame.mixer.quit) as quit:
+            for _ in range(3):
+                output = nes.AudioOutput()
+                self.assertIsNotNone(output.channel)
+            self.assertEqual(quit.call_count, 0)
+            nes.AudioOutput(22050)
+            nes.AudioOutput(22050)
+            self.assertEqual(quit.call_count, 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,258 @@
+import random
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import emu
+
+def words(*opcodes):
+    return b''.join(opcode.to_bytes(2, 'big') for opcode in opcodes)
+
+# Counts, draws the BCD digits of the total and calls a subroutine; the
+# digits and font reads go through the 0x300 data page
+COUNTER_ROM = words(
+    0x6A00, 0x6B00, 0x7A03, 0x8BA4, 0xA300, 0xFB33, 0xF265, 0x00E0,
+    0xF029, 0x6305, 0xD345, 0xF129, 0x630A, 0xD345, 0x8E17, 0x2224,
+    0x1204, 0x0000, 0x8CB3, 0x8CCE, 0x00EE,
+)
+
+# Rewrites the instruction at 0x20C (ADD V5, kk) with a new kk every pass,
+# so its translated block must be dropped each time
+SELF_MODIFYING_ROM = words(
+    0x6075, 0x6101, 0xA20C, 0xF155, 0x7101, 0x6200, 0x0000, 0x8654,
+    0x1204,
+)
+
+def random_program(rng, rnd=True):
+    # Straight-line mix of ALU, skips, I, timer, BCD/store/load, DRW and
+    # subroutine opcodes at 0x200, looping back with JP 200. Memory writes
+    # stay in the 0x300-0x4FF data area and keys and key waits are left out.
+    def opcode():
+        x, y, kk, n = rng.randrange(16), rng.randrange(16), rng.randrange(256), rng.randrange(16)
+        choices = [
+            0x6000 | x << 8 | kk, 0x7000 | x << 8 | kk, 0x3000 | x << 8 | kk, 0x4000 | x << 8 | kk,
+            0x5000 | x << 8 | y << 4, 0x9000 | x << 8 | y << 4,
+            0x8000 | x << 8 | y << 4 | rng.choice([0, 1, 2, 3, 4, 5, 6, 7, 0xE]),
+            0xA000 | rng.randrange(0x300, 0x3F0), 0xD000 | x << 8 | y << 4 | n, 0x22F4,
+            0xF000 | x << 8 | rng.choice([0x07, 0x15, 0x18, 0x1E, 0x29, 0x33, 0x55, 0x65]),
+        ]
+        if rnd:
+            choices.append(0xC000 | x << 8 | kk)
+        return rng.choice(choices)
+
+    body = [opcode() for _ in range(120)]
+    return words(*body, 0x1200, 0x1200, 0x7301, 0x00EE)
+
+def run_core(rom, frames, block_cache, seed=0):
+    core = emu.Chip8Core(seed=seed)
+    core.use_block_cache = block_cache
+    core.load_rom(rom)
+    core.run_frames(frames)
+    return core
+
+class BlockCacheTest(unittest.TestCase):
+    def assert_same_as_dispatch(self, rom, frames):
+        blocks = run_core(rom, frames, True)
+        self.assertTrue(blocks.blocks, "nothing was translated")
+        self.assertEqual(blocks.snapshot(), run_core(rom, frames, False).snapshot())
+
+    def test_counter(self):
+        self.assert_same_as_dispatch(COUNTER_ROM, 60)
+
+    def test_self_modifying_code(self):
+        core = emu.Chip8Core()
+        core.load_rom(SELF_MODIFYING_ROM)
+        core.run_cycles(2 + 7 * 20)  # setup, then 20 passes of 7 instructions
+        # Each pass adds the kk it just wrote: 1 + 2 + ... + 20
+        self.assertEqual((core.PC, core.V[1], core.V[5]), (0x204, 21, 210))
+        self.assert_same_as_dispatch(SELF_MODIFYING_ROM, 30)
+
+    def test_random_programs(self):
+        for seed in range(8):
+            with self.subTest(seed=seed):
+                self.assert_same_as_dispatch(random_program(random.Random(seed)), 40)
+
+class PackedDisplayTest(unittest.TestCase):
+    def test_drw_matches_byte_display(self):
+        # Random sprites at random positions, biased towards the right and
+        # bottom edges where the sprite is clipped, drawn over each other so
+        # XOR and collisions both happen; CLS in between now and then
+        rng = random.Random(6)
+        cores = [emu.Chip8Core(packed_display=packed) for packed in (False, True)]
+        sprites = rng.randbytes(0x100)
+        collisions = 0
+        for core in cores:
+            core.memory[0x300:0x400] = sprites
+        for step in range(400):
+            x = rng.choice([rng.randrange(256), rng.randrange(56, 64), 63])
+            y = rng.choice([rng.randrange(256), rng.randrange(24, 32), 31])
+            opcode = 0x00E0 if step % 97 == 96 else 0xD010 | rng.randrange(16)
+            address = 0x300 + rng.randrange(0xF0)
+            for core in cores:
+                core.V[0], core.V[1], core.V[0xF] = x, y, 0xAA
+                core.I = address
+                core.memory[0x200:0x202] = opcode.to_bytes(2, 'big')
+                core.PC = 0x200
+                core.process_opcode()
+            byte, packed = cores
+            with self.subTest(step=step, x=x, y=y, opcode=f"{opcode:04X}"):
+                self.assertEqual(packed.V[0xF], byte.V[0xF])
+                self.assertEqual(packed.framebuffer(), byte.framebuffer())
+            collisions += byte.V[0xF] == 1
+        self.assertGreater(collisions, 0)
+
+def counter_states(frames):
+    # One save state per frame of COUNTER_ROM
+    core = emu.Chip8Core()
+    core.load_rom(COUNTER_ROM)
+    states = []
+    for _ in range(frames):
+        core.run_frames(1)
+        states.append(bytes(core.save_state_bytes()))
+    return states
+
+class SaveStateTest(unittest.TestCase):
+    def test_round_trip(self):
+        core = run_core(COUNTER_ROM, 45, True)
+        state = core.save_state_bytes()
+        self.assertEqual(len(state), emu.STATE_SIZE)
+        copy = emu.Chip8Core(packed_display=True)
+        copy.load_state_bytes(state)
+        self.assertEqual(copy.save_state_bytes(), state)
+        self.assertEqual((copy.PC, copy.I, copy.stack, bytes(copy.V), copy.framebuffer()),
+                         (core.PC, core.I, core.stack, bytes(core.V), core.framebuffer()))
+
+    def test_rejects_corrupt_and_foreign_states(self):
+        state = run_core(COUNTER_ROM, 10, True).save_state_bytes()
+        corrupt = bytearray(state)
+        corrupt[emu._STATE_MEMORY_OFFSET + 0x300] ^= 1
+        version = bytearray(state)
+        version[4:6] = (emu.STATE_VERSION + 1).to_bytes(2, 'little')  # CRC only covers the payload
+        for name, bad in (('crc', corrupt), ('version', version), ('magic', b'XXXX' + state[4:]),
+                          ('size', state[:-1])):
+            with self.subTest(name):
+                with self.assertRaises(ValueError):
+                    emu.Chip8Core().load_state_bytes(bad)
+
+    def test_deep_recursion_keeps_sixteen_levels(self):
+        core = run_core(words(0x2200), 3, True)  # CALL 200 calling itself
+        self.assertEqual(core.stack, [0x200] * emu.STATE_STACK_DEPTH)
+        core.load_state_bytes(core.save_state_bytes())
+        self.assertEqual(len(core.stack), emu.STATE_STACK_DEPTH)
+
+    def test_load_keeps_live_keypad(self):
+        core = emu.Chip8Core()
+        core.set_key(5, True)
+        state = core.save_state_bytes()
+        core.set_key(5, False)
+        core.set_key(9, True)
+        core.load_state_bytes(state)
+        self.assertEqual([key for key in range(16) if core.keypad[key]], [9])
+
+class RewindTest(unittest.TestCase):
+    def test_pop_returns_newest_first(self):
+        states = counter_states(130)
+        rewind = emu.RewindBuffer(keyframe_interval=50)
+        for state in states:
+            rewind.push(state)
+        self.assertEqual(len(rewind), len(states))
+        self.assertEqual([rewind.pop() for _ in states], states[::-1])
+        self.assertIsNone(rewind.pop())
+        self.assertEqual(rewind.size, 0)
+
+    def test_push_after_pop(self):
+        states = counter_states(20)
+        rewind = emu.RewindBuffer(keyframe_interval=8)
+        for state in states[:12]:
+            rewind.push(state)
+        for _ in range(5):
+            rewind.pop()
+        for state in states[12:]:
+            rewind.push(state)
+        self.assertEqual([rewind.pop() for _ in range(15)], (states[:7] + states[12:])[::-1])
+
+    def test_budget_drops_oldest_groups(self):
+        states = counter_states(200)
+        rewind = emu.RewindBuffer(budget=4096, keyframe_interval=16)
+        for state in states:
+            rewind.push(state)
+            self.assertLessEqual(rewind.size, 4096)
+        kept = len(rewind)
+        self.assertLess(kept, len(states))
+        self.assertIsNone(rewind.entries[0][1], "history must start at a keyframe")
+        self.assertEqual([rewind.pop() for _ in range(kept)], states[-kept:][::-1])
+        self.assertIsNone(rewind.pop())
+
+class RunAheadTest(unittest.TestCase):
+    def test_leaves_counters_and_trace_untouched(self):
+        core = run_core(COUNTER_ROM, 5, True)
+        perf = core.enable_perf()
+        core.run_frames(3)
+        counts = (perf.instructions, perf.frames, dict(perf.opcode_counts))
+        state = core.snapshot()
+        core.run_ahead(4)
+        self.assertEqual((perf.instructions, perf.frames, dict(perf.opcode_counts)), counts)
+        self.assertIs(core.perf, perf)
+        self.assertEqual(core.snapshot(), state)
+        trace = core.enable_trace()
+        sequence = trace.sequence
+        core.run_ahead(4)
+        self.assertEqual(trace.sequence, sequence)
+        self.assertIs(core.trace, trace)
+
+class IdleTest(unittest.TestCase):
+    def test_skipped_cycles_are_counted_and_traced(self):
+        for rom in (words(0x1200), words(0xF00A)):  # JP 200 to itself / LD V0, K
+            with self.subTest(f"{rom.hex()}"):
+                core = emu.Chip8Core()
+                core.load_rom(rom)
+                perf = core.enable_perf()
+                trace = core.enable_trace()
+                core.run_frames(3)
+                self.assertEqual(perf.instructions, 0)
+                self.assertEqual(perf.idle_cycles, 3 * core.cycles_per_frame)
+                self.assertEqual(perf.to_dict()['idle_cycles'], perf.idle_cycles)
+                self.assertEqual(trace.sequence, 3 * core.cycles_per_frame)
+                records = [record for record in trace.record.iter_unpack(trace.buffer) if record[0]]
+                self.assertEqual([record[:3] for record in records],
+                                 [(1 + frame * core.cycles_per_frame, 0x200, int.from_bytes(rom, 'big'))
+                                  for frame in range(3)])
+
+@unittest.skipIf(emu.np is None, "NumPy not installed")
+class BatchTest(unittest.TestCase):
+    def test_matches_scalar_cores(self):
+        # One seeded program per instance; Cxkk is left out because the two
+        # engines draw from different generators
+        programs = [random_program(random.Random(100 + seed), rnd=False) for seed in range(12)]
+        batch = emu.Chip8Batch(len(programs))
+        cores = [run_core(program, 0, False) for program in programs]
+        for index, program in enumerate(programs):
+            batch.memory[index, 0x200:0x200 + len(program)] = list(program)
+        for frame in range(0, 40, 2):
+            batch.run_frames(2)
+            for index, core in enumerate(cores):
+                core.run_frames(2)
+                with self.subTest(frame=frame, instance=index):
+                    self.assertEqual(bytes(batch.V[index]), bytes(core.V))
+                    self.assertEqual((batch.I[index], batch.PC[index]), (core.I, core.PC))
+                    self.assertEqual(batch.stack[index, :batch.sp[index]].tolist(), core.stack)
+                    self.assertEqual((batch.delay_timer[index], batch.sound_timer[index]),
+                                     (core.delay_timer, core.sound_timer))
+                    self.assertEqual(batch.framebuffer(index), core.framebuffer())
+                    self.assertEqual(batch.memory[index].tobytes(), bytes(core.memory))
+
+    def test_deep_recursion_matches_scalar_core(self):
+        # A ring of CALLs that never returns, so the stack overflows and keeps
+        # dropping its oldest entries
+        rom = words(0x2202, 0x2204, 0x2206, 0x2208, 0x220A, 0x2200)
+        batch = emu.Chip8Batch(1)
+        batch.load_rom(rom)
+        batch.run_frames(3)
+        core = run_core(rom, 3, False)
+        self.assertEqual(batch.stack[0, :batch.sp[0]].tolist(), core.stack)
+        self.assertEqual(batch.PC[0], core.PC)
+
+if __name__ == '__main__':
+    unittest.main()
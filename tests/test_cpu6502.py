@@ -0,0 +1,129 @@
+import os
+import random
+import sys
+import unittest
+import zlib
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bench import load_nesticle, nestest_line, read_nestest_log
+
+nes = load_nesticle()
+
+# Random machine states per opcode. The expected digests come from an
+# independent 6502 implementation (py65 1.2, whose DEC abs cycle count of 3 was
+# corrected to 6) run on the same states; decimal mode is kept off, as the NES
+# CPU has none.
+CASES_PER_OPCODE = 16
+
+class FlatCPU(nes.CPU):
+    # The 6502 core on a flat 64KB RAM instead of a cartridge bus
+    def __init__(self, memory):
+        self.memory = memory
+        self.ram = memory
+        self.cycles = 0
+        self.trace = None
+        self.irq_line = None
+
+    def read(self, addr):
+        return self.memory[addr]
+
+    def write(self, addr, value):
+        self.memory[addr] = value
+
+def make_case(opcode, index):
+    # Returns (memory, pc, a, x, y, sp, p) with opcode at pc
+    rng = random.Random(opcode << 8 | index)
+    memory = bytearray(rng.randbytes(0x10000))
+    pc = rng.randrange(0x0200, 0xFF00)
+    memory[pc] = opcode
+    a, x, y, sp = (rng.randrange(256) for _ in range(4))
+    p = (rng.randrange(256) | 0x30) & ~0x08
+    return memory, pc, a, x, y, sp, p
+
+def run_case(opcode, index):
+    # (pc, a, x, y, sp, p without B/U, cycles, crc32 of memory) after one step
+    memory, pc, a, x, y, sp, p = make_case(opcode, index)
+    cpu = FlatCPU(memory)
+    cpu.pc, cpu.acc, cpu.x, cpu.y, cpu.sp, cpu.status = pc, a, x, y, sp, p
+    cycles = cpu.step()
+    return (cpu.pc, cpu.acc, cpu.x, cpu.y, cpu.sp, cpu.status & 0xCF, cycles, zlib.crc32(memory))
+
+def opcode_digest(opcode):
+    return zlib.crc32(repr([run_case(opcode, index) for index in range(CASES_PER_OPCODE)]).encode())
+
+EXPECTED_DIGESTS = {
+    0x00: 0x3D408094, 0x01: 0xDFD3109C, 0x05: 0x18489292, 0x06: 0x16CD676E,
+    0x08: 0x9EBA150B, 0x09: 0xF95D0A06, 0x0A: 0xC7D1C235, 0x0D: 0x3F927F04,
+    0x0E: 0x87B24FA5, 0x10: 0x0D871E17, 0x11: 0xDC57B243, 0x15: 0x80277C24,
+    0x16: 0x53400DA4, 0x18: 0x5DFF5428, 0x19: 0xD39977D8, 0x1D: 0xCA7C30C3,
+    0x1E: 0xB7EEC6D6, 0x20: 0xF2FB9B92, 0x21: 0xBF7A9CEA, 0x24: 0x6B823E78,
+    0x25: 0xA912D3FD, 0x26: 0xA20C9B77, 0x28: 0xF09623DA, 0x29: 0x6222F321,
+    0x2A: 0xB1E3371C, 0x2C: 0x69CA87CB, 0x2D: 0xF2E9AB66, 0x2E: 0xCB1E3B11,
+    0x30: 0x8BEF37C0, 0x31: 0x18AD0241, 0x35: 0xE88939F2, 0x36: 0x7DE5EF72,
+    0x38: 0x8A1D157A, 0x39: 0x90E75227, 0x3D: 0x5A1108F3, 0x3E: 0x530FB220,
+    0x40: 0xAA41456D, 0x41: 0x728FDC48, 0x45: 0xD22B7438, 0x46: 0x7E8E2A68,
+    0x48: 0x169A407E, 0x49: 0xE97C640E, 0x4A: 0x6B5D11F1, 0x4C: 0xC033D9D9,
+    0x4D: 0x8185272D, 0x4E: 0xD151BAD8, 0x50: 0x7D21FA8A, 0x51: 0x6457EED8,
+    0x55: 0x9E317E7B, 0x56: 0x20186498, 0x58: 0x48E3CA31, 0x59: 0x383B45FC,
+    0x5D: 0x37E4B7FF, 0x5E: 0x58A9F716, 0x60: 0xBADF8EFE, 0x61: 0xED8C5F47,
+    0x65: 0x8A9192A1, 0x66: 0xDA2BCE01, 0x68: 0x9563D87D, 0x69: 0xFC8B7582,
+    0x6A: 0xA083E2DE, 0x6C: 0x527B3D86, 0x6D: 0xF0EADB12, 0x6E: 0x4F522D3C,
+    0x70: 0x89ABCFE5, 0x71: 0xB0DFCB3A, 0x75: 0x3D2968F7, 0x76: 0x26499E87,
+    0x78: 0xCAFBBD06, 0x79: 0xD0FE06CD, 0x7D: 0x8B07718B, 0x7E: 0xA9C159DA,
+    0x81: 0x075B90D3, 0x84: 0x73A8A770, 0x85: 0xDB2F1692, 0x86: 0x9E6EA180,
+    0x88: 0x877FEB19, 0x8A: 0xE98DB0EE, 0x8C: 0x1A5FB007, 0x8D: 0x50FC6F18,
+    0x8E: 0xF4E1B75B, 0x90: 0xC67C6652, 0x91: 0x5D578DAE, 0x94: 0x0CE2EDFB,
+    0x95: 0xA60EDC23, 0x96: 0xA95946A7, 0x98: 0x4000793A, 0x99: 0x7C7282CC,
+    0x9A: 0xA4322409, 0x9D: 0x45BE9888, 0xA0: 0xBDF233E3, 0xA1: 0x9BB58672,
+    0xA2: 0xBE6050EA, 0xA4: 0xCA5992A9, 0xA5: 0x5B10A3FC, 0xA6: 0x6192A6F3,
+    0xA8: 0x4640C299, 0xA9: 0x7DAE695F, 0xAA: 0xC3C71982, 0xAC: 0xF2B753DE,
+    0xAD: 0x090D96D5, 0xAE: 0xC368DE37, 0xB0: 0x911B4DC9, 0xB1: 0xD1CFF3F6,
+    0xB4: 0x06B01BCE, 0xB5: 0xFAD334F2, 0xB6: 0x57041F0F, 0xB8: 0x11A91D22,
+    0xB9: 0x07C55344, 0xBA: 0x3E2FEEE5, 0xBC: 0x516F245A, 0xBD: 0x3E444F6B,
+    0xBE: 0xBE4D897E, 0xC0: 0x8ED3E8B7, 0xC1: 0x8A64EB54, 0xC4: 0x5D7298FE,
+    0xC5: 0x77054376, 0xC6: 0x2AD9D227, 0xC8: 0x7E0638C6, 0xC9: 0x9FF90631,
+    0xCA: 0x284C940F, 0xCC: 0x0688DDAB, 0xCD: 0x013B0935, 0xCE: 0x594E2FB7,
+    0xD0: 0x83F7F168, 0xD1: 0xF465CAAB, 0xD5: 0x303F4E81, 0xD6: 0xF46ACB68,
+    0xD8: 0xE2B04A56, 0xD9: 0x319A9000, 0xDD: 0x371FAC65, 0xDE: 0x778967AE,
+    0xE0: 0xCE9A5227, 0xE1: 0xF418BF8A, 0xE4: 0x8D1BD6C6, 0xE5: 0x663970C1,
+    0xE6: 0xD6FA4E7C, 0xE8: 0xDB46758D, 0xE9: 0x2AE35CA9, 0xEA: 0x6A18BF7B,
+    0xEC: 0xAD7B9F87, 0xED: 0x45D3278E, 0xEE: 0xE37A61C2, 0xF0: 0xD6F14A12,
+    0xF1: 0x472D0E1E, 0xF5: 0xD861BD5F, 0xF6: 0x79ABCF67, 0xF8: 0xAFDF8053,
+    0xF9: 0xD919AF94, 0xFD: 0xB174F14F, 0xFE: 0xBE08CF72,
+}
+
+class OpcodeTest(unittest.TestCase):
+    def test_official_opcodes(self):
+        official = [opcode for opcode in range(256) if nes.OPCODE_TABLE[opcode][0] is not nes._op_unknown]
+        self.assertEqual(sorted(EXPECTED_DIGESTS), official)
+        for opcode in official:
+            with self.subTest(opcode=f"${opcode:02X}"):
+                self.assertEqual(opcode_digest(opcode), EXPECTED_DIGESTS[opcode])
+
+    def test_unofficial_opcodes_are_one_byte_nops(self):
+        for opcode in range(256):
+            if nes.OPCODE_TABLE[opcode][0] is nes._op_unknown:
+                memory, pc, a, x, y, sp, p = make_case(opcode, 0)
+                before = bytes(memory)
+                cpu = FlatCPU(memory)
+                cpu.pc, cpu.acc, cpu.x, cpu.y, cpu.sp, cpu.status = pc, a, x, y, sp, p
+                self.assertEqual(cpu.step(), 2)
+                self.assertEqual((cpu.pc, cpu.acc, cpu.x, cpu.y, cpu.sp, cpu.status), (pc + 1, a, x, y, sp, p))
+                self.assertEqual(bytes(memory), before)
+
+@unittest.skipUnless(os.environ.get('NESTEST_ROM') and os.environ.get('NESTEST_LOG'),
+                     "set NESTEST_ROM and NESTEST_LOG to nestest.nes and nestest.log")
+class NestestTest(unittest.TestCase):
+    def test_matches_reference_log(self):
+        # Automation mode (PC=$C000) up to the first unofficial opcode
+        expected = read_nestest_log(os.environ['NESTEST_LOG'])
+        cpu = nes.CPU(nes.ROM(os.environ['NESTEST_ROM']))
+        cpu.pc = 0xC000
+        for number, line in enumerate(expected, 1):
+            self.assertEqual(nestest_line(cpu), line, f"nestest line {number}")
+            cpu.step()
+
+if __name__ == '__main__':
+    unittest.main()
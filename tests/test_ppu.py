@@ -0,0 +1,139 @@
+import os
+import random
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bench import NES_LOOP_PROGRAM, load_nesticle, nes_nrom_image
+
+try:
+    import numpy as np
+except ImportError:
+    np = None  # The PPU renders into NumPy arrays
+
+nes = load_nesticle()
+
+def chr_pixel(ppu, addr, row, col):
+    low = ppu.read_vram(addr + row)
+    high = ppu.read_vram(addr + row + 8)
+    return ((low >> (7 - col)) & 1) | (((high >> (7 - col)) & 1) << 1)
+
+def reference_frame(ppu, scroll_y):
+    # Straightforward per-pixel renderer for a frame with one fixed scroll;
+    # returns (240 rows of palette indices, sprite 0 hit, sprite overflow)
+    ctrl, mask = ppu.ctrl, ppu.mask
+    layout = nes._NAMETABLE_LAYOUT[ppu.mapper.mirroring]
+    scroll_x = ppu.scroll_x()
+    palette = list(ppu.palette_ram)
+    height = 16 if ctrl & 0x20 else 8
+    rows = [[0] * 256 for _ in range(240)]
+    hit = overflow = False
+    for y in range(240):
+        py = (scroll_y + y) % 480
+        sprites = [i for i in range(64) if ppu.oam[i * 4] + 1 <= y < ppu.oam[i * 4] + 1 + height]
+        if len(sprites) > 8 and mask & 0x18:
+            overflow = True
+        sprites = sprites[:8]
+        for x in range(256):
+            background = 0
+            if mask & 0x08 and (x >= 8 or mask & 0x02):
+                px = (scroll_x + x) % 512
+                base = layout[(py >= 240) * 2 + (px >= 256)] * 0x400
+                tile_y, tile_x = (py % 240) // 8, (px % 256) // 8
+                name = ppu.vram[base + tile_y * 32 + tile_x]
+                attribute = ppu.vram[base + 0x3C0 + (tile_y // 4) * 8 + tile_x // 4]
+                group = (attribute >> (((tile_y & 2) << 1) | (tile_x & 2))) & 3
+                color = chr_pixel(ppu, ((ctrl >> 4) & 1) * 0x1000 + name * 16, py % 8, px % 8)
+                background = color | (group << 2) if color else 0
+            sprite = None
+            if mask & 0x10 and (x >= 8 or mask & 0x04):
+                for i in sprites:
+                    sprite_y, tile, attributes, sprite_x = ppu.oam[i * 4:i * 4 + 4]
+                    if not sprite_x <= x < sprite_x + 8:
+                        continue
+                    row, col = y - sprite_y - 1, x - sprite_x
+                    if attributes & 0x80:
+                        row = height - 1 - row
+                    if attributes & 0x40:
+                        col = 7 - col
+                    if height == 16:
+                        addr = (tile & 1) * 0x1000 + (tile & 0xFE) * 16 + (16 if row >= 8 else 0)
+                        row %= 8
+                    else:
+                        addr = ((ctrl >> 3) & 1) * 0x1000 + tile * 16
+                    color = chr_pixel(ppu, addr, row, col)
+                    if color:
+                        if i == 0 and background & 3 and x != 255 and mask & 0x18 == 0x18:
+                            hit = True
+                        if sprite is None:
+                            sprite = (0x10 | ((attributes & 3) << 2) | color, attributes & 0x20)
+            value = background
+            if sprite is not None and (not sprite[1] or not background & 3):
+                value = sprite[0]
+            rows[y][x] = palette[0] if value & 3 == 0 else palette[value]
+    return rows, hit, overflow
+
+def random_scene(rng, path):
+    # NROM with CHR ROM or CHR RAM, or CNROM, each with random pattern data,
+    # nametables, palette, OAM (crowded onto the top lines), PPUCTRL, scroll
+    # and PPUMASK; returns the NES with its PPU ready to render
+    chr_banks = rng.choice([0, 1, 2])
+    image = bytearray(nes_nrom_image(NES_LOOP_PROGRAM, chr_data=rng.randbytes(0x2000)))
+    image[5] = chr_banks
+    image[6] = (3 << 4 if chr_banks == 2 else 0) | rng.choice([0, 1])
+    if chr_banks == 0:
+        image = image[:16 + 0x4000]
+    elif chr_banks == 2:
+        image += rng.randbytes(0x2000)
+    with open(path, 'wb') as f:
+        f.write(image)
+    machine = nes.NES(path, use_mmap=False, headless=True)
+    ppu = machine.ppu
+    if chr_banks == 0:
+        ppu.write_register(0x2006, 0)
+        ppu.write_register(0x2006, 0)
+        for value in rng.randbytes(0x2000):
+            ppu.write_register(0x2007, value)
+    elif chr_banks == 2:
+        machine.cpu.write(0x8000, 1)
+    ppu.vram[:] = rng.randbytes(0x800)
+    ppu.playfield_dirty = True
+    ppu.palette_ram[:] = bytes(value & 0x3F for value in rng.randbytes(32))
+    ppu.palette_dirty = True
+    oam = bytearray(rng.randbytes(256))
+    for i in range(64):
+        if rng.random() < 0.5:
+            oam[i * 4] = rng.randrange(0, 60)
+    ppu.oam[:] = oam
+    ppu.write_register(0x2000, rng.randrange(256) & 0x3B)
+    ppu.write_register(0x2005, rng.randrange(256))
+    ppu.write_register(0x2005, rng.randrange(240))
+    ppu.write_register(0x2001, rng.choice([0x1E, 0x18, 0x08, 0x10, 0x1A, 0x1C, 0x00]))
+    ppu.status = 0
+    return machine
+
+@unittest.skipIf(np is None, "NumPy not installed")
+class RenderTest(unittest.TestCase):
+    def test_frames_match_reference_renderer(self):
+        fd, path = tempfile.mkstemp(suffix='.nes')
+        os.close(fd)
+        try:
+            for seed in range(6):
+                with self.subTest(seed=seed):
+                    machine = random_scene(random.Random(seed), path)
+                    ppu = machine.ppu
+                    ppu.begin_frame(machine.cpu.cycles)
+                    scroll_y = ppu.line_y
+                    ppu.finish_frame()
+                    rows, hit, overflow = reference_frame(ppu, scroll_y)
+                    mismatched = np.argwhere(ppu.frame != np.array(rows, dtype=np.uint8))
+                    self.assertEqual(len(mismatched), 0, f"first mismatched (y, x): {mismatched[:3].tolist()}")
+                    self.assertEqual((bool(ppu.status & 0x40), bool(ppu.status & 0x20)), (hit, overflow))
+        finally:
+            os.unlink(path)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import runner
+from bench import NES_LOOP_PROGRAM, nes_nrom_image
+
+# LD V0, 05 / LD F, V0 / DRW V0, V0, 5 / JP 206
+GOOD_ROM = bytes.fromhex('6005 F029 D005 1206')
+
+class BatchTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write(self, name, data):
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def run_batch(self, *args):
+        # Returns (exit code, {rom name: result})
+        output = os.path.join(self.directory.name, 'results.jsonl')
+        with contextlib.redirect_stderr(io.StringIO()):
+            code = runner.main([*args, '-n', '10', '-j', '2', '-o', output])
+        with open(output) as f:
+            results = [json.loads(line) for line in f]
+        return code, {Path(result['rom']).name: result for result in results}
+
+    def test_bad_roms_do_not_stop_the_batch(self):
+        good = [self.write(f'good{i}.ch8', GOOD_ROM) for i in range(3)]
+        bad = [
+            self.write('oversized.ch8', bytes(4096)),
+            self.write('truncated.nes', nes_nrom_image(NES_LOOP_PROGRAM)[:100]),
+            self.write('recursive.ch8', bytes.fromhex('2200')),  # CALL 200 forever
+            os.path.join(self.directory.name, 'missing.ch8'),
+        ]
+        code, results = self.run_batch(*good[:2], *bad, good[2])
+        self.assertEqual(code, 1)
+        self.assertEqual(len(results), len(good) + len(bad))
+        for name in ('good0.ch8', 'good1.ch8', 'good2.ch8', 'recursive.ch8'):
+            self.assertNotIn('error', results[name], name)
+            self.assertIn('state', results[name])
+        for name in ('oversized.ch8', 'truncated.nes', 'missing.ch8'):
+            self.assertIn('error', results[name], name)
+        self.assertEqual(len(results['recursive.ch8']['state']['stack']), 16)
+
+    def test_failing_state_is_reported_as_an_error(self):
+        path = self.write('good.ch8', GOOD_ROM)
+        with mock.patch.object(runner.Chip8Runner, 'state', side_effect=ValueError("no state")):
+            result = runner.run_rom(path, 5, {}, 0, False, 0)
+        self.assertEqual(result['error'], "ValueError: no state")
+        self.assertNotIn('state', result)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import argparse
+import os
+import sys
+from pathlib import Path
+
+# Headless: pygame must see the dummy drivers before it is first imported
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+ROOT = Path(__file__).resolve().parent
+sys.path.insert(0, str(ROOT))
+
+import emu
+from perfstats import read_trace
+
+# CHIP-8 syntax by handler name; fields are the opcode's nibbles and bytes
+CHIP8_SYNTAX = {
+    'cls': 'CLS', 'ret': 'RET', 'jp': 'JP {nnn:03X}', 'call': 'CALL {nnn:03X}',
+    'se_byte': 'SE V{x:X}, {kk:02X}', 'sne_byte': 'SNE V{x:X}, {kk:02X}',
+    'se_reg': 'SE V{x:X}, V{y:X}', 'sne_reg': 'SNE V{x:X}, V{y:X}',
+    'ld_byte': 'LD V{x:X}, {kk:02X}', 'add_byte': 'ADD V{x:X}, {kk:02X}',
+    'ld_reg': 'LD V{x:X}, V{y:X}', 'or': 'OR V{x:X}, V{y:X}', 'and': 'AND V{x:X}, V{y:X}',
+    'xor': 'XOR V{x:X}, V{y:X}', 'add_reg': 'ADD V{x:X}, V{y:X}', 'sub': 'SUB V{x:X}, V{y:X}',
+    'shr': 'SHR V{x:X}, V{y:X}', 'subn': 'SUBN V{x:X}, V{y:X}', 'shl': 'SHL V{x:X}, V{y:X}',
+    'ld_i': 'LD I, {nnn:03X}', 'jp_v0': 'JP V0, {nnn:03X}', 'rnd': 'RND V{x:X}, {kk:02X}',
+    'drw': 'DRW V{x:X}, V{y:X}, {n:X}', 'skp': 'SKP V{x:X}', 'sknp': 'SKNP V{x:X}',
+    'ld_vx_dt': 'LD V{x:X}, DT', 'ld_key': 'LD V{x:X}, K', 'ld_dt': 'LD DT, V{x:X}',
+    'ld_st': 'LD ST, V{x:X}', 'add_i': 'ADD I, V{x:X}', 'ld_font': 'LD F, V{x:X}',
+    'bcd': 'LD B, V{x:X}', 'store': 'LD [I], V{x:X}', 'load': 'LD V{x:X}, [I]',
+    'unknown': 'DW {opcode:04X}',
+}
+
+def disassemble_chip8(opcode):
+    handler = emu.decode_opcode(opcode)[0]
+    return CHIP8_SYNTAX[emu.handler_name(handler)].format(
+        opcode=opcode, x=(opcode >> 8) & 0xF, y=(opcode >> 4) & 0xF,
+        n=opcode & 0xF, kk=opcode & 0xFF, nnn=opcode & 0xFFF)
+
+def format_chip8(record):
+    sequence, pc, opcode, I, delay_timer, sound_timer, depth, V = record
+    return (f"{sequence:>10}  {pc:03X}  {opcode:04X}  {disassemble_chip8(opcode):<16} "
+            f"I:{I:03X} DT:{delay_timer:02X} ST:{sound_timer:02X} SP:{depth:X} V:{V.hex(' ').upper()}")
+
+# 6502 operand syntax and instruction length by addressing mode name
+MODE_SYNTAX = {
+    'imp': ('', 1), 'imm': ('#${lo:02X}', 2), 'zp': ('${lo:02X}', 2), 'zpx': ('${lo:02X},X', 2),
+    'zpy': ('${lo:02X},Y', 2), 'izx': ('(${lo:02X},X)', 2), 'izy': ('(${lo:02X}),Y', 2),
+    'rel': ('${target:04X}', 2), 'abs': ('${word:04X}', 3), 'abx': ('${word:04X},X', 3),
+    'aby': ('${word:04X},Y', 3), 'ind': ('(${word:04X})', 3),
+}
+
+_nesticle = None
+
+def disassemble_6502(pc, opcode, lo, hi):
+    # Returns (instruction bytes, text); the NES module is only needed here
+    global _nesticle
+    if _nesticle is None:
+        from bench import load_nesticle
+        _nesticle = load_nesticle()
+    handler, mode, _ = _nesticle.OPCODE_TABLE[opcode]
+    name = handler.__name__[len('_op_'):]
+    if name == 'unknown':
+        return f"{opcode:02X}", '???'
+    syntax, length = MODE_SYNTAX[mode.__name__[len('_am_'):].removesuffix('_w')]
+    if name.endswith('_a'):  # ASL A and friends
+        name, syntax = name[:-2], 'A'
+    operand = syntax.format(lo=lo, word=lo | (hi << 8),
+                            target=(pc + 2 + lo - ((lo & 0x80) << 1)) & 0xFFFF)
+    code = ' '.join(f"{byte:02X}" for byte in (opcode, lo, hi)[:length])
+    return code, f"{name.upper()} {operand}".rstrip()
+
+def format_6502(record):
+    # nestest.log column order
+    cycles, pc, opcode, lo, hi, a, x, y, p, sp = record
+    code, text = disassemble_6502(pc, opcode, lo, hi)
+    return (f"{pc:04X}  {code:<8}  {text:<13} A:{a:02X} X:{x:02X} Y:{y:02X} "
+            f"P:{p:02X} SP:{sp:02X} CYC:{cycles}")
+
+FORMATTERS = {'chip8': format_chip8, '6502': format_6502}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Decode and disassemble an execution trace dump")
+    parser.add_argument('trace', help="file written by TraceRing.dump (emulator Trace button, runner.py --trace)")
+    parser.add_argument('-n', '--last', type=int, metavar='N', help="only the last N instructions")
+    args = parser.parse_args(argv)
+
+    cpu, record, records = read_trace(args.trace)
+    if args.last is not None:
+        records = records[-args.last:] if args.last > 0 else []
+    print(f"{cpu} trace: {len(records)} instructions", file=sys.stderr)
+    formatter = FORMATTERS[cpu]
+    for entry in records:
+        print(formatter(entry))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())